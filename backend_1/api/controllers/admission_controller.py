@@ -0,0 +1,82 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `burst`"""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        """Take one token; returns 0 on success, else the seconds until a token is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Global in-flight limit and per-user token buckets, checked before any work is done
+
+    try_enter()/leave() bound the number of requests being handled at once, so an
+    overloaded threaded server answers 503 immediately instead of queueing.
+    check_rate() enforces a per-user limit (from UserManager.rate_limit_for) and
+    returns how long the client should wait when it is exceeded.
+    """
+
+    def __init__(self, max_in_flight=None, clock=time.monotonic):
+        if getattr(self, '_initialized', False):
+            return
+        self.max_in_flight = max_in_flight
+        self.clock = clock
+        self._in_flight = 0
+        # username -> (rate, burst) the bucket was built for, TokenBucket
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._initialized = True
+
+    def configure(self, max_in_flight=None):
+        """Set the global in-flight limit (None for unlimited)"""
+        self.max_in_flight = max_in_flight
+
+    def try_enter(self):
+        """Admit one request unless max_in_flight requests are already being handled"""
+        with self._lock:
+            if self.max_in_flight is not None and self._in_flight >= self.max_in_flight:
+                return False
+            self._in_flight += 1
+            return True
+
+    def leave(self):
+        """Release the slot taken by try_enter()"""
+        with self._lock:
+            self._in_flight -= 1
+
+    def in_flight(self):
+        return self._in_flight
+
+    def check_rate(self, username, limit):
+        """Take a token from username's bucket; returns 0 if allowed, else seconds to wait
+
+        limit is (requests per second, burst) or None for unlimited. A changed limit
+        replaces the user's bucket.
+        """
+        if limit is None:
+            return 0
+        now = self.clock()
+        with self._lock:
+            entry = self._buckets.get(username)
+            if entry is None or entry[0] != limit:
+                entry = self._buckets[username] = (limit, TokenBucket(limit[0], limit[1], now))
+            return entry[1].take(now)
+
+
+# Module-level singleton
+admission_instance = AdmissionController()
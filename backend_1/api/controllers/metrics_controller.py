@@ -0,0 +1,144 @@
+from bisect import bisect_left
+import threading
+
+
+# Fixed latency buckets (seconds) shared by every route histogram
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels):
+    """Render a label dict as a Prometheus label set"""
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    """Render a sample value the way Prometheus expects"""
+    if isinstance(value, float) and value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and latency histograms in Prometheus text format"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        if getattr(self, '_initialized', False):
+            return
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # (method, route, status) -> [bucket counts..., +Inf count, sum]
+        self._requests = {}
+        self._in_flight = 0
+        # name -> {label tuple: value}
+        self._counters = {}
+        # name -> (help, type, callback returning [(labels, value), ...])
+        self._collectors = {}
+        self._help = {}
+        self._initialized = True
+
+    def observe_request(self, method, route, status, duration):
+        """Record one finished request (duration in seconds)"""
+        key = (method, route, status)
+        index = bisect_left(self.buckets, duration)
+        with self._lock:
+            series = self._requests.get(key)
+            if series is None:
+                series = [0] * (len(self.buckets) + 1) + [0.0]
+                self._requests[key] = series
+            series[index] += 1
+            series[-1] += duration
+
+    def request_started(self):
+        """Increase the in-flight request gauge"""
+        with self._lock:
+            self._in_flight += 1
+
+    def request_finished(self):
+        """Decrease the in-flight request gauge"""
+        with self._lock:
+            self._in_flight -= 1
+
+    def inc(self, name, amount=1, help_text='', **labels):
+        """Increase a labelled counter"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+            if help_text:
+                self._help[name] = help_text
+
+    def register_gauge(self, name, help_text, callback):
+        """Register a gauge whose samples are read from callback() at scrape time"""
+        self._collectors[name] = (help_text, 'gauge', callback)
+
+    def record_ingest(self, stats):
+        """Fold SMSXMLParser.stats from one parse run into the ingest counters"""
+        self.inc('sms_ingest_messages_seen_total', stats.get('seen', 0),
+                 'SMS elements found in ingested XML exports')
+        self.inc('sms_ingest_messages_dropped_total', stats.get('dropped', 0),
+                 'SMS elements that matched no template or failed to parse')
+        for pattern, count in stats.get('matched', {}).items():
+            self.inc('sms_ingest_messages_matched_total', count,
+                     'SMS elements matched per body template', pattern=pattern)
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            requests = {key: list(series) for key, series in self._requests.items()}
+            in_flight = self._in_flight
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            help_texts = dict(self._help)
+
+        lines = [
+            '# HELP http_requests_total HTTP requests handled by method, route and status',
+            '# TYPE http_requests_total counter',
+        ]
+        for (method, route, status), series in sorted(requests.items()):
+            labels = _format_labels({'method': method, 'route': route, 'status': status})
+            lines.append(f'http_requests_total{labels} {sum(series[:-1])}')
+
+        lines.append('# HELP http_request_duration_seconds HTTP request latency by method, route and status')
+        lines.append('# TYPE http_request_duration_seconds histogram')
+        for (method, route, status), series in sorted(requests.items()):
+            base = {'method': method, 'route': route, 'status': status}
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(dict(base, le=_format_value(float(bound))))
+                lines.append(f'http_request_duration_seconds_bucket{labels} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            labels = _format_labels(dict(base, le='+Inf'))
+            lines.append(f'http_request_duration_seconds_bucket{labels} {cumulative}')
+            labels = _format_labels(base)
+            lines.append(f'http_request_duration_seconds_sum{labels} {_format_value(series[-1])}')
+            lines.append(f'http_request_duration_seconds_count{labels} {cumulative}')
+
+        lines.append('# HELP http_requests_in_flight HTTP requests currently being handled')
+        lines.append('# TYPE http_requests_in_flight gauge')
+        lines.append(f'http_requests_in_flight {in_flight}')
+
+        for name in sorted(counters):
+            lines.append(f'# HELP {name} {help_texts.get(name, name)}')
+            lines.append(f'# TYPE {name} counter')
+            for key, value in sorted(counters[name].items()):
+                lines.append(f'{name}{_format_labels(dict(key))} {_format_value(value)}')
+
+        for name in sorted(self._collectors):
+            help_text, metric_type, callback = self._collectors[name]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in callback():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+# Module-level singleton
+metrics_instance = MetricsRegistry()
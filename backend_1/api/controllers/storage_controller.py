@@ -1,31 +1,177 @@
 from api.models import Transaction
-from dsa.sms_parser import SMSXMLParser
+from api.controllers.metrics_controller import metrics_instance
+from dsa.sms_parser import SMSXMLParser, DEFAULT_XML_PATH
+from dsa.profiler import NULL_PROFILER
+from dsa.dedup import Deduplicator
+from dsa.batch_ingest import expand_sources, parse_files
+from dsa.quarantine import QuarantineStore
+from dsa.balance_timeline import BalanceTimeline, PartitionedTimeline
+from dsa.sketches import TransactionAnalytics
+from dsa.change_log import ChangeLog
+from dsa.tiered_store import TieredStore
+from dsa.partitioned_store import PartitionedStore
+from dsa.field_index import EqualityIndex
+from dsa.etl import parse_time
+from dsa.templates import SMSTemplate, template_registry
 from datetime import datetime
+import json
+import threading
+import time
+
+# Fields with an equality index (exact-match and IN lookups in POST /transactions/query)
+INDEXED_FIELDS = ('transaction_type', 'status', 'sender_name', 'receiver_name')
 
 
 class TransactionStorage:
     """In-memory storage for transactions"""
 
-    def __init__(self):
+    def __init__(self, xml_file_path=DEFAULT_XML_PATH, profiler=None, partitions=1):
         # Guard against re-initializing when used as a singleton
         if getattr(self, '_initialized', False):
             return
-        self.transactions = {}
+        self.xml_file_path = xml_file_path
+        self.profiler = profiler or NULL_PROFILER
+        # Hash partitions by transaction_id; each has its own write lock and derived indexes
+        self.transactions = PartitionedStore(partitions)
+        # transaction_id -> export files the transaction was seen in
+        self.provenance = {}
+        # One report per ingested export file
+        self.ingested_files = []
+        # Cross-export duplicate detection for ingested SMS (external ID or content fingerprint).
+        # In memory on purpose: the store is rebuilt from the exports on every start, so a filter
+        # persisted across restarts would reject the whole export as duplicates. It therefore only
+        # covers the exports ingested by this one process.
+        self.deduplicator = Deduplicator()
+        # SMS templates, and the messages none of them matched
+        self.registry = template_registry
+        self.quarantine = QuarantineStore()
+        # Ordered record of writes and deletes for delta sync (GET /transactions/changes)
+        self.changes = ChangeLog()
+        self._attach_indexes()
         self._load_sample_data()
         self._initialized = True
 
+    def _attach_indexes(self):
+        """Create the per-partition derived indexes and fill them from the stored transactions
+
+        Each partition has its own date-sorted balance history, its own streaming
+        amount quantiles and top receivers and its equality indexes on
+        INDEXED_FIELDS, all filled in this one pass over the store and then
+        maintained on every write. self.timeline, self.analytics and lookup()
+        merge them for queries.
+        """
+        partitions = self.transactions.partitions
+        self._timelines = [BalanceTimeline() for _ in partitions]
+        self._analytics = [TransactionAnalytics() for _ in partitions]
+        self._field_indexes = [{field: EqualityIndex(field) for field in INDEXED_FIELDS} for _ in partitions]
+        for partition in partitions:
+            for transaction in partition.data.values():
+                self._timelines[partition.index].add(transaction)
+                self._analytics[partition.index].add(transaction)
+                for field_index in self._field_indexes[partition.index].values():
+                    field_index.add(transaction)
+        self.timeline = self._timelines[0] if len(partitions) == 1 else PartitionedTimeline(self._timelines)
+
+    @property
+    def analytics(self):
+        """Amount quantiles and top receivers over every partition"""
+        return TransactionAnalytics.merge_all(self._analytics)
+
+    def lookup(self, field, value):
+        """IDs of the transactions whose field (one of INDEXED_FIELDS) equals value"""
+        ids = set()
+        for indexes in self._field_indexes:
+            ids |= indexes[field].lookup(value)
+        return ids
+
+    def lookup_count(self, field, value):
+        """Number of transactions whose field (one of INDEXED_FIELDS) equals value"""
+        return sum(indexes[field].count(value) for indexes in self._field_indexes)
+
+    def set_partitions(self, partitions):
+        """Re-split the stored transactions into this many hash partitions (before enable_tiering)"""
+        if any(isinstance(partition.data, TieredStore) for partition in self.transactions.partitions):
+            raise ValueError("Set the number of partitions before enabling tiering")
+        old = self.transactions
+        for partition in old.partitions:
+            partition.lock.acquire()
+        try:
+            store = PartitionedStore(partitions)
+            store.update(old.items())
+            self.transactions = store
+            self._attach_indexes()
+        finally:
+            for partition in old.partitions:
+                partition.lock.release()
+
+    def enable_tiering(self, cold_path, hot_capacity=10000, max_age_days=None):
+        """Keep at most hot_capacity transactions in memory and spill the rest to an SQLite file
+
+        Transactions read through get_by_id/get_many/update are promoted to the
+        in-memory hot tier; the least recently used ones (and, with max_age_days,
+        those dated more than that many days ago) are demoted to cold_path.
+        Transactions already stored are moved into the tiers in their current order.
+        With several partitions, each gets an equal share of hot_capacity and its
+        own file (cold_path with the partition number appended). Raises
+        ValueError, leaving storage unchanged, if a file is in use by another store.
+        """
+        is_cold = None
+        if max_age_days is not None:
+            max_age_ms = max_age_days * 86400 * 1000
+
+            def is_cold(transaction):
+                try:
+                    return parse_time(transaction.transaction_date) < time.time() * 1000 - max_age_ms
+                except (AttributeError, TypeError, ValueError):
+                    return False
+
+        partitions = self.transactions.partitions
+        stores = []
+        try:
+            for partition in partitions:
+                path = cold_path
+                if len(partitions) > 1 and cold_path != ':memory:':
+                    path = f"{cold_path}.{partition.index}"
+                stores.append(TieredStore(path, encode=lambda transaction: json.dumps(vars(transaction)),
+                                          decode=lambda text: Transaction.from_record(json.loads(text)),
+                                          hot_capacity=max(1, hot_capacity // len(partitions)), is_cold=is_cold))
+        except ValueError:
+            for tiered in stores:
+                tiered.close()
+            raise
+        for partition, tiered in zip(partitions, stores):
+            with partition.lock:
+                tiered.update(partition.data)
+                partition.data = tiered
+
+    def _tiers(self):
+        return [partition.data for partition in self.transactions.partitions
+                if isinstance(partition.data, TieredStore)]
+
+    def tier_sizes(self):
+        """{'hot': transactions in memory, 'cold': transactions on disk}, or None without tiering"""
+        tiers = self._tiers()
+        if not tiers:
+            return None
+        sizes = [tier.tier_sizes() for tier in tiers]
+        return {'hot': sum(size['hot'] for size in sizes), 'cold': sum(size['cold'] for size in sizes)}
+
+    def hot_hit_ratio(self):
+        """Share of lookups served from memory, or None without tiering or before the first lookup"""
+        tiers = self._tiers()
+        hits = sum(tier.hits for tier in tiers)
+        lookups = hits + sum(tier.misses for tier in tiers)
+        return hits / lookups if lookups else None
+
     def _load_sample_data(self):
         """Load SMS transaction data from XML file or fallback to sample data"""
         # Try to parse the XML file first
-        parser = SMSXMLParser()
+        parser = SMSXMLParser(self.xml_file_path, profiler=self.profiler, quarantine=self.quarantine)
         parsed_transactions = parser.parse_xml_file()
+        self._record_parse_stats(parser.stats)
 
         if parsed_transactions:
-            for txn_data in parsed_transactions:
-                transaction = Transaction.from_dict(txn_data)
-                # Only add if not already exists (prevents duplicates)
-                if transaction.transaction_id not in self.transactions:
-                    self.transactions[transaction.transaction_id] = transaction
+            self.ingest(parsed_transactions, source=self.xml_file_path)
         else:
             # Fallback to sample data
             sample_transactions = [
@@ -70,6 +216,164 @@ class TransactionStorage:
             for txn_data in sample_transactions:
                 transaction = Transaction.from_dict(txn_data)
                 self.transactions[transaction.transaction_id] = transaction
+                self._index_add(transaction, 'ingested')
+
+    def ingest(self, parsed_transactions, source=None):
+        """Add parsed SMS transactions, skipping ones already ingested from this or another export
+
+        source (the export file) is recorded as provenance for new and duplicate records.
+        Returns (added, duplicates).
+        """
+        added = 0
+        duplicates = 0
+        for txn_data in parsed_transactions:
+            existing_id = self.deduplicator.check_and_add(txn_data)
+            if existing_id is not None:
+                duplicates += 1
+                self._record_provenance(existing_id, source)
+                continue
+            with self.profiler.stage('from_record'):
+                transaction = Transaction.from_record(txn_data)
+            # Only add if not already exists (prevents duplicates)
+            with self.transactions.partition_for(transaction.transaction_id).lock:
+                if transaction.transaction_id not in self.transactions:
+                    self.transactions[transaction.transaction_id] = transaction
+                    self._index_add(transaction, 'ingested')
+                    added += 1
+                else:
+                    duplicates += 1
+                self._record_provenance(transaction.transaction_id, source)
+        metrics_instance.inc('sms_ingest_duplicates_total', duplicates,
+                             'Ingested SMS transactions skipped as cross-export duplicates')
+        return added, duplicates
+
+    def _index_add(self, transaction, change=None):
+        """Bring the derived indexes up to date with a newly stored (or updated) transaction
+
+        change is the ChangeLog kind: 'created', 'updated' or 'ingested' (None
+        records nothing). If a field cannot be indexed (e.g. an unhashable
+        value), the indexes already updated are rolled back before re-raising.
+        """
+        index = self.transactions.partition_for(transaction.transaction_id).index
+        self._analytics[index].add(transaction)
+        added = [self._analytics[index]]
+        try:
+            for derived in (self._timelines[index], *self._field_indexes[index].values()):
+                derived.add(transaction)
+                added.append(derived)
+        except Exception:
+            for derived in added:
+                derived.remove(transaction)
+            raise
+        if change is not None:
+            self.changes.record(transaction.transaction_id, change)
+
+    def _index_remove(self, transaction):
+        """Take a transaction that is being updated or deleted out of the derived indexes"""
+        index = self.transactions.partition_for(transaction.transaction_id).index
+        self._timelines[index].remove(transaction)
+        self._analytics[index].remove(transaction)
+        for field_index in self._field_indexes[index].values():
+            field_index.remove(transaction)
+
+    def _record_provenance(self, transaction_id, source):
+        """Remember that transaction_id appeared in the export file source"""
+        if source is None:
+            return
+        files = self.provenance.setdefault(transaction_id, [])
+        if source not in files:
+            files.append(source)
+
+    def ingest_files(self, sources, workers=None):
+        """Parse export files, directories or glob patterns concurrently and merge them
+
+        Files are parsed across a process pool and merged in path order, so the
+        result does not depend on which worker finishes first. Returns one report
+        per file (also kept in self.ingested_files).
+        """
+        reports = []
+        for result in parse_files(expand_sources(sources), workers):
+            start = time.perf_counter()
+            added, duplicates = self.ingest(result['transactions'], source=result['file'])
+            self.quarantine.add_entries(result['quarantined'])
+            self._record_parse_stats(result['stats'])
+            report = {
+                'file': result['file'],
+                'seen': result['stats']['seen'],
+                'dropped': result['stats']['dropped'],
+                'added': added,
+                'duplicates': duplicates,
+                'parse_seconds': round(result['parse_seconds'], 3),
+                'merge_seconds': round(time.perf_counter() - start, 3),
+                'ingested_at': datetime.now().isoformat()
+            }
+            reports.append(report)
+            self.ingested_files.append(report)
+        return reports
+
+    def _record_parse_stats(self, stats):
+        """Feed one parse run's counters to /metrics and the template match counts"""
+        metrics_instance.record_ingest(stats)
+        self.registry.record_matches(stats['matched'])
+
+    def register_template(self, spec):
+        """Register a template from a config dict and re-parse only the quarantined messages
+
+        Raises ValueError for an invalid spec and KeyError for a duplicate name.
+        """
+        template = self.registry.register(SMSTemplate.from_config(spec))
+        result = self.reparse_quarantine()
+        result['template'] = template.name
+        return result
+
+    def register_templates_from_file(self, path):
+        """Register every template in a JSON config file, then re-parse the quarantine once"""
+        templates = self.registry.load_config(path)
+        result = self.reparse_quarantine()
+        result['templates'] = [template.name for template in templates]
+        return result
+
+    def reparse_quarantine(self):
+        """Try the current templates on quarantined messages and ingest the ones that now match"""
+        remaining_before = len(self.quarantine)
+        parser = SMSXMLParser(registry=self.registry, profiler=self.profiler)
+        parsed_transactions, released = parser.reparse_quarantine(self.quarantine, release=False)
+        added = duplicates = 0
+        for txn_data, entry in zip(parsed_transactions, released):
+            entry_added, entry_duplicates = self.ingest([txn_data], source=entry['source'])
+            added += entry_added
+            duplicates += entry_duplicates
+        # Only now that the transactions are stored do their messages leave quarantine
+        self.quarantine.remove([entry['key'] for entry in released])
+        self._record_parse_stats(parser.stats)
+        return {
+            'reparsed': remaining_before,
+            'matched': len(parsed_transactions),
+            'matched_by_template': parser.stats['matched'],
+            'added': added,
+            'duplicates': duplicates,
+            'still_quarantined': len(self.quarantine)
+        }
+
+    def template_report(self):
+        """Per-template match counts and overall coverage of ingested messages"""
+        counts = dict(self.registry.match_counts)
+        matched = sum(counts.values())
+        quarantined = len(self.quarantine)
+        return {
+            'templates': [
+                {
+                    'name': template.name,
+                    'transaction_type': template.transaction_type,
+                    'builtin': template.builtin,
+                    'matches': counts.get(template.name, 0)
+                }
+                for template in self.registry.templates
+            ],
+            'matched': matched,
+            'quarantined': quarantined,
+            'coverage': round(matched / (matched + quarantined), 4) if matched + quarantined else None
+        }
 
     def get_all(self):
         """Get all transactions"""
@@ -79,33 +383,114 @@ class TransactionStorage:
         """Get transaction by ID"""
         return self.transactions.get(transaction_id)
 
+    def get_many(self, transaction_ids):
+        """Look up several IDs; returns (transactions found, IDs not found), each in request order
+
+        Repeated IDs are resolved once.
+        """
+        found = []
+        missing = []
+        transactions = self.transactions
+        for transaction_id in dict.fromkeys(transaction_ids):
+            transaction = transactions.get(transaction_id)
+            if transaction is None:
+                missing.append(transaction_id)
+            else:
+                found.append(transaction)
+        return found, missing
+
     def create(self, transaction):
         """Create new transaction"""
-        if transaction.transaction_id in self.transactions:
-            return None  # ID already exists
-        self.transactions[transaction.transaction_id] = transaction
+        with self.transactions.partition_for(transaction.transaction_id).lock:
+            if transaction.transaction_id in self.transactions:
+                return None  # ID already exists
+            self.transactions[transaction.transaction_id] = transaction
+            try:
+                self._index_add(transaction, 'created')
+            except Exception:
+                del self.transactions[transaction.transaction_id]
+                raise
         return transaction
 
     def update(self, transaction_id, transaction_data):
-        """Update existing transaction"""
-        if transaction_id not in self.transactions:
-            return None
-        existing = self.transactions[transaction_id]
+        """Update existing transaction (money fields in minor units)"""
+        with self.transactions.partition_for(transaction_id).lock:
+            if transaction_id not in self.transactions:
+                return None
+            existing = self.transactions[transaction_id]
+            previous = dict(vars(existing))
+            self._index_remove(existing)
+            try:
+                # Update fields
+                for key, value in transaction_data.items():
+                    if hasattr(existing, key) and key not in ['transaction_id', 'created_at']:
+                        setattr(existing, key, value)
 
-        # Update fields
-        for key, value in transaction_data.items():
-            if hasattr(existing, key) and key not in ['transaction_id', 'created_at']:
-                setattr(existing, key, value)
-
-        existing.updated_at = datetime.now().isoformat()
+                existing.updated_at = datetime.now().isoformat()
+                self._index_add(existing, 'updated')
+                # Store the record explicitly rather than relying on the read having promoted it
+                self.transactions[transaction_id] = existing
+            except Exception:
+                # Leave the stored record and its index entries as they were
+                vars(existing).update(previous)
+                self._index_add(existing)
+                raise
         return existing
 
     def delete(self, transaction_id):
         """Delete transaction"""
-        if transaction_id not in self.transactions:
-            return None
-        return self.transactions.pop(transaction_id)
+        with self.transactions.partition_for(transaction_id).lock:
+            if transaction_id not in self.transactions:
+                return None
+            transaction = self.transactions.pop(transaction_id)
+            self._index_remove(transaction)
+            self.changes.record(transaction_id, 'deleted')
+        return transaction
+
+
+# Module-level singleton instance, built (and the default export parsed) on first use of
+# storage_instance, so importing TransactionStorage alone (e.g. to profile it) has no side effects
+_storage_instance = None
+_storage_instance_lock = threading.Lock()
+
+
+def get_storage_instance():
+    """The shared TransactionStorage, created on the first call"""
+    global _storage_instance
+    if _storage_instance is None:
+        with _storage_instance_lock:
+            if _storage_instance is None:
+                _storage_instance = TransactionStorage()
+    return _storage_instance
+
+
+def __getattr__(name):
+    if name == 'storage_instance':
+        return get_storage_instance()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _transactions_stored():
+    return [] if _storage_instance is None else [({}, len(_storage_instance.transactions))]
+
+
+def _tier_sizes():
+    sizes = _storage_instance.tier_sizes() if _storage_instance is not None else None
+    return [({'tier': tier}, size) for tier, size in (sizes or {}).items()]
+
+
+def _hot_hit_ratio():
+    ratio = _storage_instance.hot_hit_ratio() if _storage_instance is not None else None
+    return [] if ratio is None else [({}, ratio)]
+
+
+metrics_instance.register_gauge(
+    'transactions_stored', 'Transactions currently held in storage', _transactions_stored)
 
 
-# Module-level singleton instance
-storage_instance = TransactionStorage()
+metrics_instance.register_gauge(
+    'transactions_stored_by_tier', 'Transactions held in memory (hot) and on disk (cold) with --hot-capacity',
+    _tier_sizes)
+metrics_instance.register_gauge(
+    'transactions_hot_hit_ratio', 'Share of transaction lookups served from the in-memory hot tier',
+    _hot_hit_ratio)
@@ -0,0 +1,232 @@
+import json
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+
+from api.controllers.storage_controller import storage_instance
+from api.controllers.metrics_controller import metrics_instance
+from api.encoder import transaction_encoder
+from dsa.change_log import ResyncRequired
+
+
+class _Subscriber:
+    """One Server-Sent Events connection owned by the broadcaster"""
+    __slots__ = ('sock', 'position', 'buffer', 'last_write')
+
+    def __init__(self, sock, position):
+        self.sock = sock
+        self.position = position
+        self.buffer = bytearray()
+        self.last_write = time.monotonic()
+
+
+class EventBroadcaster:
+    """Pushes storage changes to Server-Sent Events subscribers from a single thread
+
+    A handler sends the response headers and any backlog, then hands its socket
+    over with subscribe() and returns, so idle subscribers hold no request thread
+    and no in-flight slot. One selector loop wakes on every ChangeLog append,
+    renders each new event once and queues it for every subscriber past whose
+    position it lies, writing without blocking. Subscribers that fall more than
+    max_buffer_bytes behind are disconnected and can resume with Last-Event-ID.
+    """
+
+    def __init__(self, storage, heartbeat=15.0, max_buffer_bytes=1024 * 1024):
+        self.storage = storage
+        self.heartbeat = heartbeat
+        self.max_buffer_bytes = max_buffer_bytes
+        self._subscribers = {}
+        self._joining = deque()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self._wake_reader = self._wake_writer = None
+        self._selector = None
+        storage.changes.add_listener(self.notify)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def render(self, sequence, transaction_id, kind):
+        """SSE frame for one change: the current record, or just its ID once deleted"""
+        transaction = None if kind == 'deleted' else self.storage.get_by_id(transaction_id)
+        if transaction is not None:
+            data = transaction_encoder().dumps(transaction)
+        else:
+            data = json.dumps({'transaction_id': transaction_id})
+        return (f"id: {self.storage.changes.token(sequence)}\nevent: {kind}\n"
+                f"data: {data}\n\n").encode('utf-8')
+
+    def resync_frame(self):
+        """SSE frame telling the client to reload, with the token to continue from"""
+        data = json.dumps({'next': self.storage.changes.token()})
+        return f"event: resync\ndata: {data}\n\n".encode('utf-8')
+
+    def subscribe(self, sock, position):
+        """Take ownership of a connected socket that has seen every event up to `position`"""
+        sock.setblocking(False)
+        with self._lock:
+            self._joining.append(_Subscriber(sock, position))
+            if self._thread is None:
+                self._start()
+        self.notify()
+
+    def notify(self):
+        """Wake the loop (called after each change; never blocks)"""
+        if self._wake_writer is None:
+            return
+        try:
+            self._wake_writer.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # A wake-up is already pending, or the loop is shutting down
+
+    def close(self):
+        """Stop the loop and disconnect every subscriber"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._running = False
+        if thread is not None:
+            self.notify()
+            thread.join()
+
+    def _start(self):
+        self._selector = selectors.DefaultSelector()
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+        self._selector.register(self._wake_reader, selectors.EVENT_READ, None)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='sse-broadcaster', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        changes = self.storage.changes
+        try:
+            while self._running:
+                for key, mask in self._selector.select(self._next_timeout()):
+                    if key.data is None:
+                        self._drain_wakeups()
+                        continue
+                    subscriber = key.data
+                    if mask & selectors.EVENT_READ and not self._client_alive(subscriber):
+                        self._drop(subscriber)
+                        continue
+                    if mask & selectors.EVENT_WRITE:
+                        self._flush(subscriber)
+                self._admit_joining()
+                if self._subscribers:
+                    self._fan_out(changes)
+                    self._send_heartbeats()
+        finally:
+            for subscriber in list(self._subscribers.values()):
+                self._drop(subscriber)
+            self._selector.close()
+            self._wake_reader.close()
+            self._wake_writer.close()
+            self._wake_reader = self._wake_writer = None
+
+    def _next_timeout(self):
+        if not self._subscribers:
+            return None
+        oldest = min(subscriber.last_write for subscriber in self._subscribers.values())
+        return max(0.0, oldest + self.heartbeat - time.monotonic())
+
+    def _drain_wakeups(self):
+        try:
+            while self._wake_reader.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _admit_joining(self):
+        with self._lock:
+            joining, self._joining = self._joining, deque()
+        for subscriber in joining:
+            try:
+                self._selector.register(subscriber.sock, selectors.EVENT_READ, subscriber)
+            except (OSError, ValueError):
+                subscriber.sock.close()
+                continue
+            self._subscribers[subscriber.sock.fileno()] = subscriber
+
+    def _fan_out(self, changes):
+        last = changes.last_sequence
+        oldest = min(subscriber.position for subscriber in self._subscribers.values())
+        if oldest >= last:
+            return
+        try:
+            events = changes.events(oldest)
+        except ResyncRequired:
+            # Events a subscriber has not seen were evicted before delivery; it can only resync
+            for subscriber in list(self._subscribers.values()):
+                try:
+                    changes.events(subscriber.position, 0)
+                except ResyncRequired:
+                    subscriber.buffer += self.resync_frame()
+                    subscriber.position = last
+            oldest = min(subscriber.position for subscriber in self._subscribers.values())
+            events = changes.events(oldest) if oldest < last else []
+        for sequence, transaction_id, kind in events:
+            frame = None
+            for subscriber in list(self._subscribers.values()):
+                if subscriber.position < sequence:
+                    if frame is None:
+                        frame = self.render(sequence, transaction_id, kind)
+                    subscriber.buffer += frame
+                    subscriber.position = sequence
+        for subscriber in list(self._subscribers.values()):
+            self._flush(subscriber)
+
+    def _send_heartbeats(self):
+        now = time.monotonic()
+        for subscriber in list(self._subscribers.values()):
+            if not subscriber.buffer and now - subscriber.last_write >= self.heartbeat:
+                subscriber.buffer += b': keepalive\n\n'
+                self._flush(subscriber)
+
+    def _client_alive(self, subscriber):
+        """Read whatever the client sent; False once it has closed the connection"""
+        try:
+            return bool(subscriber.sock.recv(4096))
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+
+    def _flush(self, subscriber):
+        if subscriber.sock.fileno() not in self._subscribers:
+            return
+        if subscriber.buffer:
+            try:
+                sent = subscriber.sock.send(subscriber.buffer)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                self._drop(subscriber)
+                return
+            del subscriber.buffer[:sent]
+            subscriber.last_write = time.monotonic()
+        if len(subscriber.buffer) > self.max_buffer_bytes:
+            metrics_instance.inc('sse_subscribers_dropped_total', 1,
+                                 'Event stream subscribers disconnected for falling behind')
+            self._drop(subscriber)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if subscriber.buffer else 0)
+        self._selector.modify(subscriber.sock, events, subscriber)
+
+    def _drop(self, subscriber):
+        if self._subscribers.pop(subscriber.sock.fileno(), None) is not None:
+            try:
+                self._selector.unregister(subscriber.sock)
+            except (KeyError, ValueError):
+                pass
+        subscriber.sock.close()
+
+
+# Module-level singleton for the shared storage
+broadcaster_instance = EventBroadcaster(storage_instance)
+metrics_instance.register_gauge(
+    'sse_subscribers', 'Server-Sent Events connections currently open',
+    lambda: [({}, len(broadcaster_instance))])
@@ -0,0 +1,134 @@
+from datetime import datetime
+import json
+import random
+import threading
+import time
+import uuid
+
+
+class _PhaseTimer:
+    """Context manager that adds the elapsed time of a block to a trace phase"""
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.add(self.name, time.perf_counter_ns() - self.start)
+        return False
+
+
+class _NullPhase:
+    """No-op phase used when tracing is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class NullTrace:
+    """Trace stand-in that records nothing, so the handler never branches on tracing"""
+    enabled = False
+    sampled = False
+    request_id = None
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def add(self, name, elapsed_ns):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+class RequestTrace:
+    """Per-request phase timings collected with perf_counter_ns"""
+    enabled = True
+
+    def __init__(self, request_id, sampled):
+        self.request_id = request_id
+        self.sampled = sampled
+        self.start_ns = time.perf_counter_ns()
+        self.phases = {}
+
+    def phase(self, name):
+        """Time a block as the named phase (repeated phases accumulate)"""
+        return _PhaseTimer(self, name)
+
+    def add(self, name, elapsed_ns):
+        """Add elapsed nanoseconds to the named phase"""
+        self.phases[name] = self.phases.get(name, 0) + elapsed_ns
+
+    def elapsed_ns(self):
+        """Nanoseconds since the trace started"""
+        return time.perf_counter_ns() - self.start_ns
+
+    def server_timing(self):
+        """Render the phases recorded so far as a Server-Timing header value"""
+        parts = [f'{name};dur={elapsed / 1e6:.3f}' for name, elapsed in self.phases.items()]
+        parts.append(f'total;dur={self.elapsed_ns() / 1e6:.3f}')
+        return ', '.join(parts)
+
+    def to_record(self, method, path, status):
+        """Build the JSON-lines record for this trace"""
+        return {
+            'request_id': self.request_id,
+            'timestamp': datetime.now().isoformat(),
+            'method': method,
+            'path': path,
+            'status': status,
+            'total_ns': self.elapsed_ns(),
+            'phases_ns': dict(self.phases)
+        }
+
+
+class RequestTracer:
+    """Opt-in request tracing with sampled JSON-lines output"""
+
+    def __init__(self):
+        if getattr(self, '_initialized', False):
+            return
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.trace_file = None
+        self._lock = threading.Lock()
+        self._initialized = True
+
+    def configure(self, enabled=True, sample_rate=1.0, trace_file=None):
+        """Turn tracing on or off; sampled traces are appended to trace_file when set"""
+        self.enabled = enabled
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.trace_file = trace_file
+
+    def start(self, request_id=None):
+        """Start a trace for a new request, or return the shared null trace"""
+        if not self.enabled:
+            return NULL_TRACE
+        sampled = self.trace_file is not None and random.random() < self.sample_rate
+        return RequestTrace(request_id or uuid.uuid4().hex, sampled)
+
+    def finish(self, trace, method, path, status):
+        """Write a sampled trace to the JSON-lines file"""
+        if not trace.sampled:
+            return
+        line = json.dumps(trace.to_record(method, path, status)) + '\n'
+        with self._lock:
+            with open(self.trace_file, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+# Module-level singleton
+tracer_instance = RequestTracer()
@@ -1,29 +1,322 @@
 from datetime import datetime
 import uuid
 import base64
+import http.client
+import io
 import json
+import math
+import socket
+import time
 from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs
 from api.controllers.storage_controller import storage_instance
 from api.controllers.user_controller import user_manager_instance
-from api.models import Transaction
+from api.controllers.metrics_controller import metrics_instance
+from api.controllers.tracing_controller import tracer_instance, NULL_TRACE
+from api.controllers.admission_controller import admission_instance
+from api.controllers.stream_controller import broadcaster_instance
+from api.models import Transaction, parse_fields
+from api.encoder import transaction_encoder
+from api.query import QueryError, run_query
+from api.controllers.storage_controller import INDEXED_FIELDS
+from dsa.money import MONEY_FIELDS, money_fields_to_minor, to_major, to_minor
+from dsa.balance_timeline import GAP_MONEY_FIELDS
+from dsa.etl import parse_time
+from dsa.downsample import lttb
+from dsa.change_log import ResyncRequired
+
+# Routes reported verbatim in metrics; anything else is bucketed to keep label cardinality bounded
+STATIC_ROUTES = {'/', '/transactions', '/users', '/metrics', '/templates', '/quarantine', '/balance', '/balance/gaps',
+                 '/transactions/series', '/transactions/_mget', '/transactions/changes', '/transactions/query',
+                 '/transactions/stream', '/analytics'}
+# Methods reported verbatim in metrics; any other verb a client sends is counted as 'other'
+METRIC_METHODS = {'GET', 'POST', 'PUT', 'DELETE', 'HEAD', 'OPTIONS'}
+
+# GET /transactions/series returns at most this many points
+SERIES_DEFAULT_POINTS = 1000
+SERIES_MAX_POINTS = 10000
+# Most IDs one multi-get request may resolve
+MGET_MAX_IDS = 1000
+# Records one POST /transactions/query response may return
+QUERY_DEFAULT_LIMIT = 1000
+QUERY_MAX_LIMIT = 10000
+# Distinct IDs per GET /transactions/changes page
+CHANGES_DEFAULT_LIMIT = 1000
+CHANGES_MAX_LIMIT = 10000
+# Events a reconnecting stream client may be sent from the change log before it is told to resync
+STREAM_MAX_BACKLOG = 1000
+# Reconnection delay (milliseconds) suggested to EventSource clients
+STREAM_RETRY_MS = 3000
+# Retry-After (seconds) sent with 503 when the in-flight limit is reached
+OVERLOADED_RETRY_AFTER = 1
+
+
+class _DeadlineSocketReader(io.RawIOBase):
+    """Raw socket reader that bounds each read phase by a total deadline, not a per-recv timeout
+
+    A per-recv socket timeout lets a client that trickles one byte at a time hold
+    the connection forever. Here every recv waits at most until the deadline of
+    the current phase ('idle' until the first byte, then 'header', then 'body'),
+    and the socket goes back to `io_timeout` for writes afterwards.
+    """
+
+    def __init__(self, sock, io_timeout):
+        self.sock = sock
+        self.io_timeout = io_timeout
+        self.phase = None
+        self.deadline = None
+        self.expired = None
+        self._header_timeout = None
+
+    def readable(self):
+        return True
+
+    def start(self, phase, timeout, header_timeout=None):
+        """Begin a read phase; with header_timeout, the header phase starts at the first byte"""
+        self.phase = phase
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self._header_timeout = header_timeout
+
+    def readinto(self, buffer):
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                self.expired = self.phase
+                raise TimeoutError(f"{self.phase} timeout")
+            self.sock.settimeout(remaining)
+        try:
+            received = self.sock.recv_into(buffer)
+        except TimeoutError:
+            self.expired = self.phase
+            raise
+        finally:
+            self.sock.settimeout(self.io_timeout)
+        if self._header_timeout is not None and received:
+            self.start('header', self._header_timeout)
+        return received
+
+
+class _HeaderLimitReader:
+    """Wraps rfile while headers are parsed, enforcing a header count and total size
+
+    Raises the http.client exceptions BaseHTTPRequestHandler.parse_request already
+    turns into 431 responses.
+    """
+
+    def __init__(self, rfile, max_count, max_bytes):
+        self.rfile = rfile
+        self.remaining_lines = max_count + 1  # plus the blank line that ends the headers
+        self.remaining_bytes = max_bytes
+
+    def readline(self, limit=-1):
+        if self.remaining_lines <= 0:
+            raise http.client.HTTPException("Too many headers")
+        if limit < 0 or limit > self.remaining_bytes + 1:
+            limit = self.remaining_bytes + 1
+        line = self.rfile.readline(limit)
+        self.remaining_lines -= 1
+        self.remaining_bytes -= len(line)
+        if self.remaining_bytes < 0:
+            raise http.client.LineTooLong("headers")
+        return line
+
+    def __getattr__(self, name):
+        return getattr(self.rfile, name)
+
 
 class TransactionAPIHandler(BaseHTTPRequestHandler):
     """HTTP Request Handler for Transaction API"""
+
+    # Shared singleton instances so data persists across requests; a subclass can
+    # substitute its own (see api.testing.InProcessClient)
+    storage = storage_instance
+    user_manager = user_manager_instance
+    metrics = metrics_instance
+    tracer = tracer_instance
+    admission = admission_instance
+    broadcaster = broadcaster_instance
+
+    # Slow-client protection; server.py overrides these from its command line.
+    # Timeouts are totals in seconds: idle until the first byte of a request, from
+    # there to the end of the headers, and for reading the body. io_timeout bounds
+    # each socket write.
+    idle_timeout = 30
+    header_timeout = 10
+    body_timeout = 30
+    io_timeout = 30
+    max_body_bytes = 1024 * 1024
+    max_header_count = 64
+    max_header_bytes = 16 * 1024
     
     def __init__(self, *args, **kwargs):
-        # Use shared singleton instances so data persists across requests
-        self.storage = storage_instance
-        self.user_manager = user_manager_instance
+        self.trace = NULL_TRACE
+        self._request_start = None
+        self._status_code = None
+        self._admitted = False
+        self._reader = None
         super().__init__(*args, **kwargs)
 
-    def _set_headers(self, status_code=200, content_type='application/json'):
+    def setup(self):
+        """Read the socket through a deadline-bounded reader"""
+        super().setup()
+        self.rfile.close()
+        self._reader = _DeadlineSocketReader(self.connection, self.io_timeout)
+        self.rfile = io.BufferedReader(self._reader)
+        self.connection.settimeout(self.io_timeout)
+
+    def parse_request(self):
+        """Parse the request line and headers, starting the latency clock on success"""
+        rfile = self.rfile
+        self.rfile = _HeaderLimitReader(rfile, self.max_header_count, self.max_header_bytes)
+        try:
+            parsed = super().parse_request()
+        finally:
+            self.rfile = rfile
+        if not parsed:
+            return False
+        if self._reader is not None:
+            self._reader.start('body', self.body_timeout)
+        self._request_start = time.perf_counter()
+        self._status_code = None
+        self.trace = self.tracer.start(self.headers.get('X-Request-ID'))
+        self.metrics.request_started()
+        content_length = self.headers.get('Content-Length')
+        if content_length is not None:
+            if not content_length.isdigit():
+                self.close_connection = True
+                self._send_json(400, {'error': 'Invalid Content-Length'})
+                return False
+            if int(content_length) > self.max_body_bytes:
+                # The body is never read, so the connection cannot be reused
+                self.close_connection = True
+                self.metrics.inc('http_requests_rejected_total', 1,
+                                 'Requests rejected by admission control', reason='body_too_large')
+                self._send_json(413, {'error': f'Request body larger than {self.max_body_bytes} bytes'})
+                return False
+        if not self.admission.try_enter():
+            # Shed load before reading the body or doing any work
+            self.metrics.inc('http_requests_rejected_total', 1,
+                             'Requests rejected by admission control', reason='overloaded')
+            self._send_json(503, {'error': 'Server overloaded', 'retry_after': OVERLOADED_RETRY_AFTER},
+                            headers={'Retry-After': str(OVERLOADED_RETRY_AFTER)})
+            return False
+        self._admitted = True
+        return True
+
+    def handle_one_request(self):
+        """Handle a single request and record its metrics"""
+        if self._reader is not None:
+            self._reader.start('idle', self.idle_timeout, header_timeout=self.header_timeout)
+        try:
+            super().handle_one_request()
+            if self._reader is not None and self._reader.expired:
+                self._timed_out(self._reader.expired)
+        finally:
+            if self._admitted:
+                self._admitted = False
+                self.admission.leave()
+            if self._request_start is not None:
+                duration = time.perf_counter() - self._request_start
+                self._request_start = None
+                self.metrics.request_finished()
+                method = self.command if self.command in METRIC_METHODS else 'other'
+                self.metrics.observe_request(method, self._route_label(),
+                                             str(self._status_code or 0), duration)
+                self.tracer.finish(self.trace, self.command, self.path, self._status_code)
+                self.trace = NULL_TRACE
+
+    def _timed_out(self, phase):
+        """Count a connection dropped by a read timeout; tell the client unless it never sent anything"""
+        self._reader.expired = None
+        self.close_connection = True
+        self.metrics.inc('http_connections_timed_out_total', 1,
+                         'Connections closed because a read phase exceeded its timeout', phase=phase)
+        if phase == 'idle' or self._status_code is not None:
+            return
+        if not getattr(self, 'requestline', None):
+            # Timed out inside the request line
+            self.requestline, self.command, self.request_version = '', '', 'HTTP/1.0'
+        try:
+            self.send_error(408, f"Request {phase} not received in time")
+        except OSError:
+            pass
+
+    def send_response(self, code, message=None):
+        """Remember the status code for metrics before sending it"""
+        self._status_code = code
+        super().send_response(code, message)
+
+    def _route_label(self):
+        """Map the request path onto a bounded route template for metrics"""
+        path = self.path.split('?')[0].rstrip('/') or '/'
+        if path in STATIC_ROUTES:
+            return path
+        resource, resource_id = self._parse_path()
+        if resource == 'transactions' and resource_id:
+            return '/transactions/{id}'
+        return 'other'
+
+    def _set_headers(self, status_code=200, content_type='application/json', headers=None):
         """Set HTTP response headers"""
         self.send_response(status_code)
         self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        if self.trace.enabled:
+            self.send_header('X-Request-ID', self.trace.request_id)
+            self.send_header('Server-Timing', self.trace.server_timing())
         self.end_headers()
+
+    def _send_body(self, status_code, body, content_type='application/json', headers=None):
+        """Send headers followed by an already-encoded response body"""
+        self._set_headers(status_code, content_type, headers)
+        with self.trace.phase('write'):
+            self.wfile.write(body)
+
+    def _send_json(self, status_code, data, indent=None, headers=None):
+        """Encode data as JSON and send it as the response"""
+        with self.trace.phase('encode'):
+            body = json.dumps(data, indent=indent).encode('utf-8')
+        self._send_body(status_code, body, headers=headers)
+
+    def _send_transaction(self, status_code, transaction, encoder=None):
+        """Send one transaction as the response (indented, all fields unless encoder says otherwise)"""
+        encoder = encoder or transaction_encoder(indent=2)
+        with self.trace.phase('encode'):
+            body = encoder.encode(transaction)
+        self._send_body(status_code, body)
+
+    def _send_json_stream(self, status_code, items, chunk_size=256, key=None, extra=None, encode=None):
+        """Send an iterable as a JSON array, encoding and writing it chunk by chunk
+
+        With key, the body is the object {key: [...items], **extra} instead. Items
+        are encoded with encode (json by default; a TransactionEncoder's dumps for
+        transactions). No Content-Length is sent; the HTTP/1.0 connection close
+        ends the body, so the full array is never held in memory.
+        """
+        self._set_headers(status_code)
+        encode_value = json.JSONEncoder().encode
+        encode = encode or encode_value
+        opening = '{' + encode_value(key) + ': [' if key else '['
+        closing = ']'
+        if key:
+            closing += ''.join(f', {encode_value(name)}: {encode_value(value)}' for name, value in (extra or {}).items()) + '}'
+        chunk = []
+        separator = opening
+        for item in items:
+            with self.trace.phase('encode'):
+                chunk.append(separator + encode(item))
+            separator = ','
+            if len(chunk) >= chunk_size:
+                with self.trace.phase('write'):
+                    self.wfile.write(''.join(chunk).encode('utf-8'))
+                chunk = []
+        chunk.append(opening + closing if separator == opening else closing)
+        with self.trace.phase('write'):
+            self.wfile.write(''.join(chunk).encode('utf-8'))
     
     def _authenticate_request(self):
         """Authenticate the incoming request"""
@@ -47,11 +340,18 @@ class TransactionAPIHandler(BaseHTTPRequestHandler):
     
     def _require_auth(self):
         """Check if request requires authentication and validate it"""
-        user = self._authenticate_request()
+        with self.trace.phase('auth'):
+            user = self._authenticate_request()
         if not user:
-            self._set_headers(401)
-            error_response = {'error': 'Authentication required', 'message': 'Please provide valid username:password in Authorization header'}
-            self.wfile.write(json.dumps(error_response).encode('utf-8'))
+            self._send_json(401, {'error': 'Authentication required', 'message': 'Please provide valid username:password in Authorization header'})
+            return False
+        retry_after = self.admission.check_rate(user.username, self.user_manager.rate_limit_for(user))
+        if retry_after:
+            retry_after = math.ceil(retry_after)
+            self.metrics.inc('http_requests_rejected_total', 1,
+                             'Requests rejected by admission control', reason='rate_limited')
+            self._send_json(429, {'error': 'Rate limit exceeded', 'retry_after': retry_after},
+                            headers={'Retry-After': str(retry_after)})
             return False
         return user
 
@@ -64,9 +364,55 @@ class TransactionAPIHandler(BaseHTTPRequestHandler):
             return 'transactions', parts[1] if parts[1] else None
         elif len(parts) == 1 and parts[0] == 'transactions':
             return 'transactions', None
+        elif len(parts) == 1 and parts[0] in ('metrics', 'templates', 'quarantine', 'balance', 'analytics'):
+            return parts[0], None
+        elif len(parts) == 2 and parts[0] == 'balance':
+            return 'balance', parts[1] if parts[1] else None
         else:
             return None, None
 
+    def _query_params(self):
+        """Query string as a dict of single values (the last one wins)"""
+        query = self.path.split('?', 1)[1] if '?' in self.path else ''
+        return {key: values[-1] for key, values in parse_qs(query).items()}
+
+    def _query_time(self, params, name):
+        """Epoch milliseconds for a time query parameter (ISO date/datetime or epoch ms), or None if absent
+
+        Sends a 400 and raises ValueError if the value is invalid.
+        """
+        value = params.get(name)
+        if value is None:
+            return None
+        try:
+            return parse_time(value)
+        except ValueError as e:
+            self._send_json(400, {'error': f"{name}: {e}"})
+            raise
+
+    def _encoder(self, params, indent=None):
+        """Transaction encoder for the ?fields= projection (every field when absent)
+
+        Sends a 400 and raises ValueError if a field is unknown.
+        """
+        if 'fields' not in params:
+            return transaction_encoder(indent=indent)
+        try:
+            return transaction_encoder(parse_fields(params['fields']), indent)
+        except ValueError as e:
+            self._send_json(400, {'error': f"fields: {e}"})
+            raise
+
+    def _require_admin(self):
+        """Authenticate and require the admin role; returns the user or False"""
+        user = self._require_auth()
+        if not user:
+            return False
+        if user.role != 'admin':
+            self._send_json(403, {'error': 'Admin access required'})
+            return False
+        return user
+
     def _read_json_body(self):
         """Read and parse JSON from request body"""
         try:
@@ -86,47 +432,87 @@ class TransactionAPIHandler(BaseHTTPRequestHandler):
             if field not in data or data[field] is None:
                 return False, f"Missing required field: {field}"
         
-        # Validate amount is positive
+        return self._validate_fields(data)
+
+    def _validate_fields(self, data):
+        """Validate the fields present in data: money must be numbers (amount positive), text strings or null"""
         try:
-            amount = float(data['amount'])
-            if amount <= 0:
-                return False, "Amount must be positive"
-        except (ValueError, TypeError):
-            return False, "Amount must be a valid number"
+            Transaction.check_text_fields(data)
+        except ValueError as e:
+            return False, str(e)
+
+        # Validate amount is positive
+        if 'amount' in data:
+            try:
+                amount = to_minor(data['amount'])
+                if amount is None or amount <= 0:
+                    return False, "Amount must be positive"
+            except ValueError:
+                return False, "Amount must be a valid number"
+        
+        # fee and balance_after are optional but must be numbers when given
+        for field in MONEY_FIELDS[1:]:
+            try:
+                to_minor(data.get(field))
+            except ValueError:
+                return False, f"{field} must be a valid number"
         
         return True, None
 
     def do_OPTIONS(self):
         """Handle CORS preflight requests"""
-        self._set_headers(200)
-        self.wfile.write(b'')
+        self._send_body(200, b'')
 
     def do_GET(self):
         """Handle GET requests"""
         resource, resource_id = self._parse_path()
         
-        if resource == 'transactions':
+        if resource == 'metrics':
+            # GET /metrics - Prometheus scrape endpoint (no auth, like the root endpoint)
+            body = self.metrics.render().encode('utf-8')
+            self._send_body(200, body, 'text/plain; version=0.0.4; charset=utf-8')
+        elif resource == 'transactions':
             # Require authentication for transaction endpoints
             user = self._require_auth()
             if not user:
                 return
             
-            if resource_id is None:
-                # GET /transactions - List all transactions
-                transactions = self.storage.get_all()
-                response_data = [txn.to_dict() for txn in transactions]
-                self._set_headers(200)
-                self.wfile.write(json.dumps(response_data, indent=2).encode('utf-8'))
+            params = self._query_params()
+            if resource_id is None and 'ids' in params:
+                # GET /transactions?ids=a,b,c - Multi-get
+                self._send_mget([txn_id for txn_id in params['ids'].split(',') if txn_id])
+            elif resource_id is None:
+                # GET /transactions?fields=a,b - List all transactions
+                try:
+                    encoder = self._encoder(params, indent=2)
+                except ValueError:
+                    return
+                with self.trace.phase('storage'):
+                    transactions = self.storage.get_all()
+                with self.trace.phase('encode'):
+                    body = encoder.encode_list(transactions)
+                self._send_body(200, body)
+            elif resource_id == 'series':
+                # GET /transactions/series?metric=balance|amount&from=&to=&points=N - Downsampled chart data
+                self._send_series()
+            elif resource_id == 'changes':
+                # GET /transactions/changes?since=<token>&limit=N - Delta sync
+                self._send_changes()
+            elif resource_id == 'stream':
+                # GET /transactions/stream - Server-Sent Events (Last-Event-ID to resume)
+                self._send_event_stream()
             else:
-                # GET /transactions/{id} - Get specific transaction
-                transaction = self.storage.get_by_id(resource_id)
+                # GET /transactions/{id}?fields=a,b - Get specific transaction
+                try:
+                    encoder = self._encoder(params, indent=2)
+                except ValueError:
+                    return
+                with self.trace.phase('storage'):
+                    transaction = self.storage.get_by_id(resource_id)
                 if transaction:
-                    self._set_headers(200)
-                    self.wfile.write(json.dumps(transaction.to_dict(), indent=2).encode('utf-8'))
+                    self._send_transaction(200, transaction, encoder)
                 else:
-                    self._set_headers(404)
-                    error_response = {'error': 'Transaction not found'}
-                    self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                    self._send_json(404, {'error': 'Transaction not found'})
         elif resource == 'users':
             # GET /users - List users (admin only)
             user = self._require_auth()
@@ -134,17 +520,91 @@ class TransactionAPIHandler(BaseHTTPRequestHandler):
                 return
             
             if user.role != 'admin':
-                self._set_headers(403)
-                error_response = {'error': 'Admin access required'}
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                self._send_json(403, {'error': 'Admin access required'})
                 return
             
             users_data = [u.to_dict() for u in self.user_manager.users.values()]
-            self._set_headers(200)
-            self.wfile.write(json.dumps(users_data, indent=2).encode('utf-8'))
+            self._send_json(200, users_data, indent=2)
+        elif resource == 'balance':
+            user = self._require_auth()
+            if not user:
+                return
+            
+            params = self._query_params()
+            if resource_id is None:
+                # GET /balance?at=<time> - Balance as of a point in time (default: now)
+                try:
+                    at_ms = self._query_time(params, 'at')
+                except ValueError:
+                    return
+                if at_ms is None:
+                    at_ms = int(time.time() * 1000)
+                with self.trace.phase('storage'):
+                    point = self.storage.timeline.balance_at(at_ms)
+                if point is None:
+                    self._send_json(404, {'error': 'No balance recorded at or before this time'})
+                    return
+                point['balance'] = to_major(point['balance'])
+                point['at'] = datetime.fromtimestamp(at_ms / 1000).isoformat()
+                self._send_json(200, point, indent=2)
+            elif resource_id == 'gaps':
+                # GET /balance/gaps?from=&to= - Points where the balance chain breaks (missing SMS)
+                try:
+                    from_ms = self._query_time(params, 'from')
+                    to_ms = self._query_time(params, 'to')
+                except ValueError:
+                    return
+                gaps = self.storage.timeline.iter_gaps(from_ms, to_ms)
+                self._send_json_stream(200, (self._gap_to_json(gap) for gap in gaps))
+            else:
+                self._send_json(404, {'error': 'Endpoint not found'})
+        elif resource == 'analytics':
+            # GET /analytics?k=N - Amount quantiles per type and top-K receivers, from streaming sketches
+            user = self._require_auth()
+            if not user:
+                return
+            try:
+                k = int(self._query_params().get('k', 10))
+            except ValueError:
+                k = 0
+            with self.trace.phase('storage'):
+                # Merged once across storage partitions
+                analytics = self.storage.analytics
+            capacity = analytics.receivers.capacity
+            if not 1 <= k <= capacity:
+                self._send_json(400, {'error': f'k must be an integer from 1 to {capacity}'})
+                return
+            with self.trace.phase('storage'):
+                quantiles = analytics.amount_quantiles()
+                top = analytics.top_receivers(k)
+            response_data = {
+                'relative_accuracy': analytics.relative_accuracy,
+                'amount_quantiles': {
+                    transaction_type: {name: value if name == 'count' else round(to_major(value), 2)
+                                       for name, value in stats.items()}
+                    for transaction_type, stats in quantiles.items()
+                },
+                'top_receivers': [{'receiver_name': name, 'volume': to_major(volume)} for name, volume in top]
+            }
+            self._send_json(200, response_data, indent=2)
+        elif resource == 'templates':
+            # GET /templates - SMS templates with match counts (admin only)
+            if not self._require_admin():
+                return
+            self._send_json(200, self.storage.template_report(), indent=2)
+        elif resource == 'quarantine':
+            # GET /quarantine?limit=N - Messages no template matched (admin only)
+            if not self._require_admin():
+                return
+            try:
+                limit = int(self._query_params().get('limit', 100))
+            except ValueError:
+                self._send_json(400, {'error': 'limit must be an integer'})
+                return
+            entries = self.storage.quarantine.values()
+            self._send_json(200, {'total': len(entries), 'entries': entries[:max(limit, 0)]}, indent=2)
         else:
             # Root endpoint - API info
-            self._set_headers(200)
             api_info = {
                 'message': 'SMS Transactions REST API',
                 'version': '1.0.0',
@@ -157,14 +617,198 @@ class TransactionAPIHandler(BaseHTTPRequestHandler):
                 'endpoints': {
                     'GET /transactions': 'List all transactions (Auth required)',
                     'GET /transactions/{id}': 'Get specific transaction (Auth required)',
+                    'GET /transactions?ids={id},{id}': 'Get several transactions at once (Auth required)',
+                    'POST /transactions/_mget': 'Get the transactions for a list of IDs (Auth required)',
+                    'POST /transactions/query': 'Transactions matching a JSON boolean filter, with explain (Auth required)',
+                    'GET /transactions/series': 'Downsampled balance or amount series for charts (Auth required)',
+                    'GET /transactions/changes?since={token}': 'Records changed and IDs deleted since a sync token (Auth required)',
+                    'GET /transactions/stream': 'Live create/update/delete/ingest events as Server-Sent Events (Auth required)',
                     'POST /transactions': 'Create new transaction (Auth required)',
                     'PUT /transactions/{id}': 'Update transaction (Auth required)',
                     'DELETE /transactions/{id}': 'Delete transaction (Auth required)',
                     'GET /users': 'List users (Admin only)',
-                    'POST /users': 'Create new user (Admin only)'
+                    'POST /users': 'Create new user (Admin only)',
+                    'GET /metrics': 'Prometheus metrics',
+                    'GET /analytics': 'Amount quantiles per type and top receivers by volume (Auth required)',
+                    'GET /balance?at={time}': 'Balance as of a time (Auth required)',
+                    'GET /balance/gaps': 'Points where the balance history shows missing SMS (Auth required)',
+                    'GET /templates': 'SMS templates and match counts (Admin only)',
+                    'POST /templates': 'Register an SMS template and re-parse quarantined messages (Admin only)',
+                    'GET /quarantine': 'SMS messages no template matched (Admin only)'
                 }
             }
-            self.wfile.write(json.dumps(api_info, indent=2).encode('utf-8'))
+            self._send_json(200, api_info, indent=2)
+
+    def _send_mget(self, transaction_ids):
+        """Stream the transactions for a list of IDs, reporting the IDs that were not found"""
+        if len(transaction_ids) > MGET_MAX_IDS:
+            self._send_json(400, {'error': f'At most {MGET_MAX_IDS} ids per request'})
+            return
+        try:
+            encoder = self._encoder(self._query_params())
+        except ValueError:
+            return
+        with self.trace.phase('storage'):
+            found, missing = self.storage.get_many(transaction_ids)
+        self._send_json_stream(200, found, key='found', extra={'missing': missing}, encode=encoder.dumps)
+
+    def _send_query(self, data):
+        """Stream the transactions matching a filter expression, with the plan if explain is set"""
+        if not isinstance(data, dict):
+            self._send_json(400, {'error': 'Body must be a JSON object: {"filter": {...}, "limit": N, "explain": true}'})
+            return
+        unknown = set(data) - {'filter', 'limit', 'fields', 'explain'}
+        if unknown:
+            self._send_json(400, {'error': f"Unknown keys: {', '.join(sorted(unknown))}"})
+            return
+        limit = data.get('limit', QUERY_DEFAULT_LIMIT)
+        if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= QUERY_MAX_LIMIT:
+            self._send_json(400, {'error': f'limit must be an integer from 1 to {QUERY_MAX_LIMIT}'})
+            return
+        fields = data.get('fields')
+        if isinstance(fields, list) and all(isinstance(field, str) for field in fields):
+            fields = ','.join(fields)
+        if fields is not None and not isinstance(fields, str):
+            self._send_json(400, {'error': 'fields must be a list of field names or a comma-separated string'})
+            return
+        try:
+            encoder = self._encoder({} if fields is None else {'fields': fields})
+        except ValueError:
+            return
+        with self.trace.phase('storage'):
+            try:
+                result = run_query(self.storage, data.get('filter'), limit, INDEXED_FIELDS)
+            except QueryError as e:
+                self._send_json(400, {'error': f"filter: {e}"})
+                return
+        extra = {'count': len(result.transactions), 'has_more': result.has_more}
+        if data.get('explain'):
+            extra['plan'] = result.plan
+        self._send_json_stream(200, result.transactions, key='results', extra=extra, encode=encoder.dumps)
+
+    def _send_changes(self):
+        """Send the records created or updated and the IDs deleted since a sync token, plus the next token
+
+        Without since, only the current token is returned. A token older than the
+        change log (or from another server run) gets 410 and the token to use
+        after a full reload.
+        """
+        params = self._query_params()
+        try:
+            limit = int(params.get('limit', CHANGES_DEFAULT_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= CHANGES_MAX_LIMIT:
+            self._send_json(400, {'error': f'limit must be an integer from 1 to {CHANGES_MAX_LIMIT}'})
+            return
+        try:
+            encoder = self._encoder(params)
+        except ValueError:
+            return
+        changes = self.storage.changes
+        token = params.get('since')
+        if not token:
+            self._send_json(200, {'changes': [], 'deleted': [], 'next': changes.token(), 'has_more': False})
+            return
+        with self.trace.phase('storage'):
+            try:
+                latest, covered = changes.since(changes.parse_token(token), limit)
+            except ValueError as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            except ResyncRequired as e:
+                self._send_json(410, {'error': 'Resync required', 'message': str(e),
+                                      'resync_required': True, 'next': changes.token()})
+                return
+            found, missing = self.storage.get_many([txn_id for txn_id, deleted in latest if not deleted])
+        # Records updated and then deleted after `covered` are reported as deleted already
+        deleted = [txn_id for txn_id, is_deleted in latest if is_deleted] + missing
+        self._send_json_stream(200, found, key='changes', encode=encoder.dumps,
+                               extra={'deleted': deleted, 'next': changes.token(covered),
+                                      'has_more': covered < changes.last_sequence})
+
+    def _send_event_stream(self):
+        """Send the missed events (with Last-Event-ID) and hand the connection to the broadcaster
+
+        The handler returns right after the hand-off, so an idle subscriber holds no
+        request thread. Connections without a socket (the in-process test client)
+        end after the backlog.
+        """
+        changes = self.storage.changes
+        last_event_id = self.headers.get('Last-Event-ID') or self._query_params().get('since')
+        position = changes.last_sequence
+        backlog = []
+        resync = False
+        if last_event_id:
+            try:
+                position = changes.parse_token(last_event_id)
+                backlog = changes.events(position, STREAM_MAX_BACKLOG + 1)
+            except ValueError as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            except ResyncRequired:
+                resync = True
+            if resync or len(backlog) > STREAM_MAX_BACKLOG:
+                resync = True
+                backlog = []
+                position = changes.last_sequence
+
+        self._set_headers(200, 'text/event-stream', headers={'Cache-Control': 'no-cache'})
+        frames = [f"retry: {STREAM_RETRY_MS}\n\n".encode('utf-8')]
+        if resync:
+            frames.append(self.broadcaster.resync_frame())
+        with self.trace.phase('serialize'):
+            for sequence, transaction_id, kind in backlog:
+                frames.append(self.broadcaster.render(sequence, transaction_id, kind))
+                position = sequence
+        with self.trace.phase('write'):
+            self.wfile.write(b''.join(frames))
+
+        detach = getattr(self.connection, 'detach', None)
+        if detach is not None:
+            # The server's shutdown_request() then finds a closed socket object and leaves the fd alone
+            self.broadcaster.subscribe(socket.socket(fileno=detach()), position)
+
+    def _send_series(self):
+        """Send a balance or amount series downsampled to at most `points` points (LTTB)"""
+        params = self._query_params()
+        metric = params.get('metric', 'balance')
+        if metric not in ('balance', 'amount'):
+            self._send_json(400, {'error': "metric must be 'balance' or 'amount'"})
+            return
+        try:
+            points = int(params.get('points', SERIES_DEFAULT_POINTS))
+        except ValueError:
+            points = 0
+        if not 3 <= points <= SERIES_MAX_POINTS:
+            self._send_json(400, {'error': f'points must be an integer from 3 to {SERIES_MAX_POINTS}'})
+            return
+        try:
+            from_ms = self._query_time(params, 'from')
+            to_ms = self._query_time(params, 'to')
+        except ValueError:
+            return
+        
+        with self.trace.phase('storage'):
+            times, values = self.storage.timeline.series(metric, from_ms, to_ms)
+            kept = lttb(times, values, points)
+        with self.trace.phase('serialize'):
+            response_data = {
+                'metric': metric,
+                'from': from_ms,
+                'to': to_ms,
+                'total': len(times),
+                'points': len(kept),
+                'series': [[times[i], to_major(values[i])] for i in kept]
+            }
+        self._send_json(200, response_data)
+
+    @staticmethod
+    def _gap_to_json(gap):
+        """Convert a balance gap's money fields to RWF"""
+        for field in GAP_MONEY_FIELDS:
+            gap[field] = to_major(gap[field])
+        return gap
 
     def do_POST(self):
         """Handle POST requests"""
@@ -178,30 +822,42 @@ class TransactionAPIHandler(BaseHTTPRequestHandler):
             
             data = self._read_json_body()
             if data is None:
-                self._set_headers(400)
-                error_response = {'error': 'Invalid JSON data'}
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                self._send_json(400, {'error': 'Invalid JSON data'})
                 return
             
             # Validate data
             is_valid, error_message = self._validate_transaction_data(data)
             if not is_valid:
-                self._set_headers(400)
-                error_response = {'error': error_message}
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                self._send_json(400, {'error': error_message})
                 return
             
             # Create transaction
             transaction = Transaction.from_dict(data)
-            created_transaction = self.storage.create(transaction)
+            with self.trace.phase('storage'):
+                created_transaction = self.storage.create(transaction)
             
             if created_transaction:
-                self._set_headers(201)
-                self.wfile.write(json.dumps(created_transaction.to_dict(), indent=2).encode('utf-8'))
+                self._send_transaction(201, created_transaction)
             else:
-                self._set_headers(409)
-                error_response = {'error': 'Transaction ID already exists'}
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                self._send_json(409, {'error': 'Transaction ID already exists'})
+        elif resource == 'transactions' and resource_id == 'query':
+            # POST /transactions/query {"filter": {...}, "limit": N, "fields": "a,b", "explain": true}
+            user = self._require_auth()
+            if not user:
+                return
+            self._send_query(self._read_json_body())
+        elif resource == 'transactions' and resource_id == '_mget':
+            # POST /transactions/_mget {"ids": [...]} - Multi-get with one auth check
+            user = self._require_auth()
+            if not user:
+                return
+            
+            data = self._read_json_body()
+            ids = data.get('ids') if isinstance(data, dict) else None
+            if not isinstance(ids, list) or not all(isinstance(txn_id, str) for txn_id in ids):
+                self._send_json(400, {'error': 'Body must be {"ids": [transaction_id, ...]}'})
+                return
+            self._send_mget(ids)
         elif resource == 'users' and resource_id is None:
             # POST /users - Create new user (admin only)
             user = self._require_auth()
@@ -209,23 +865,17 @@ class TransactionAPIHandler(BaseHTTPRequestHandler):
                 return
             
             if user.role != 'admin':
-                self._set_headers(403)
-                error_response = {'error': 'Admin access required'}
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                self._send_json(403, {'error': 'Admin access required'})
                 return
             
             data = self._read_json_body()
             if data is None:
-                self._set_headers(400)
-                error_response = {'error': 'Invalid JSON data'}
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                self._send_json(400, {'error': 'Invalid JSON data'})
                 return
             
             # Validate required fields
             if 'username' not in data or 'password' not in data:
-                self._set_headers(400)
-                error_response = {'error': 'Username and password are required'}
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                self._send_json(400, {'error': 'Username and password are required'})
                 return
             
             # Create user
@@ -234,16 +884,31 @@ class TransactionAPIHandler(BaseHTTPRequestHandler):
             
             if success:
                 new_user = self.user_manager.get_user(data['username'])
-                self._set_headers(201)
-                self.wfile.write(json.dumps(new_user.to_dict(), indent=2).encode('utf-8'))
+                self._send_json(201, new_user.to_dict(), indent=2)
             else:
-                self._set_headers(409)
-                error_response = {'error': 'Username already exists'}
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                self._send_json(409, {'error': 'Username already exists'})
+        elif resource == 'templates':
+            # POST /templates - Register a template, then re-parse only the quarantine (admin only)
+            if not self._require_admin():
+                return
+            
+            data = self._read_json_body()
+            if data is None:
+                self._send_json(400, {'error': 'Invalid JSON data'})
+                return
+            
+            try:
+                with self.trace.phase('storage'):
+                    result = self.storage.register_template(data)
+            except ValueError as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            except KeyError as e:
+                self._send_json(409, {'error': e.args[0]})
+                return
+            self._send_json(201, result, indent=2)
         else:
-            self._set_headers(404)
-            error_response = {'error': 'Endpoint not found'}
-            self.wfile.write(json.dumps(error_response).encode('utf-8'))
+            self._send_json(404, {'error': 'Endpoint not found'})
 
     def do_PUT(self):
         """Handle PUT requests"""
@@ -257,33 +922,24 @@ class TransactionAPIHandler(BaseHTTPRequestHandler):
             
             data = self._read_json_body()
             if data is None:
-                self._set_headers(400)
-                error_response = {'error': 'Invalid JSON data'}
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                self._send_json(400, {'error': 'Invalid JSON data'})
                 return
             
-            # Validate data if amount is provided
-            if 'amount' in data:
-                is_valid, error_message = self._validate_transaction_data(data)
-                if not is_valid:
-                    self._set_headers(400)
-                    error_response = {'error': error_message}
-                    self.wfile.write(json.dumps(error_response).encode('utf-8'))
-                    return
+            # Validate money fields if provided
+            is_valid, error_message = self._validate_fields(data)
+            if not is_valid:
+                self._send_json(400, {'error': error_message})
+                return
             
-            # Update transaction
-            updated_transaction = self.storage.update(resource_id, data)
+            # Update transaction (storage holds money in minor units)
+            with self.trace.phase('storage'):
+                updated_transaction = self.storage.update(resource_id, money_fields_to_minor(data))
             if updated_transaction:
-                self._set_headers(200)
-                self.wfile.write(json.dumps(updated_transaction.to_dict(), indent=2).encode('utf-8'))
+                self._send_transaction(200, updated_transaction)
             else:
-                self._set_headers(404)
-                error_response = {'error': 'Transaction not found'}
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                self._send_json(404, {'error': 'Transaction not found'})
         else:
-            self._set_headers(404)
-            error_response = {'error': 'Endpoint not found'}
-            self.wfile.write(json.dumps(error_response).encode('utf-8'))
+            self._send_json(404, {'error': 'Endpoint not found'})
 
     def do_DELETE(self):
         """Handle DELETE requests"""
@@ -295,19 +951,17 @@ class TransactionAPIHandler(BaseHTTPRequestHandler):
             if not user:
                 return
             
-            deleted_transaction = self.storage.delete(resource_id)
+            with self.trace.phase('storage'):
+                deleted_transaction = self.storage.delete(resource_id)
             if deleted_transaction:
-                self._set_headers(200)
-                response_data = {'message': 'Transaction deleted successfully', 'deleted_transaction': deleted_transaction.to_dict()}
-                self.wfile.write(json.dumps(response_data, indent=2).encode('utf-8'))
+                with self.trace.phase('encode'):
+                    body = transaction_encoder(indent=2).encode_wrapped(
+                        deleted_transaction, 'deleted_transaction', {'message': 'Transaction deleted successfully'})
+                self._send_body(200, body)
             else:
-                self._set_headers(404)
-                error_response = {'error': 'Transaction not found'}
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
+                self._send_json(404, {'error': 'Transaction not found'})
         else:
-            self._set_headers(404)
-            error_response = {'error': 'Endpoint not found'}
-            self.wfile.write(json.dumps(error_response).encode('utf-8'))
+            self._send_json(404, {'error': 'Endpoint not found'})
 
     def log_message(self, format, *args):
         """Override to customize log format"""
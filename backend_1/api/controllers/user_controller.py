@@ -1,11 +1,16 @@
 from api.models import User
 
+# Request rate limits per role as (requests per second, burst); None means unlimited.
+# Roles without an entry get the 'user' limit.
+DEFAULT_RATE_LIMITS = {'admin': None, 'user': (20.0, 40)}
+
 class UserManager:
     """Manages user authentication"""
     def __init__(self):
         if getattr(self, '_initialized', False):
             return
         self.users = {}
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS)
         self._load_default_users()
         self._initialized = True
     
@@ -41,5 +46,26 @@ class UserManager:
         """Get user by username"""
         return self.users.get(username)
 
+    def set_rate_limit(self, role, rate, burst=None):
+        """Limit a role to `rate` requests per second with bursts of `burst` (default 2x rate)
+
+        A rate of None removes the limit.
+        """
+        if rate is None:
+            self.rate_limits[role] = None
+            return
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        burst = burst if burst is not None else max(1, 2 * rate)
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate_limits[role] = (float(rate), burst)
+
+    def rate_limit_for(self, user):
+        """(requests per second, burst) for the user's role, or None if unlimited"""
+        if user.role in self.rate_limits:
+            return self.rate_limits[user.role]
+        return self.rate_limits.get('user')
+
 # Module-level singleton
 user_manager_instance = UserManager()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Fast JSON encoding of Transaction records
+
+Output is byte-for-byte what json.dumps gives for Transaction.to_dict() (or a
+?fields= subset) with the same indent, without building the dict or walking it
+generically.
+"""
+
+import json
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+
+from api.models import Transaction
+from dsa.money import MINOR_PER_UNIT, MONEY_FIELDS, to_major
+
+_float_repr = float.__repr__
+
+
+def _encode_value(value, indent, level):
+    """json.dumps output for a value that missed the fast paths, nested `level` deep"""
+    text = json.dumps(value, indent=indent)
+    if indent is not None and level:
+        text = text.replace('\n', '\n' + ' ' * (indent * level))
+    return text
+
+
+class TransactionEncoder:
+    """Encodes Transaction records as JSON, identically to json.dumps(to_dict(), indent=indent)
+
+    Each record is rendered by a function generated once for the field set: the
+    key fragments, separators and indentation are precomputed into a single
+    %-format template, and each attribute is read once and converted with an
+    inline fast path (encode_basestring_ascii for str, float repr of the minor
+    units for money) before falling back to json.dumps for anything else.
+    Records are written into a bytearray that callers may reuse between calls.
+    """
+
+    def __init__(self, fields=Transaction.FIELDS, indent=None):
+        unknown = set(fields).difference(Transaction.FIELDS)
+        if unknown or not fields:
+            raise ValueError(f"Invalid fields: {', '.join(sorted(unknown)) or '(none)'}")
+        self.fields = tuple(fields)
+        self.indent = indent
+        self._record = self._compile(0)
+        # Records inside a list are one level deeper
+        self._item = self._compile(1) if indent is not None else self._record
+
+    def _compile(self, level):
+        """Generate the function rendering one record nested `level` deep as a str"""
+        if self.indent is None:
+            opening, separator, closing = '{', ', ', '}'
+        else:
+            inner = '\n' + ' ' * (self.indent * (level + 1))
+            opening, separator, closing = '{' + inner, ',' + inner, '\n' + ' ' * (self.indent * level) + '}'
+        template = opening + separator.join(
+            encode_basestring_ascii(field).replace('%', '%%') + ': %s' for field in self.fields) + closing
+
+        lines = ['def render(t):']
+        values = []
+        for number, field in enumerate(self.fields):
+            name = f'v{number}'
+            lines.append(f'    {name} = t.{field}')
+            fallback = f'other({{}}, indent, {level + 1})'
+            if field in MONEY_FIELDS:
+                values.append(f"('null' if {name} is None else float_repr({name} / {MINOR_PER_UNIT}) "
+                              f"if {name}.__class__ is int else {fallback.format(f'to_major({name})')})")
+            else:
+                values.append(f"(escape({name}) if {name}.__class__ is str else 'null' if {name} is None "
+                              f"else {fallback.format(name)})")
+        lines.append(f"    return TEMPLATE % ({', '.join(values)},)")
+        namespace = {'TEMPLATE': template, 'escape': encode_basestring_ascii, 'float_repr': _float_repr,
+                     'to_major': to_major, 'other': _encode_value, 'indent': self.indent}
+        exec('\n'.join(lines) + '\n', namespace)
+        return namespace['render']
+
+    def dumps(self, transaction):
+        """The record as a JSON str"""
+        return self._record(transaction)
+
+    def encode(self, transaction, buffer=None):
+        """Append the record's JSON to buffer (a new bytearray by default) and return it"""
+        if buffer is None:
+            buffer = bytearray()
+        # ensure_ascii output: encoding is a plain copy
+        buffer += self._record(transaction).encode('ascii')
+        return buffer
+
+    def encode_list(self, transactions, buffer=None):
+        """Append the JSON array of the records to buffer (a new bytearray by default) and return it"""
+        if buffer is None:
+            buffer = bytearray()
+        render = self._item
+        if self.indent is None:
+            opening, separator, closing = '[', ', ', ']'
+        else:
+            opening, separator, closing = '[\n' + ' ' * self.indent, ',\n' + ' ' * self.indent, '\n]'
+        first = True
+        for transaction in transactions:
+            buffer += ((opening if first else separator) + render(transaction)).encode('ascii')
+            first = False
+        buffer += b'[]' if first else closing.encode('ascii')
+        return buffer
+
+    def encode_wrapped(self, transaction, key, extra=None, buffer=None):
+        """Append the JSON object {**extra, key: record} to buffer (a new bytearray by default) and return it"""
+        if buffer is None:
+            buffer = bytearray()
+        if self.indent is None:
+            opening, separator, closing = '{', ', ', '}'
+        else:
+            inner = '\n' + ' ' * self.indent
+            opening, separator, closing = '{' + inner, ',' + inner, '\n}'
+        members = [f'{encode_basestring_ascii(name)}: {_encode_value(value, self.indent, 1)}'
+                   for name, value in (extra or {}).items()]
+        members.append(f'{encode_basestring_ascii(key)}: {self._item(transaction)}')
+        buffer += (opening + separator.join(members) + closing).encode('ascii')
+        return buffer
+
+
+@lru_cache(maxsize=256)
+def transaction_encoder(fields=Transaction.FIELDS, indent=None):
+    """Shared TransactionEncoder for a field set (a tuple from parse_fields) and indent"""
+    return TransactionEncoder(fields, indent)
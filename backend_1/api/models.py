@@ -6,6 +6,7 @@ Data models for SMS Transactions API
 from datetime import datetime
 import uuid
 import hashlib
+from dsa.money import MONEY_FIELDS, money_fields_to_minor, to_major
 
 class User:
     """User data model for authentication"""
@@ -23,7 +24,17 @@ class User:
         }
 
 class Transaction:
-    """Transaction data model"""
+    """Transaction data model
+
+    amount, fee and balance_after are integer minor units (see dsa.money);
+    to_dict/from_dict convert to and from RWF for JSON.
+    """
+    # Keys of to_dict(), in output order
+    FIELDS = ('transaction_id', 'sender_name', 'receiver_name', 'amount', 'fee', 'balance_after',
+              'transaction_date', 'transaction_type', 'status', 'remarks', 'created_at', 'updated_at')
+    # Fields that hold text (or null); they are used as index and sketch keys, so nothing else is accepted
+    TEXT_FIELDS = tuple(field for field in FIELDS if field not in MONEY_FIELDS)
+
     def __init__(self, transaction_id=None, sender_name=None, receiver_name=None, 
                  amount=None, fee=0, balance_after=None, transaction_date=None, 
                  transaction_type=None, status="Completed", remarks=None):
@@ -46,9 +57,9 @@ class Transaction:
             'transaction_id': self.transaction_id,
             'sender_name': self.sender_name,
             'receiver_name': self.receiver_name,
-            'amount': self.amount,
-            'fee': self.fee,
-            'balance_after': self.balance_after,
+            'amount': to_major(self.amount),
+            'fee': to_major(self.fee),
+            'balance_after': to_major(self.balance_after),
             'transaction_date': self.transaction_date,
             'transaction_type': self.transaction_type,
             'status': self.status,
@@ -57,11 +68,43 @@ class Transaction:
             'updated_at': self.updated_at
         }
 
+    @classmethod
+    def check_text_fields(cls, data):
+        """Raise ValueError naming the first text field in data holding something other than a string or null"""
+        for field in cls.TEXT_FIELDS:
+            value = data.get(field)
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"{field} must be a string or null")
+
     @classmethod
     def from_dict(cls, data):
-        """Create transaction from dictionary"""
+        """Create transaction from dictionary (money in RWF, as in the JSON API)
+
+        Raises ValueError for invalid money or text fields.
+        """
+        cls.check_text_fields(data)
+        return cls.from_record(money_fields_to_minor(data))
+
+    @classmethod
+    def from_record(cls, data):
+        """Create transaction from a parsed record whose money fields are already minor units"""
         transaction = cls()
         for key, value in data.items():
             if hasattr(transaction, key):
                 setattr(transaction, key, value)
         return transaction
+
+
+def parse_fields(text):
+    """Field tuple for a ?fields= value such as 'amount,status', in to_dict order
+
+    Raises ValueError naming the unknown fields, or if none are given.
+    """
+    requested = {field.strip() for field in text.split(',')} - {''}
+    unknown = requested.difference(Transaction.FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))} "
+                         f"(valid: {', '.join(Transaction.FIELDS)})")
+    if not requested:
+        raise ValueError("fields must name at least one field")
+    return tuple(field for field in Transaction.FIELDS if field in requested)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Boolean filter language and index-aware planner for POST /transactions/query
+
+A filter is JSON: comparisons {"field": ..., "op": ..., "value": ...} combined
+with {"and": [...]}, {"or": [...]} and {"not": ...}. Money values are RWF and
+date values are ISO dates/datetimes or epoch milliseconds, as elsewhere in the API.
+"""
+
+import json
+import math
+import time
+
+from api.models import Transaction
+from dsa.balance_timeline import timestamp_ms
+from dsa.etl import parse_time
+from dsa.money import MONEY_FIELDS, to_minor
+
+DATE_FIELDS = ('transaction_date', 'created_at', 'updated_at')
+# Operator -> how it is shown in plans
+OPERATORS = {'eq': '=', 'ne': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=',
+             'in': 'IN', 'contains': 'CONTAINS', 'last_days': 'IN LAST DAYS'}
+# Deepest nesting and most comparisons accepted in one filter
+MAX_DEPTH = 16
+MAX_COMPARISONS = 100
+# Longest last_days window (about 1000 years)
+MAX_LAST_DAYS = 366000
+# An index whose estimate is more than this many times the current candidates is checked per row instead
+INTERSECT_RATIO = 4
+DAY_MS = 86400 * 1000
+
+
+class QueryError(ValueError):
+    """The filter is not valid; the message says why"""
+
+
+class Comparison:
+    """One field compared with a constant (converted to storage units when parsed)"""
+
+    def __init__(self, field, op, value):
+        if not isinstance(field, str) or field not in Transaction.FIELDS:
+            raise QueryError(f"Unknown field '{field}' (valid: {', '.join(Transaction.FIELDS)})")
+        if not isinstance(op, str) or op not in OPERATORS:
+            raise QueryError(f"Unknown op '{op}' (valid: {', '.join(OPERATORS)})")
+        self.field = field
+        self.op = op
+        self.raw = value
+        if op == 'in':
+            if not isinstance(value, list) or not value:
+                raise QueryError(f"{field}: 'in' needs a non-empty list of values")
+            self.value = frozenset(self._convert(item) for item in value)
+        elif op == 'contains':
+            if field in MONEY_FIELDS or field in DATE_FIELDS or not isinstance(value, str):
+                raise QueryError(f"{field}: 'contains' needs a text field and a string value")
+            self.value = value.lower()
+        elif op == 'last_days':
+            if field not in DATE_FIELDS or isinstance(value, bool) or not isinstance(value, (int, float)) \
+                    or not math.isfinite(value) or not 0 < value <= MAX_LAST_DAYS:
+                raise QueryError(f"{field}: 'last_days' needs a date field and a number of days "
+                                 f"above 0 and at most {MAX_LAST_DAYS}")
+            self.value = value
+        else:
+            self.value = self._convert(value)
+
+    def _convert(self, value):
+        if value is None:
+            return None
+        try:
+            if self.field in MONEY_FIELDS:
+                return to_minor(value)
+            if self.field in DATE_FIELDS:
+                if isinstance(value, bool) or not isinstance(value, (str, int)):
+                    raise ValueError(f"Invalid time {value!r}")
+                return parse_time(str(value))
+        except ValueError as e:
+            raise QueryError(f"{self.field}: {e}")
+        if not isinstance(value, (str, int, float)):
+            raise QueryError(f"{self.field}: values must be strings, numbers or null")
+        return value
+
+    def date_range(self, now_ms):
+        """[from_ms, to_ms) selected by this comparison on a date field, or None if it is not a range"""
+        if self.op == 'last_days':
+            return now_ms - int(self.value * DAY_MS), None
+        if self.value is None or self.op in ('ne', 'in', 'contains'):
+            return None
+        return {'eq': (self.value, self.value + 1), 'gt': (self.value + 1, None), 'gte': (self.value, None),
+                'lt': (None, self.value), 'lte': (None, self.value + 1)}[self.op]
+
+    def matches(self, transaction, now_ms):
+        actual = getattr(transaction, self.field)
+        if self.field in DATE_FIELDS:
+            actual = timestamp_ms(actual)
+        op = self.op
+        try:
+            if op == 'eq':
+                return actual == self.value
+            if op == 'ne':
+                return actual != self.value
+            if op == 'in':
+                return actual in self.value
+            if actual is None:
+                return False
+            if op == 'contains':
+                return isinstance(actual, str) and self.value in actual.lower()
+            if op == 'last_days':
+                return actual >= now_ms - int(self.value * DAY_MS)
+            if self.value is None:
+                return False
+            if op == 'gt':
+                return actual > self.value
+            if op == 'gte':
+                return actual >= self.value
+            if op == 'lt':
+                return actual < self.value
+            return actual <= self.value
+        except TypeError:
+            return False  # e.g. a number compared with text
+
+    def describe(self):
+        return f"{self.field} {OPERATORS[self.op]} {json.dumps(self.raw)}"
+
+
+class And:
+    def __init__(self, children):
+        self.children = children
+
+    def matches(self, transaction, now_ms):
+        return all(child.matches(transaction, now_ms) for child in self.children)
+
+    def describe(self):
+        return '(' + ' AND '.join(child.describe() for child in self.children) + ')'
+
+
+class Or:
+    def __init__(self, children):
+        self.children = children
+
+    def matches(self, transaction, now_ms):
+        return any(child.matches(transaction, now_ms) for child in self.children)
+
+    def describe(self):
+        return '(' + ' OR '.join(child.describe() for child in self.children) + ')'
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def matches(self, transaction, now_ms):
+        return not self.child.matches(transaction, now_ms)
+
+    def describe(self):
+        return f"NOT {self.child.describe()}"
+
+
+def parse_filter(spec):
+    """Filter tree for a JSON filter; raises QueryError if it is invalid"""
+    counter = [0]
+
+    def parse(node, depth):
+        if depth > MAX_DEPTH:
+            raise QueryError(f"Filter is nested more than {MAX_DEPTH} levels deep")
+        if not isinstance(node, dict):
+            raise QueryError(f"Expected an object, got {json.dumps(node)}")
+        if 'field' in node:
+            unknown = set(node) - {'field', 'op', 'value'}
+            if unknown:
+                raise QueryError(f"Unexpected keys in comparison: {', '.join(sorted(unknown))}")
+            counter[0] += 1
+            if counter[0] > MAX_COMPARISONS:
+                raise QueryError(f"At most {MAX_COMPARISONS} comparisons per filter")
+            return Comparison(node['field'], node.get('op', 'eq'), node.get('value'))
+        if len(node) != 1:
+            raise QueryError('Each node needs exactly one of "and", "or", "not" or a "field" comparison')
+        (key, value), = node.items()
+        if key in ('and', 'or'):
+            if not isinstance(value, list) or not value:
+                raise QueryError(f'"{key}" needs a non-empty list')
+            children = [parse(child, depth + 1) for child in value]
+            return And(children) if key == 'and' else Or(children)
+        if key == 'not':
+            return Not(parse(value, depth + 1))
+        raise QueryError(f"Unknown node '{key}' (use and, or, not or field/op/value)")
+
+    return parse(spec, 1)
+
+
+class _IndexAccess:
+    """Candidate IDs for a predicate from storage indexes; exact, so the predicate needs no re-check"""
+
+    def __init__(self, node, index, estimate, fetch):
+        self.node = node
+        self.index = index
+        self.estimate = estimate
+        self.fetch = fetch
+
+    def explain(self):
+        return {'predicate': self.node.describe(), 'index': self.index, 'estimated_rows': self.estimate}
+
+
+def _access(node, storage, indexed_fields, now_ms):
+    """_IndexAccess answering node exactly from the indexes, or None if it needs a scan"""
+    if isinstance(node, Comparison):
+        if node.field in indexed_fields and node.op in ('eq', 'in'):
+            values = node.value if node.op == 'in' else (node.value,)
+            return _IndexAccess(node, node.field, sum(storage.lookup_count(node.field, value) for value in values),
+                                lambda: set().union(*(storage.lookup(node.field, value) for value in values)))
+        date_range = node.date_range(now_ms) if node.field == 'transaction_date' else None
+        if date_range is not None:
+            return _IndexAccess(node, 'transaction_date', storage.timeline.count_between(*date_range),
+                                lambda: set(storage.timeline.ids_between(*date_range)))
+        return None
+    if isinstance(node, (And, Or)):
+        accesses = [_access(child, storage, indexed_fields, now_ms) for child in node.children]
+        if any(access is None for access in accesses):
+            return None
+        if isinstance(node, Or):
+            return _IndexAccess(node, 'union', sum(access.estimate for access in accesses),
+                                lambda: set().union(*(access.fetch() for access in accesses)))
+        return _IndexAccess(node, 'intersection', min(access.estimate for access in accesses),
+                            lambda: set.intersection(*(access.fetch() for access in accesses)))
+    return None
+
+
+class QueryResult:
+    def __init__(self, transactions, has_more, plan):
+        self.transactions = transactions
+        self.has_more = has_more
+        self.plan = plan
+
+
+def run_query(storage, spec, limit, indexed_fields, now_ms=None):
+    """Transactions matching a JSON filter (None: all), in storage order, at most limit of them
+
+    The top-level conjuncts that the indexes answer exactly are ordered by
+    estimated rows: the smallest gives the candidate IDs, the others are
+    intersected in while they are at most INTERSECT_RATIO times the candidates,
+    and everything left is evaluated only on the surviving records. Without
+    any usable index every record is scanned.
+    """
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    node = parse_filter(spec) if spec is not None else And([])
+    conjuncts = node.children if isinstance(node, And) else [node]
+    accesses = []
+    residual = []
+    for conjunct in conjuncts:
+        access = _access(conjunct, storage, indexed_fields, now_ms)
+        (residual if access is None else accesses).append(access or conjunct)
+    accesses.sort(key=lambda access: access.estimate)
+
+    index_scans = []
+    if accesses:
+        candidates = accesses[0].fetch()
+        index_scans.append(accesses[0].explain())
+        for access in accesses[1:]:
+            if access.estimate <= len(candidates) * INTERSECT_RATIO:
+                candidates &= access.fetch()
+                index_scans.append(access.explain())
+            else:
+                residual.append(access.node)
+        found, _ = storage.get_many(storage.transactions.in_order(candidates))
+    else:
+        found = storage.get_all()
+    plan = {'strategy': 'index' if accesses else 'full_scan', 'total_rows': len(storage.transactions),
+            'index_scans': index_scans, 'candidates': len(found),
+            'residual': [node.describe() for node in residual]}
+
+    matched = []
+    examined = 0
+    has_more = False
+    for transaction in found:
+        examined += 1
+        if all(node.matches(transaction, now_ms) for node in residual):
+            if len(matched) == limit:
+                has_more = True
+                break
+            matched.append(transaction)
+    plan['examined'] = examined
+    plan['returned'] = len(matched)
+    return QueryResult(matched, has_more, plan)
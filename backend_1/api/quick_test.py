@@ -63,7 +63,7 @@ def test_basic_functionality():
         test_txn = Transaction(
             sender_name="Test Sender",
             receiver_name="Test Receiver",
-            amount=100.0,
+            amount=10000,  # minor units: 100 RWF
             transaction_type="Test"
         )
         created = storage.create(test_txn)
@@ -76,15 +76,15 @@ def test_basic_functionality():
         
         # Read
         retrieved = storage.get_by_id(txn_id)
-        if retrieved and retrieved.amount == 100.0:
+        if retrieved and retrieved.to_dict()['amount'] == 100.0:
             print("READ works")
         else:
             print("READ failed")
             return False
         
         # Update
-        updated = storage.update(txn_id, {"amount": 200.0, "status": "Updated"})
-        if updated and updated.amount == 200.0:
+        updated = storage.update(txn_id, {"amount": 20000, "status": "Updated"})
+        if updated and updated.to_dict()['amount'] == 200.0:
             print("UPDATE works")
         else:
             print("UPDATE failed")
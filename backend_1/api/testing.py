@@ -0,0 +1,136 @@
+import base64
+import http.client
+import io
+import json
+from types import SimpleNamespace
+
+from api.controllers.transactions_controller import TransactionAPIHandler
+
+
+class _InMemoryConnection:
+    """Stands in for the client socket: the request is read from memory and the response kept"""
+
+    def __init__(self, raw_request):
+        self.raw_request = raw_request
+        self.raw_response = b''
+
+
+class _ResponseSocket:
+    """Just enough of a socket for http.client.HTTPResponse to parse bytes already received"""
+
+    def __init__(self, raw_response):
+        self.raw_response = raw_response
+
+    def makefile(self, mode, *args, **kwargs):
+        return io.BytesIO(self.raw_response)
+
+
+def _in_memory_handler(handler_class):
+    """Subclass of handler_class that serves one in-memory connection instead of a socket"""
+
+    class InMemoryHandler(handler_class):
+        def setup(self):
+            self.connection = self.request
+            self.rfile = io.BytesIO(self.request.raw_request)
+            self.wfile = io.BytesIO()
+
+        def finish(self):
+            self.connection.raw_response = self.wfile.getvalue()
+            self.wfile.close()
+            self.rfile.close()
+
+        def log_message(self, format, *args):
+            pass
+
+    InMemoryHandler.__name__ = InMemoryHandler.__qualname__ = f"InMemory{handler_class.__name__}"
+    return InMemoryHandler
+
+
+class Response:
+    """A parsed HTTP response: status, reason, headers (case-insensitive) and the raw body"""
+
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.body)
+
+    def __repr__(self):
+        return f"<Response {self.status} {self.reason}>"
+
+
+def parse_response(raw, method='GET'):
+    """Parse raw response bytes, including close-delimited bodies without Content-Length"""
+    response = http.client.HTTPResponse(_ResponseSocket(raw), method=method)
+    response.begin()
+    body = response.read()
+    return Response(response.status, response.reason, response.msg, body)
+
+
+class InProcessClient:
+    """Drives TransactionAPIHandler (or a subclass) in-process, without sockets or threads
+
+    Every request is encoded as raw HTTP bytes, handled by a fresh handler instance
+    reading from an in-memory rfile and writing to an in-memory wfile, and the bytes
+    written are parsed back into a Response. Keyword arguments replace the handler's
+    class-level dependencies (storage, user_manager, metrics, tracer, admission), so a test can
+    run against its own TransactionStorage without touching the shared singletons:
+
+        client = InProcessClient(auth=('admin', 'admin123'))
+        client.get('/transactions/some-id').json()
+    """
+
+    def __init__(self, handler_class=TransactionAPIHandler, auth=None, **dependencies):
+        if dependencies:
+            handler_class = type(handler_class.__name__, (handler_class,), dependencies)
+        self.handler_class = _in_memory_handler(handler_class)
+        self.auth = auth
+        self.client_address = ('127.0.0.1', 0)
+        self.server = SimpleNamespace(server_name='localhost', server_port=0)
+
+    def encode_request(self, method, path, body=None, headers=None, auth=None):
+        """Raw HTTP/1.0 request bytes; dict and list bodies are sent as JSON"""
+        headers = dict(headers or {})
+        auth = auth if auth is not None else self.auth
+        if auth:
+            credentials = base64.b64encode(f"{auth[0]}:{auth[1]}".encode('utf-8')).decode('ascii')
+            headers.setdefault('Authorization', f"Basic {credentials}")
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+            headers.setdefault('Content-Type', 'application/json')
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        if body is not None:
+            headers['Content-Length'] = str(len(body))
+        lines = [f"{method} {path} HTTP/1.0"] + [f"{name}: {value}" for name, value in headers.items()]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b'')
+
+    def send_raw(self, raw_request):
+        """Handle raw request bytes and return the raw response bytes"""
+        connection = _InMemoryConnection(raw_request)
+        self.handler_class(connection, self.client_address, self.server)
+        return connection.raw_response
+
+    def request(self, method, path, body=None, headers=None, auth=None):
+        """Send one request and return the parsed Response"""
+        raw = self.send_raw(self.encode_request(method, path, body, headers, auth))
+        return parse_response(raw, method)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, body=None, **kwargs):
+        return self.request('POST', path, body, **kwargs)
+
+    def put(self, path, body=None, **kwargs):
+        return self.request('PUT', path, body, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test per-user rate limiting and the global in-flight limit (429/503 with Retry-After)
+"""
+
+from api.controllers.admission_controller import AdmissionController, TokenBucket
+from api.controllers.storage_controller import storage_instance
+from api.controllers.user_controller import UserManager
+from api.testing import InProcessClient
+from server import parse_rate_limit
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket():
+    """A full bucket allows a burst, then refills at the configured rate"""
+    bucket = TokenBucket(rate=2.0, burst=3, now=0.0)
+    assert [bucket.take(0.0) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(0.0) == 0.5
+    assert bucket.take(0.5) == 0
+    assert bucket.take(0.5) == 0.5
+    # Refill is capped at the burst size
+    assert [bucket.take(100.0) for _ in range(4)][-1] == 0.5
+
+
+def test_rate_limit_per_role():
+    """Users are limited per role; admins are unlimited by default; limits are per user"""
+    clock = FakeClock()
+    users = UserManager()
+    users.set_rate_limit('user', 1, burst=2)
+    client = InProcessClient(auth=('user', 'user123'), admission=AdmissionController(clock=clock),
+                             user_manager=users, storage=storage_instance)
+
+    assert client.get('/analytics').status == 200
+    assert client.get('/analytics').status == 200
+    limited = client.get('/analytics')
+    assert limited.status == 429
+    assert limited.headers['Retry-After'] == '1'
+    assert limited.json()['error'] == 'Rate limit exceeded'
+
+    # Other users have their own bucket, admins have none
+    assert client.get('/analytics', auth=('test', 'test123')).status == 200
+    assert all(client.get('/analytics', auth=('admin', 'admin123')).status == 200 for _ in range(10))
+
+    clock.now += 1.0
+    assert client.get('/analytics').status == 200
+    # Unauthenticated requests are rejected before they reach a bucket
+    assert client.get('/analytics', auth=('user', 'wrong')).status == 401
+
+
+def test_in_flight_limit():
+    """Requests beyond max_in_flight get an immediate 503, and slots are released afterwards"""
+    admission = AdmissionController(max_in_flight=1)
+    client = InProcessClient(auth=('admin', 'admin123'), admission=admission, storage=storage_instance)
+    assert client.get('/').status == 200
+    assert admission.in_flight() == 0
+
+    assert admission.try_enter()
+    response = client.get('/')
+    assert response.status == 503
+    assert response.headers['Retry-After'] == '1'
+    admission.leave()
+    assert client.get('/').status == 200
+    assert admission.in_flight() == 0
+
+
+def test_parse_rate_limit():
+    """--rate-limit values are checked when parsed, before they reach the user manager"""
+    assert parse_rate_limit('user=20/40') == ('user', 20.0, 40.0)
+    assert parse_rate_limit('admin=none') == ('admin', None, None)
+    for text in ('user', 'user=abc', 'user=0', 'user=-1', 'user=nan', 'user=inf', 'user=5/0', 'user=5/0.5'):
+        try:
+            parse_rate_limit(text)
+        except ValueError:
+            continue
+        raise AssertionError(f"rate limit was accepted: {text}")
+
+
+if __name__ == "__main__":
+    test_token_bucket()
+    test_rate_limit_per_role()
+    test_in_flight_limit()
+    test_parse_rate_limit()
+    print("\nAdmission control tests passed!")
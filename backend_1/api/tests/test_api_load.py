@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test the HTTP load generator (benchmarks/api_load.py): mix parsing, percentiles and runs against a live server
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+from api.controllers.storage_controller import TransactionStorage
+from api.controllers.transactions_controller import TransactionAPIHandler
+from benchmarks.api_load import LoadGenerator, parse_mix, percentile, summarize
+from server import ThreadedHTTPServer
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_mix_and_percentiles():
+    """Weights default to 1, unknown operations are rejected, percentiles use the nearest rank"""
+    assert parse_mix('get=60, post') == (['get', 'post'], [60.0, 1.0])
+    try:
+        parse_mix('get=1,patch=2')
+        assert False, "expected ValueError"
+    except ValueError as e:
+        assert 'patch' in str(e)
+
+    values = [i / 1000 for i in range(1, 101)]
+    assert percentile(values, 0.5) == 0.05 and percentile(values, 0.99) == 0.099
+    assert percentile([0.2], 0.95) == 0.2 and percentile([], 0.5) is None
+    summary = summarize(list(reversed(values)), errors=2, elapsed=2.0)
+    assert summary['requests'] == 100 and summary['errors'] == 2 and summary['throughput_rps'] == 50.0
+    assert summary['p95_ms'] == 95.0 and summary['max_ms'] == 100.0
+    assert summarize([], 0, 1.0)['p50_ms'] is None
+
+
+def test_load_against_live_server():
+    """A bounded run issues exactly the request budget without errors and only deletes what it created"""
+    storage = TransactionStorage()
+    before = set(storage.transactions)
+    handler = type('QuietHandler', (TransactionAPIHandler,), {
+        'storage': storage, 'log_message': lambda self, format, *args: None})
+    httpd = ThreadedHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        generator = LoadGenerator('127.0.0.1', httpd.server_address[1], mix='get=4,post=3,put=2,delete=2,list=1',
+                                  concurrency=3, max_requests=60, seed=1)
+        summary = generator.run()
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert summary['overall']['requests'] == 60 and summary['overall']['errors'] == 0
+    assert sum(stats['requests'] for stats in summary['operations'].values()) == 60
+    assert {'get', 'post', 'put'} <= set(summary['operations'])
+    for stats in summary['operations'].values():
+        assert stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms'] <= stats['max_ms']
+    # Records that existed before the run are never deleted; the ones left over are the run's own
+    assert before <= set(storage.transactions)
+    assert set(storage.transactions) - before == set(generator.created_ids)
+
+
+def test_cli_saves_and_compares_results():
+    """The CLI starts server.py itself, saves JSON results and compares them with a baseline"""
+    with tempfile.TemporaryDirectory() as workdir:
+        output = os.path.join(workdir, 'run.json')
+        command = [sys.executable, '-m', 'benchmarks.api_load', '--requests', '20', '--concurrency', '2',
+                   '--output', output]
+        subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True, check=True, timeout=120)
+        with open(output, encoding='utf-8') as f:
+            results = json.load(f)
+        compared = subprocess.run(command + ['--compare', output], cwd=PROJECT_ROOT, capture_output=True,
+                                  text=True, check=True, timeout=120).stdout
+
+    assert results['benchmark'] == 'api_load' and results['settings']['requests'] == 20
+    assert results['summary']['overall']['requests'] == 20
+    assert 'overall' in compared and 'Comparison against' in compared
+
+
+if __name__ == "__main__":
+    test_mix_and_percentiles()
+    test_load_against_live_server()
+    test_cli_saves_and_compares_results()
+    print("\nLoad generator tests passed!")
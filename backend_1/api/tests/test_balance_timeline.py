@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test the balance timeline index (as-of lookups and gap detection)
+"""
+
+import random
+from datetime import datetime
+from api.models import Transaction
+from dsa.balance_timeline import BalanceTimeline, PartitionedTimeline
+
+
+def txn(transaction_id, date, transaction_type, amount, balance_after, fee=0):
+    """Transaction with money in minor units"""
+    return Transaction.from_record({
+        'transaction_id': transaction_id, 'transaction_date': date, 'transaction_type': transaction_type,
+        'amount': amount, 'fee': fee, 'balance_after': balance_after
+    })
+
+
+def ms(text):
+    return int(datetime.fromisoformat(text).timestamp() * 1000)
+
+
+def build(transactions):
+    timeline = BalanceTimeline()
+    for transaction in transactions:
+        timeline.add(transaction)
+    return {t.transaction_id: t for t in transactions}, timeline
+
+
+def test_balance_at():
+    """As-of lookups return the last balance at or before the time, regardless of insertion order"""
+    store, timeline = build([
+        txn('c', '2024-05-12T09:00:00', 'Payment', 50000, 1450000),
+        txn('a', '2024-05-10T16:30:51', 'Bank Deposit', 1000000, 1000000),
+        txn('b', '2024-05-11T10:00:00', 'Money Received', 500000, 1500000),
+        txn('x', 'not a date', 'Payment', 100, 100),
+    ])
+    assert len(timeline) == 3
+    assert timeline.balance_at(ms('2024-05-10T00:00:00')) is None
+    assert timeline.balance_at(ms('2024-05-10T16:30:51'))['transaction_id'] == 'a'
+    assert timeline.balance_at(ms('2024-05-11T23:59:59'))['balance'] == 1500000
+    assert timeline.balance_at(ms('2030-01-01T00:00:00'))['transaction_id'] == 'c'
+
+    # Writes are applied in place and the next query sees them
+    timeline.add(txn('d', '2024-05-11T12:00:00', 'Payment', 100000, 1400000))
+    assert timeline.balance_at(ms('2024-05-11T23:59:59'))['transaction_id'] == 'd'
+    timeline.remove(store['b'])
+    timeline.remove(store['x'])
+    assert len(timeline) == 3
+    assert timeline.balance_at(ms('2024-05-11T11:00:00'))['transaction_id'] == 'a'
+
+
+def test_gaps():
+    """Points whose balance does not follow from the previous one are reported"""
+    _, timeline = build([
+        txn('a', '2024-05-10T10:00:00', 'Bank Deposit', 1000000, 1000000),
+        txn('b', '2024-05-10T11:00:00', 'Transfer', 100000, 890000, fee=10000),
+        txn('c', '2024-05-10T12:00:00', 'Money Received', 200000, 1090000),
+        # A 300 RWF payment between c and d never arrived
+        txn('d', '2024-05-10T14:00:00', 'Payment', 50000, 1010000),
+        txn('e', '2024-05-10T15:00:00', 'Payment', 10000, 1000000),
+    ])
+    gaps = list(timeline.iter_gaps())
+    assert [gap['transaction_id'] for gap in gaps] == ['d']
+    assert gaps[0]['previous_transaction_id'] == 'c'
+    assert gaps[0]['expected_balance'] == 1040000 and gaps[0]['discrepancy'] == -30000
+
+    assert list(timeline.iter_gaps(from_ms=ms('2024-05-10T14:30:00'))) == []
+    assert list(timeline.iter_gaps(to_ms=ms('2024-05-10T14:00:00'))) == []
+
+
+def test_series():
+    """Series cover the requested range; amounts include transactions without a balance"""
+    _, timeline = build([
+        txn('a', '2024-05-10T10:00:00', 'Bank Deposit', 1000000, 1000000),
+        txn('b', '2024-05-11T10:00:00', 'Payment', 100000, None),
+        txn('c', '2024-05-12T10:00:00', 'Payment', 200000, 700000),
+    ])
+    times, values = timeline.series('balance')
+    assert list(values) == [1000000, 700000]
+    times, values = timeline.series('amount', from_ms=ms('2024-05-11T00:00:00'))
+    assert list(values) == [100000, 200000]
+    assert list(times) == [ms('2024-05-11T10:00:00'), ms('2024-05-12T10:00:00')]
+
+
+def test_values_beyond_int64():
+    """A stored amount too large for the arrays does not break lookups, gaps or series"""
+    _, timeline = build([
+        txn('a', '2024-05-10T10:00:00', 'Bank Deposit', 1000000, 1000000),
+        txn('b', '2024-05-11T10:00:00', 'Payment', 10 ** 22, 1000000),
+    ])
+    assert timeline.balance_at(ms('2024-05-12T00:00:00'))['transaction_id'] == 'b'
+    assert [gap['transaction_id'] for gap in timeline.iter_gaps()] == ['b']
+    assert list(timeline.series('amount')[1]) == [1000000, 10 ** 22]
+    assert timeline.count_between(ms('2024-05-11T00:00:00')) == 1
+
+
+def test_incremental_matches_rebuild():
+    """Random adds and removes, split over partitions or not, leave the index a fresh build would give"""
+    rng = random.Random(5)
+    stored = {}
+    single = BalanceTimeline()
+    parts = [BalanceTimeline() for _ in range(3)]
+    merged = PartitionedTimeline(parts)
+    for number in range(600):
+        if stored and rng.random() < 0.3:
+            transaction = stored.pop(rng.choice(sorted(stored)))
+            single.remove(transaction)
+            parts[int(transaction.transaction_id[2:]) % 3].remove(transaction)
+        else:
+            # Few distinct dates, so equal timestamps are ordered by ID
+            transaction = txn(f'id{rng.randrange(10 ** 6)}', f'2024-05-{rng.randint(10, 14)}T10:00:00', 'Payment',
+                              rng.choice([None, 100, 10 ** 22]), rng.choice([None, 5000]))
+            if transaction.transaction_id in stored:
+                continue
+            stored[transaction.transaction_id] = transaction
+            single.add(transaction)
+            parts[int(transaction.transaction_id[2:]) % 3].add(transaction)
+        if number % 50 == 0:
+            merged.series('balance')
+
+    _, rebuilt = build(sorted(stored.values(), key=lambda t: rng.random()))
+    for timeline in (single, merged):
+        for section in range(3):
+            assert timeline.rows(section) == rebuilt.rows(section)
+        assert timeline.ids_between() == sorted(stored, key=lambda i: (stored[i].transaction_date, i))
+        assert list(timeline.iter_gaps()) == list(rebuilt.iter_gaps())
+
+
+if __name__ == "__main__":
+    test_balance_at()
+    test_gaps()
+    test_series()
+    test_values_beyond_int64()
+    test_incremental_matches_rebuild()
+    print("\nBalance timeline tests passed!")
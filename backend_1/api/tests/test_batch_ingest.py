@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test multi-file ingestion: source expansion, path-order merging, cross-file duplicates and provenance
+"""
+
+import os
+import tempfile
+from api.controllers.storage_controller import TransactionStorage
+from dsa.batch_ingest import expand_sources
+from dsa.sms_generator import generate_export
+from dsa.sms_parser import SMSXMLParser
+
+
+def write_export(path, sms_lines):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("<?xml version='1.0' encoding='utf-8'?>\n<smses>\n")
+        file.writelines(sms_lines)
+        file.write("</smses>\n")
+    return path
+
+
+def sms_lines(path):
+    with open(path, encoding='utf-8') as file:
+        return [line for line in file if line.lstrip().startswith('<sms ')]
+
+
+def make_exports(workdir):
+    """A large export, and a small one repeating its last 100 messages; the large one sorts first"""
+    large = generate_export(os.path.join(workdir, 'a_large.xml'), 3000, seed=1)
+    extra = generate_export(os.path.join(workdir, 'extra.xml'), 200, seed=2)
+    shared = sms_lines(large)[-100:]
+    overlap = write_export(os.path.join(workdir, 'b_overlap.xml'), shared + sms_lines(extra))
+    os.remove(extra)
+    return large, overlap, write_export(os.path.join(workdir, 'shared.xml'), shared)
+
+
+def empty_storage(workdir):
+    """Storage holding only the built-in sample records (its own export does not exist)"""
+    return TransactionStorage(xml_file_path=os.path.join(workdir, 'missing.xml'))
+
+
+def test_expand_sources():
+    """Directories contribute their *.xml files, globs expand, and the result is sorted and de-duplicated"""
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in ('b.xml', 'a.XML', 'notes.txt', os.path.join('sub', 'c.xml')):
+            os.makedirs(os.path.dirname(os.path.join(workdir, name)), exist_ok=True)
+            open(os.path.join(workdir, name), 'w').close()
+        path = lambda name: os.path.join(workdir, name)
+        assert expand_sources([workdir]) == [path('a.XML'), path('b.xml')]
+        assert expand_sources([os.path.join(workdir, '**', '*.xml'), path('b.xml'), path('./b.xml')]) == [
+            path('b.xml'), path(os.path.join('sub', 'c.xml'))]
+
+
+def test_merge_order_duplicates_and_provenance():
+    """Parallel ingestion matches a serial one; repeated messages count as duplicates with both files recorded"""
+    with tempfile.TemporaryDirectory() as workdir:
+        large, overlap, shared = make_exports(workdir)
+        overlap_alone = empty_storage(workdir)
+        own_duplicates = overlap_alone.ingest_files([overlap], workers=1)[0]['duplicates']
+        shared_ids = [txn['transaction_id'] for txn in SMSXMLParser(shared).parse_xml_file()]
+        os.remove(shared)
+
+        serial = empty_storage(workdir)
+        serial_reports = serial.ingest_files([overlap, large], workers=1)
+        parallel = empty_storage(workdir)
+        # The small second file finishes first, but is still merged second
+        reports = parallel.ingest_files([workdir], workers=2)
+
+    assert [report['file'] for report in reports] == [large, overlap]
+    assert list(parallel.transactions) == list(serial.transactions)
+    strip = lambda report: {key: report[key] for key in ('file', 'seen', 'dropped', 'added', 'duplicates')}
+    assert [strip(report) for report in reports] == [strip(report) for report in serial_reports]
+
+    large_report, overlap_report = reports
+    assert large_report['seen'] == 3000 and overlap_report['seen'] == 300
+    assert shared_ids and overlap_report['duplicates'] == own_duplicates + len(shared_ids)
+    shared_ids = set(shared_ids)
+    assert all(parallel.provenance[txn_id] == [large, overlap] for txn_id in shared_ids)
+    single = {tuple(files) for txn_id, files in parallel.provenance.items() if txn_id not in shared_ids}
+    assert single == {(large,), (overlap,)}
+    assert parallel.ingested_files == reports
+
+
+if __name__ == "__main__":
+    test_expand_sources()
+    test_merge_order_duplicates_and_provenance()
+    print("\nBatch ingestion tests passed!")
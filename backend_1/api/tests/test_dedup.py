@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test cross-export deduplication (dedup keys, Bloom filter, persisted state)
+"""
+
+import os
+import tempfile
+from dsa.dedup import BloomFilter, Deduplicator, dedup_key
+from dsa.sms_parser import SMSXMLParser
+
+DEPOSIT = ("*113*R*A bank deposit of 10000 RWF has been added to your mobile money account at "
+           "2024-05-26 17:18:51. Your NEW BALANCE :10450 RWF. Cash Deposit::CASH::::0::250795963036.")
+
+
+def parse(body, transaction_date="2024-05-26T15:18:58"):
+    return SMSXMLParser()._parse_sms_body(body, transaction_date, "26 May 2024 3:18:58 PM")
+
+
+def test_external_id_key():
+    """Records with a Financial Transaction Id are keyed on it"""
+    assert dedup_key({'external_transaction_id': '76662021700', 'amount': 1}) == 'ext:76662021700'
+
+
+def test_resent_sms_with_text_differences():
+    """A re-sent deposit SMS with different trailing text and receipt time is a duplicate"""
+    original = parse(DEPOSIT)
+    resent = parse(DEPOSIT + "Thank you for using MTN MobileMoney.*EN#", "2024-05-26T15:25:00")
+    assert original['transaction_id'] != resent['transaction_id']
+    assert dedup_key(original) == dedup_key(resent)
+
+    # Same amount and balance months later is a different transaction
+    later = parse(DEPOSIT.replace("2024-05-26 17:18:51", "2024-09-23 13:32:08"))
+    assert dedup_key(original) != dedup_key(later)
+
+
+def test_bloom_filter_roundtrip():
+    """A saved Bloom filter keeps its members and reports no false negatives"""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"key-{i}")
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'test.bloom')
+        bloom.save(path)
+        loaded = BloomFilter.load(path)
+    assert loaded.count == 1000
+    assert all(f"key-{i}" in loaded for i in range(1000))
+    false_positives = sum(1 for i in range(10000) if f"other-{i}" in loaded)
+    print(f"False positives: {false_positives} / 10000")
+    assert false_positives < 300
+
+
+def test_persisted_state_across_runs():
+    """Duplicates are recognised by a later Deduplicator sharing the state directory"""
+    first_export = [{'transaction_id': f'txn_{i}', 'external_transaction_id': str(i)} for i in range(100)]
+    second_export = [{'transaction_id': f'other_{i}', 'external_transaction_id': str(i)} for i in range(50, 150)]
+    with tempfile.TemporaryDirectory() as state_dir:
+        deduplicator = Deduplicator(state_dir, capacity=1000)
+        assert all(deduplicator.check_and_add(txn) is None for txn in first_export)
+        deduplicator.close()
+
+        deduplicator = Deduplicator(state_dir, capacity=1000)
+        results = [deduplicator.check_and_add(txn) for txn in second_export]
+        deduplicator.close()
+    assert results[:50] == [f'txn_{i}' for i in range(50, 100)]
+    assert results[50:] == [None] * 50
+    assert deduplicator.stats['duplicates'] == 50
+
+
+if __name__ == "__main__":
+    test_external_id_key()
+    test_resent_sms_with_text_differences()
+    test_bloom_filter_roundtrip()
+    test_persisted_state_across_runs()
+    print("\nDeduplication tests passed!")
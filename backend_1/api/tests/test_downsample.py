@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Test LTTB downsampling and the timeline series it runs over
+"""
+
+import math
+from dsa.downsample import lttb
+
+
+def test_small_series_unchanged():
+    """Series no longer than the threshold are returned whole"""
+    assert lttb([1, 2, 3], [5, 6, 7], 10) == [0, 1, 2]
+    assert lttb([], [], 10) == []
+
+
+def test_bounded_and_shape_preserving():
+    """Output size is the threshold, endpoints are kept, and a lone spike survives"""
+    xs = list(range(100000))
+    ys = [math.sin(x / 5000) * 1000 for x in xs]
+    ys[31337] = 50000
+    kept = lttb(xs, ys, 500)
+    assert len(kept) == 500
+    assert kept[0] == 0 and kept[-1] == len(xs) - 1
+    assert kept == sorted(set(kept))
+    assert 31337 in kept
+
+
+if __name__ == "__main__":
+    test_small_series_unchanged()
+    test_bounded_and_shape_preserving()
+    print("\nDownsampling tests passed!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test TransactionEncoder: byte-identical to json.dumps over to_dict() for every indent and field set
+"""
+
+import json
+
+from api.encoder import TransactionEncoder, transaction_encoder
+from api.models import Transaction, parse_fields
+
+
+def sample_records():
+    """Records exercising escapes, non-ASCII, None, zero, negative and odd-typed values"""
+    records = [
+        Transaction(sender_name='Jane Smith', receiver_name=None, amount=123456, fee=0, balance_after=None,
+                    transaction_type='Transfer', remarks='Line one\nline "two" \\ tab\t'),
+        Transaction(sender_name='Zoë Müller 😀', amount=-5, fee=1, balance_after=10 ** 15, remarks='100% €'),
+    ]
+    odd = Transaction(amount=1.5, remarks=['nested', {'a': 1}], status=7)
+    odd.balance_after = True
+    records.append(odd)
+    return records
+
+
+def test_matches_json_dumps():
+    """Single records, arrays and wrapped records, compact and indented, all fields and a projection"""
+    records = sample_records()
+    for indent in (None, 0, 2, 4):
+        encoder = TransactionEncoder(indent=indent)
+        for transaction in records:
+            expected = json.dumps(transaction.to_dict(), indent=indent)
+            assert encoder.dumps(transaction) == expected
+            assert encoder.encode(transaction) == expected.encode('utf-8')
+        assert encoder.encode_list(records) == json.dumps([t.to_dict() for t in records], indent=indent).encode()
+        assert encoder.encode_list([]) == json.dumps([], indent=indent).encode()
+
+        fields = parse_fields('remarks,amount')
+        projected = [{field: t.to_dict()[field] for field in fields} for t in records]
+        assert transaction_encoder(fields, indent).encode_list(records) == json.dumps(projected, indent=indent).encode()
+
+        for extra in (None, {'message': 'Transaction deleted successfully'}, {'n': [1, {'b': None}], 'e': {}}):
+            expected = json.dumps({**(extra or {}), 'deleted_transaction': records[0].to_dict()}, indent=indent)
+            assert encoder.encode_wrapped(records[0], 'deleted_transaction', extra) == expected.encode()
+
+
+def test_buffer_reuse_and_validation():
+    """Output is appended to a caller's buffer; unknown fields are rejected"""
+    transaction = sample_records()[0]
+    buffer = bytearray(b'prefix:')
+    encoder = transaction_encoder()
+    assert encoder.encode(transaction, buffer) is buffer
+    assert buffer == b'prefix:' + json.dumps(transaction.to_dict()).encode()
+    assert transaction_encoder() is encoder
+
+    for fields in (('amount', 'password'), ()):
+        try:
+            TransactionEncoder(fields)
+            assert False, f"expected ValueError for {fields}"
+        except ValueError:
+            pass
+
+
+if __name__ == "__main__":
+    test_matches_json_dumps()
+    test_buffer_reuse_and_validation()
+    print("\nEncoder tests passed!")
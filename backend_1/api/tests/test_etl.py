@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test streaming ETL output (ndjson, csv, sqlite) and the --since/--until window
+"""
+
+import csv
+import io
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from dsa.etl import parse_time, write_csv, write_ndjson, write_sqlite
+from dsa.money import money_fields_to_major
+from dsa.sms_generator import generate_export
+from dsa.sms_parser import SMSXMLParser
+
+
+def test_window_matches_full_parse():
+    """Filtering on the date attribute keeps exactly the in-window transactions of a full parse"""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = generate_export(os.path.join(workdir, 'export.xml'), 2000, seed=5)
+        full = SMSXMLParser(path).parse_xml_file()
+
+        since, until = datetime(2024, 6, 1), datetime(2024, 6, 8)
+        parser = SMSXMLParser(path)
+        windowed = list(parser.iter_file(since=since, until=until))
+    expected = [txn for txn in full if since <= datetime.fromisoformat(txn['transaction_date']) < until]
+    print(f"{len(windowed)} of {len(full)} transactions in window, {parser.stats['filtered']} messages skipped")
+    assert windowed == expected
+    assert 0 < len(windowed) < len(full)
+    assert parser.stats['seen'] + parser.stats['filtered'] == 2000
+
+
+def test_invalid_utf8_drops_one_message():
+    """A message that is not valid UTF-8 is dropped on its own; the rest of the mapped export still parses"""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = generate_export(os.path.join(workdir, 'export.xml'), 200, seed=3)
+        full = SMSXMLParser(path).parse_xml_file()
+        with open(path, 'rb') as file:
+            content = file.read()
+        start = content.index(b'body="', content.index(b'<sms ')) + len(b'body="')
+        with open(path, 'wb') as file:
+            file.write(content[:start] + b'\xff\xfe' + content[start:])
+
+        parser = SMSXMLParser(path)
+        parsed = parser.parse_xml_file()
+        streamed = list(SMSXMLParser(path).iter_file())
+    assert parsed == streamed == full[1:]
+    assert parser.stats['seen'] == 200 and parser.stats['dropped'] == 200 - len(full) + 1
+
+
+def test_parse_time():
+    """CLI times accept epoch milliseconds and ISO dates"""
+    assert parse_time('1715351506754') == 1715351506754
+    assert parse_time('2024-06-01') == int(datetime(2024, 6, 1).timestamp() * 1000)
+    try:
+        parse_time('yesterday')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("invalid time was accepted")
+
+
+def test_writers_round_trip():
+    """ndjson, csv and sqlite output hold the same transactions"""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = generate_export(os.path.join(workdir, 'export.xml'), 300, seed=9)
+        transactions = list(SMSXMLParser(path).iter_file())
+
+        out = io.StringIO()
+        assert write_ndjson(iter(transactions), out) == len(transactions)
+        assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+            money_fields_to_major(txn) for txn in transactions]
+
+        out = io.StringIO()
+        assert write_csv(iter(transactions), out) == len(transactions)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        assert [row['transaction_id'] for row in rows] == [txn['transaction_id'] for txn in transactions]
+        assert rows[0]['raw_sms'] == transactions[0]['raw_sms']
+        assert float(rows[0]['amount']) * 100 == transactions[0]['amount']
+
+        db_path = os.path.join(workdir, 'out.db')
+        assert write_sqlite(iter(transactions), db_path, batch_size=64) == len(transactions)
+        connection = sqlite3.connect(db_path)
+        count, total = connection.execute('SELECT COUNT(*), SUM(amount) FROM transactions').fetchone()
+        connection.close()
+    assert count == len({txn['transaction_id'] for txn in transactions})
+    # Minor units are integers, so the SQL total is exact
+    assert isinstance(total, int)
+    assert total == sum({txn['transaction_id']: txn['amount'] for txn in transactions}.values())
+
+
+if __name__ == "__main__":
+    test_window_matches_full_parse()
+    test_invalid_utf8_drops_one_message()
+    test_parse_time()
+    test_writers_round_trip()
+    print("\nETL tests passed!")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test GET /transactions/stream (Server-Sent Events): live fan-out, Last-Event-ID resume and hand-off
+"""
+
+import base64
+import json
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+from api.controllers.admission_controller import AdmissionController
+from api.controllers.storage_controller import TransactionStorage
+from api.controllers.stream_controller import EventBroadcaster
+from api.controllers.transactions_controller import TransactionAPIHandler
+from api.testing import InProcessClient
+
+ADMIN = 'Basic ' + base64.b64encode(b'admin:admin123').decode('ascii')
+
+
+def parse_events(text):
+    """SSE frames as dicts of their fields (comments and retry-only frames skipped)"""
+    events = []
+    for frame in text.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in frame.split('\n') if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append(fields)
+    return events
+
+
+def read_events(sock, count):
+    """Read from an SSE connection until `count` events have arrived"""
+    received = ''
+    while len(parse_events(received.split('\r\n\r\n', 1)[-1])) < count:
+        chunk = sock.recv(65536)
+        assert chunk, "stream closed early"
+        received += chunk.decode('utf-8')
+    return received
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def test_resume_in_process():
+    """Last-Event-ID replays exactly the missed events; stale IDs get a resync event"""
+    storage = TransactionStorage()
+    client = InProcessClient(auth=('admin', 'admin123'), storage=storage,
+                             broadcaster=EventBroadcaster(storage))
+    token = storage.changes.token()
+    created = client.post('/transactions', {'amount': 5, 'transaction_type': 'Transfer'}).json()
+    client.delete(f"/transactions/{created['transaction_id']}")
+
+    response = client.get('/transactions/stream', headers={'Last-Event-ID': token})
+    assert response.status == 200
+    assert response.headers['Content-Type'] == 'text/event-stream'
+    events = parse_events(response.text)
+    assert [event['event'] for event in events] == ['created', 'deleted']
+    assert json.loads(events[1]['data']) == {'transaction_id': created['transaction_id']}
+    assert events[-1]['id'] == storage.changes.token()
+
+    stale = parse_events(client.get('/transactions/stream', headers={'Last-Event-ID': 'old-1'}).text)
+    assert [event['event'] for event in stale] == ['resync']
+    assert client.get('/transactions/stream', headers={'Last-Event-ID': 'garbage'}).status == 400
+
+
+def test_live_fan_out_without_holding_threads():
+    """Subscribers are served by the broadcaster, so the in-flight slot is released while they stay connected"""
+    storage = TransactionStorage()
+    broadcaster = EventBroadcaster(storage, heartbeat=60)
+    admission = AdmissionController(max_in_flight=1)
+    handler = type('StreamHandler', (TransactionAPIHandler,), {
+        'storage': storage, 'broadcaster': broadcaster, 'admission': admission,
+        'log_message': lambda self, format, *args: None})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    request = f'GET /transactions/stream HTTP/1.0\r\nAuthorization: {ADMIN}\r\n\r\n'.encode('ascii')
+    subscribers = []
+    try:
+        for _ in range(3):
+            sock = socket.create_connection(('127.0.0.1', port), timeout=5)
+            sock.sendall(request)
+            assert sock.recv(4096).startswith(b'HTTP/1.0 200')
+            subscribers.append(sock)
+            # The slot is released once the handler has handed the socket over
+            wait_for(lambda: admission.in_flight() == 0)
+
+        # Three open streams yet no request in flight: a normal request is still admitted
+        wait_for(lambda: len(broadcaster) == 3)
+        transaction = next(iter(storage.transactions))
+        status = b'{"status": "Pending"}'
+        with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+            sock.sendall(f'PUT /transactions/{transaction} HTTP/1.0\r\nAuthorization: {ADMIN}\r\n'
+                         f'Content-Length: {len(status)}\r\n\r\n'.encode('ascii') + status)
+            assert sock.recv(4096).startswith(b'HTTP/1.0 200')
+
+        for sock in subscribers:
+            events = parse_events(read_events(sock, 1))
+            assert events[0]['event'] == 'updated'
+            assert json.loads(events[0]['data'])['status'] == 'Pending'
+    finally:
+        for sock in subscribers:
+            sock.close()
+        broadcaster.close()
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    test_resume_in_process()
+    test_live_fan_out_without_holding_threads()
+    print("\nEvent stream tests passed!")
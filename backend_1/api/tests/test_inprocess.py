@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test the API in-process with api.testing.InProcessClient (no server, sockets or sleeps)
+"""
+
+from api.controllers.storage_controller import TransactionStorage, storage_instance
+from api.models import Transaction
+from api.testing import InProcessClient
+
+ADMIN = ('admin', 'admin123')
+USER = ('user', 'user123')
+
+# Each test module gets its own store, so writes never leak into the shared singleton
+storage = TransactionStorage()
+client = InProcessClient(auth=ADMIN, storage=storage)
+
+
+def test_root_and_auth():
+    """The root is public, data needs credentials, admin endpoints need the admin role"""
+    response = client.get('/', auth=())
+    assert response.status == 200
+    assert response.headers['Content-Type'] == 'application/json'
+    assert 'endpoints' in response.json()
+
+    assert client.get('/transactions', auth=()).status == 401
+    assert client.get('/transactions', auth=('admin', 'wrong')).status == 401
+    assert client.get('/templates', auth=USER).status == 403
+    assert client.get('/transactions/no-such-id').status == 404
+
+
+def test_crud_round_trip():
+    """Create, read, update and delete one transaction against the client's own store"""
+    before = len(storage_instance.transactions)
+    created = client.post('/transactions', {
+        'sender_name': 'In Process', 'receiver_name': 'Harness', 'amount': 1234.5,
+        'fee': 0, 'transaction_type': 'Transfer'
+    })
+    assert created.status == 201
+    transaction_id = created.json()['transaction_id']
+    assert transaction_id in storage.transactions
+    assert len(storage_instance.transactions) == before
+
+    fetched = client.get(f'/transactions/{transaction_id}')
+    assert fetched.status == 200 and fetched.json()['amount'] == 1234.5
+
+    updated = client.put(f'/transactions/{transaction_id}', {'status': 'Pending'})
+    assert updated.status == 200 and updated.json()['status'] == 'Pending'
+
+    assert client.delete(f'/transactions/{transaction_id}').status == 200
+    assert client.get(f'/transactions/{transaction_id}').status == 404
+    assert client.post('/transactions', '{not json').status == 400
+
+
+def test_money_out_of_range():
+    """Amounts too large to hold exactly are rejected up front, so they never reach storage"""
+    before = len(storage.transactions)
+    for body in ({'amount': '1e400'}, {'amount': 1e20}, {'amount': 10, 'fee': 10 ** 15},
+                 {'amount': 10, 'balance_after': -1e16}):
+        response = client.post('/transactions', body)
+        assert response.status == 400, body
+    assert len(storage.transactions) == before
+    known = next(iter(storage.transactions))
+    assert client.put(f'/transactions/{known}', {'amount': '1e400'}).status == 400
+    assert client.get('/transactions').status == 200
+    assert client.get('/balance').status == 200
+
+
+def test_text_fields_must_be_strings():
+    """Numbers, lists and objects in text fields get 400, and a failed index update stores nothing"""
+    before = len(storage.transactions)
+    for body in ({'amount': 10, 'receiver_name': 5}, {'amount': 10, 'transaction_type': [1]},
+                 {'amount': 10, 'transaction_type': {'a': 1}}, {'amount': 10, 'remarks': True}):
+        response = client.post('/transactions', body)
+        assert response.status == 400, body
+        assert 'must be a string or null' in response.json()['error']
+    known = next(iter(storage.transactions))
+    original = client.get(f'/transactions/{known}').json()
+    assert client.put(f'/transactions/{known}', {'receiver_name': ['x']}).status == 400
+    assert client.get(f'/transactions/{known}').json() == original
+
+    # Storage itself rolls back if indexing fails after the record went in
+    bad = Transaction.from_record({'transaction_id': 'bad-receiver', 'amount': 100, 'receiver_name': 5})
+    top_before, quantiles_before = storage.analytics.top_receivers(5), storage.analytics.amount_quantiles()
+    try:
+        storage.create(bad)
+        assert False, "expected AttributeError"
+    except AttributeError:
+        pass
+    assert 'bad-receiver' not in storage.transactions
+    try:
+        storage.update(known, {'transaction_type': ['x'], 'receiver_name': 7})
+        assert False, "expected an indexing error"
+    except (AttributeError, TypeError):
+        pass
+    assert client.get(f'/transactions/{known}').json() == original
+    assert storage.analytics.top_receivers(5) == top_before
+    assert storage.analytics.amount_quantiles() == quantiles_before
+    assert len(storage.transactions) == before
+    assert client.get('/analytics').status == 200
+    assert client.get('/transactions').status == 200
+
+
+def test_streamed_and_raw_responses():
+    """Close-delimited streamed bodies parse, and raw bytes can be sent as-is"""
+    known = next(iter(storage.transactions))
+    response = client.get(f'/transactions?ids={known},missing')
+    assert response.status == 200
+    assert 'Content-Length' not in response.headers
+    body = response.json()
+    assert [txn['transaction_id'] for txn in body['found']] == [known]
+    assert body['missing'] == ['missing']
+
+    listing = client.get('/transactions')
+    assert len(listing.json()) == len(storage.transactions)
+
+    raw = client.send_raw(b'GET / HTTP/1.0\r\nHost: localhost\r\n\r\n')
+    assert raw.startswith(b'HTTP/1.0 200 OK\r\n')
+
+
+if __name__ == "__main__":
+    test_root_and_auth()
+    test_crud_round_trip()
+    test_money_out_of_range()
+    test_text_fields_must_be_strings()
+    test_streamed_and_raw_responses()
+    print("\nIn-process API tests passed!")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test slow-client protection: header/body limits and total (not per-recv) read timeouts
+"""
+
+import socket
+import threading
+import time
+
+from api.controllers.storage_controller import storage_instance
+from api.controllers.transactions_controller import TransactionAPIHandler, _DeadlineSocketReader
+from api.testing import InProcessClient, parse_response
+
+
+class LimitedHandler(TransactionAPIHandler):
+    max_body_bytes = 100
+    max_header_count = 4
+    max_header_bytes = 256
+
+
+client = InProcessClient(LimitedHandler, auth=('admin', 'admin123'), storage=storage_instance)
+
+
+def test_header_and_body_limits():
+    """Too many or too large headers get 431, oversized or invalid bodies are refused unread"""
+    assert client.get('/', headers={'X-One': '1'}).status == 200
+    assert client.get('/', headers={f'X-{i}': '1' for i in range(5)}).status == 431
+    assert client.get('/', headers={'X-Big': 'a' * 300}).status == 431
+
+    response = client.post('/transactions', {'amount': 1, 'remarks': 'x' * 200})
+    assert response.status == 413
+    assert 'larger than 100 bytes' in response.json()['error']
+    raw = client.send_raw(b'POST /transactions HTTP/1.0\r\nContent-Length: -5\r\n\r\n')
+    assert parse_response(raw).status == 400
+
+
+def test_deadline_is_total_not_per_recv():
+    """A client trickling bytes faster than any per-recv timeout still hits the phase deadline"""
+    server_side, client_side = socket.socketpair()
+    stop = threading.Event()
+
+    def trickle():
+        while not stop.is_set():
+            try:
+                client_side.sendall(b'x')
+            except OSError:
+                return
+            time.sleep(0.02)
+
+    sender = threading.Thread(target=trickle)
+    sender.start()
+    reader = _DeadlineSocketReader(server_side, io_timeout=5)
+    reader.start('header', 0.3)
+    started = time.monotonic()
+    try:
+        while True:
+            reader.readinto(bytearray(1))
+    except TimeoutError:
+        pass
+    elapsed = time.monotonic() - started
+    stop.set()
+    sender.join()
+    server_side.close()
+    client_side.close()
+    assert reader.expired == 'header'
+    assert 0.25 < elapsed < 1.0
+
+
+def test_idle_phase_switches_to_header_deadline():
+    """The header deadline starts with the first byte, so idle and header time are separate budgets"""
+    server_side, client_side = socket.socketpair()
+    reader = _DeadlineSocketReader(server_side, io_timeout=5)
+    reader.start('idle', 1.0, header_timeout=0.2)
+    client_side.sendall(b'G')
+    assert reader.readinto(bytearray(1)) == 1
+    assert reader.phase == 'header'
+    try:
+        reader.readinto(bytearray(1))
+    except TimeoutError:
+        pass
+    assert reader.expired == 'header'
+    server_side.close()
+    client_side.close()
+
+
+if __name__ == "__main__":
+    test_header_and_body_limits()
+    test_deadline_is_total_not_per_recv()
+    test_idle_phase_switches_to_header_deadline()
+    print("\nRequest limit tests passed!")
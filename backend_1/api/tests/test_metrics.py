@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test the Prometheus /metrics endpoint: text format, route labels and latency histograms
+"""
+
+import re
+from api.controllers.metrics_controller import LATENCY_BUCKETS, MetricsRegistry
+from api.controllers.storage_controller import TransactionStorage
+from api.testing import InProcessClient
+
+SAMPLE = re.compile(r'^([a-z_]+)(\{[a-z_]+="(?:[^"\\]|\\.)*"(?:,[a-z_]+="(?:[^"\\]|\\.)*")*\})? (\S+)$')
+
+
+def samples(text):
+    """{(name, labels): value} for every sample line, checking each line is a comment or a sample"""
+    found = {}
+    for line in text.splitlines():
+        if line.startswith('# HELP ') or line.startswith('# TYPE '):
+            continue
+        match = SAMPLE.match(line)
+        assert match, f"not a Prometheus sample line: {line!r}"
+        name, labels, value = match.groups()
+        found[(name, labels or '')] = float(value)
+    return found
+
+
+def test_route_labels_and_histograms():
+    """Requests are counted per method, bounded route template and status, with cumulative buckets"""
+    storage = TransactionStorage()
+    client = InProcessClient(auth=('user', 'user123'), storage=storage, metrics=MetricsRegistry())
+    known = next(iter(storage.transactions))
+    client.get(f'/transactions/{known}')
+    client.get('/transactions/no-such-id')
+    client.get('/transactions/no-such-id')
+    client.get('/transactions', auth=())
+    unknown = client.get('/nowhere/at/all')
+    # Arbitrary verbs share one method label
+    for verb in (b'BREW', b'X-RANDOM-1', b'X-RANDOM-2'):
+        assert client.send_raw(verb + b' /transactions HTTP/1.0\r\n\r\n').startswith(b'HTTP/1.0 501')
+
+    response = client.get('/metrics', auth=())
+    assert response.status == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    assert '# TYPE http_request_duration_seconds histogram' in response.text
+    found = samples(response.text)
+
+    def count(route, status):
+        return found.get(('http_requests_total', f'{{method="GET",route="{route}",status="{status}"}}'))
+
+    assert count('/transactions/{id}', 200) == 1
+    # IDs are folded into one route template, so label cardinality stays bounded
+    assert count('/transactions/{id}', 404) == 2
+    assert count('/transactions', 401) == 1
+    assert count('other', unknown.status) == 1
+    assert not any('no-such-id' in labels for _, labels in found)
+    assert found[('http_requests_total', '{method="other",route="/transactions",status="501"}')] == 3
+    assert not any('BREW' in labels or 'RANDOM' in labels for _, labels in found)
+    # The scrape itself is in flight while it renders
+    assert found[('http_requests_in_flight', '')] == 1
+
+    base = 'method="GET",route="/transactions/{id}",status="404"'
+    buckets = [found[('http_request_duration_seconds_bucket', f'{{{base},le="{bound:g}"}}')]
+               for bound in LATENCY_BUCKETS]
+    infinite = found[('http_request_duration_seconds_bucket', f'{{{base},le="+Inf"}}')]
+    assert buckets == sorted(buckets) and buckets[-1] <= infinite == 2
+    assert found[('http_request_duration_seconds_count', f'{{{base}}}')] == 2
+    assert found[('http_request_duration_seconds_sum', f'{{{base}}}')] > 0
+
+
+def test_counters_and_label_escaping():
+    """Counters accumulate per label set and label values are escaped"""
+    metrics = MetricsRegistry()
+    metrics.inc('sms_ingest_messages_matched_total', 3, 'Matched messages', pattern='Payment')
+    metrics.inc('sms_ingest_messages_matched_total', 2, pattern='Payment')
+    metrics.inc('sms_ingest_messages_matched_total', 1, pattern='say "hi"\nnow')
+    metrics.register_gauge('queue_depth', 'Items waiting', lambda: [({}, 4), ({'queue': 'b'}, 0.5)])
+    text = metrics.render()
+    assert '# HELP sms_ingest_messages_matched_total Matched messages' in text
+    assert 'sms_ingest_messages_matched_total{pattern="Payment"} 5' in text
+    assert 'sms_ingest_messages_matched_total{pattern="say \\"hi\\"\\nnow"} 1' in text
+    assert '# TYPE queue_depth gauge\nqueue_depth 4\nqueue_depth{queue="b"} 0.5\n' in text
+
+
+if __name__ == "__main__":
+    test_route_labels_and_histograms()
+    test_counters_and_label_escaping()
+    print("\nMetrics tests passed!")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test multi-get: POST /transactions/_mget and its GET /transactions?ids= form
+"""
+
+from api.controllers.storage_controller import TransactionStorage
+from api.controllers.transactions_controller import MGET_MAX_IDS
+from api.testing import InProcessClient
+
+storage = TransactionStorage()
+client = InProcessClient(auth=('user', 'user123'), storage=storage)
+known = list(storage.transactions)[:3]
+
+
+def found_ids(body):
+    return [txn['transaction_id'] for txn in body['found']]
+
+
+def test_found_missing_and_repeats():
+    """Found records and missing IDs both keep request order; repeated IDs are resolved once"""
+    ids = [known[1], 'no-such-id', known[0], known[1], 'also-missing', 'no-such-id']
+    response = client.post('/transactions/_mget', {'ids': ids})
+    assert response.status == 200
+    body = response.json()
+    assert found_ids(body) == [known[1], known[0]]
+    assert body['missing'] == ['no-such-id', 'also-missing']
+    assert body['found'][0] == client.get(f'/transactions/{known[1]}').json()
+
+    empty = client.post('/transactions/_mget', {'ids': []}).json()
+    assert empty == {'found': [], 'missing': []}
+
+
+def test_get_form_matches_post():
+    """?ids=a,b,c gives the same body as POSTing the list"""
+    ids = [known[2], 'no-such-id', known[0], known[2]]
+    posted = client.post('/transactions/_mget', {'ids': ids})
+    fetched = client.get('/transactions?ids=' + ','.join(ids))
+    assert fetched.status == posted.status == 200
+    assert fetched.json() == posted.json()
+    # Empty items in the list are ignored
+    assert client.get(f'/transactions?ids=,{known[0]},,').json() == client.post(
+        '/transactions/_mget', {'ids': [known[0]]}).json()
+
+
+def test_limits_and_bad_bodies():
+    """More than MGET_MAX_IDS IDs, or a body that is not {"ids": [str, ...]}, gets 400"""
+    too_many = [f'id-{n}' for n in range(MGET_MAX_IDS + 1)]
+    assert client.post('/transactions/_mget', {'ids': too_many}).status == 400
+    assert client.get('/transactions?ids=' + ','.join(too_many)).status == 400
+    assert client.post('/transactions/_mget', {'ids': too_many[:MGET_MAX_IDS]}).status == 200
+
+    for bad in ('{not json', [known[0]], {'ids': known[0]}, {'ids': [known[0], 5]}, {'ids': [['nested']]},
+                {'ids': None}, {}):
+        response = client.post('/transactions/_mget', bad)
+        assert response.status == 400, bad
+        assert 'error' in response.json()
+    assert client.post('/transactions/_mget', {'ids': known}, auth=()).status == 401
+
+
+if __name__ == "__main__":
+    test_found_missing_and_repeats()
+    test_get_form_matches_post()
+    test_limits_and_bad_bodies()
+    print("\nMulti-get tests passed!")
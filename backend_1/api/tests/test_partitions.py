@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test hash-partitioned storage: per-partition locks and indexes, fan-out queries and concurrent writes
+"""
+
+import threading
+
+from api.controllers.storage_controller import TransactionStorage
+from api.models import Transaction
+from api.testing import InProcessClient
+from dsa.partitioned_store import PartitionedStore
+
+
+def test_partitioned_store_keeps_dict_semantics():
+    """Keys spread over partitions, yet iteration stays in insertion order"""
+    store = PartitionedStore(4)
+    keys = [f'key{number}' for number in range(100)]
+    for key in keys:
+        store[key] = key.upper()
+    assert len({store.partition_for(key).index for key in keys}) == 4
+    store['key5'] = 'again'
+    del store['key7']
+    assert store.pop('key9') == 'KEY9' and store.pop('key9', None) is None
+    expected = [key for key in keys if key not in ('key7', 'key9')]
+    assert list(store) == expected and len(store) == 98
+    assert store.values()[5] == 'again' and store.get('key7') is None and 'key8' in store
+    store['key7'] = 'new'
+    assert list(store)[-1] == 'key7'
+
+
+def test_fan_out_queries_match_single_partition():
+    """Balance history, gaps, series and analytics are the same whether the store is split or not"""
+    storage = TransactionStorage()
+    client = InProcessClient(auth=('admin', 'admin123'), storage=storage)
+    paths = ['/transactions', '/balance?at=2025-01-01', '/balance/gaps', '/transactions/series?points=50']
+    single = [client.get(path).body for path in paths]
+    analytics = client.get('/analytics?k=5').json()
+
+    storage.set_partitions(8)
+    assert [client.get(path).body for path in paths] == single
+    assert client.get('/analytics?k=5').json() == analytics
+
+    # A write touches only its own partition's timeline; the merged index is kept until one happens
+    generations = [timeline.generation for timeline in storage._timelines]
+    merged = storage.timeline._current()
+    assert storage.timeline._current() is merged
+    written = storage.transactions.partition_for(next(iter(storage.transactions))).index
+    client.put(f'/transactions/{next(iter(storage.transactions))}', {'status': 'Pending'})
+    changed = [timeline.generation != before for timeline, before in zip(storage._timelines, generations)]
+    assert changed.count(True) == 1 and changed[written]
+    assert storage.timeline._current() is not merged
+
+
+def test_concurrent_writes():
+    """Threads creating, updating and deleting across partitions leave store and indexes consistent"""
+    storage = TransactionStorage(partitions=8)
+    before = len(storage.transactions)
+    assert 'Stress' not in storage.analytics.amount_quantiles()
+
+    def writer(worker):
+        for number in range(200):
+            transaction = Transaction(transaction_id=f'w{worker}-{number}', amount=100 * (number + 1),
+                                      transaction_type='Stress', transaction_date='2030-01-01T00:00:00')
+            storage.create(transaction)
+            storage.update(transaction.transaction_id, {'status': 'Pending'})
+            if number % 2:
+                storage.delete(transaction.transaction_id)
+
+    threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(storage.transactions) == before + 8 * 100
+    assert storage.analytics.amount_quantiles()['Stress']['count'] == 8 * 100
+    assert sum(1 for transaction in storage.get_all() if transaction.transaction_type == 'Stress') == 800
+
+
+if __name__ == "__main__":
+    test_partitioned_store_keeps_dict_semantics()
+    test_fan_out_queries_match_single_partition()
+    test_concurrent_writes()
+    print("\nPartitioned storage tests passed!")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test the ingest stage profiler and the parser's --profile report
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dsa.profiler import StageProfiler
+from dsa.sms_generator import generate_export
+from dsa.sms_parser import SMSXMLParser
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_stage_accounting():
+    """Calls and time accumulate per stage; the report lists stages in pipeline order, unknown ones last"""
+    profiler = StageProfiler()
+    for _ in range(3):
+        with profiler.stage('body_match'):
+            time.sleep(0.002)
+    with profiler.stage('custom'):
+        pass
+    with profiler.stage('sms_regex'):
+        pass
+    stats = profiler.to_dict()
+    assert list(stats) == ['sms_regex', 'body_match', 'custom']
+    assert stats['body_match']['calls'] == 3 and stats['body_match']['seconds'] >= 0.006
+    assert stats['custom']['calls'] == 1 and stats['custom']['net_alloc_bytes'] == 0
+    lines = profiler.report(wall_seconds=1.0).splitlines()
+    assert [line.split()[0] for line in lines[1:]] == ['sms_regex', 'body_match', 'custom', 'wall']
+
+
+def test_allocation_tracking():
+    """With tracemalloc running, memory kept by a stage is charged to it"""
+    profiler = StageProfiler(track_allocations=True)
+    tracemalloc.start()
+    try:
+        with profiler.stage('from_record'):
+            kept = bytearray(1 << 20)
+    finally:
+        tracemalloc.stop()
+    assert profiler.to_dict()['from_record']['net_alloc_bytes'] >= len(kept)
+
+
+def test_parser_stages_and_profile_cli():
+    """Parsing charges each message to the per-message stages; --profile parses the export once"""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = generate_export(os.path.join(workdir, 'export.xml'), 200, seed=7)
+        profiler = StageProfiler()
+        parser = SMSXMLParser(path, profiler=profiler)
+        transactions = parser.parse_xml_file()
+        stats = profiler.to_dict()
+        assert stats['timestamp']['calls'] == stats['id_hash']['calls'] == parser.stats['seen'] == 200
+        # One extra regex call finds the end of the file
+        assert stats['sms_regex']['calls'] == 201
+        assert transactions
+
+        output = subprocess.run([sys.executable, '-m', 'dsa.sms_parser', path, '--profile'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, check=True).stdout
+    assert output.count('Parsed ') == 1
+    assert f"Transactions stored: {len(transactions)}" in output
+
+
+if __name__ == "__main__":
+    test_stage_accounting()
+    test_allocation_tracking()
+    test_parser_stages_and_profile_cli()
+    print("\nProfiler tests passed!")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test ?fields= projection: the per-field-set encoders and the endpoints that use them
+"""
+
+import json
+
+from api.controllers.storage_controller import TransactionStorage
+from api.encoder import transaction_encoder
+from api.models import Transaction, parse_fields
+from api.testing import InProcessClient
+
+
+def project(fields, transaction):
+    return json.loads(transaction_encoder(fields).dumps(transaction))
+
+
+def test_projection_matches_to_dict():
+    """Every field gives to_dict(); a subset keeps to_dict order and only reads what it returns"""
+    transaction = Transaction(sender_name='A', amount=123456, fee=None, transaction_type='Transfer')
+    assert project(Transaction.FIELDS, transaction) == transaction.to_dict()
+
+    fields = parse_fields(' status,amount,,transaction_id ')
+    assert fields == ('transaction_id', 'amount', 'status')
+    assert transaction_encoder(fields) is transaction_encoder(fields)
+    assert list(project(fields, transaction).items()) == [
+        ('transaction_id', transaction.transaction_id), ('amount', 1234.56), ('status', 'Completed')]
+
+    class OnlyAmount:
+        amount = 500
+    assert project(('amount',), OnlyAmount()) == {'amount': 5.0}
+
+    for bad in ('amount,__class__', '', ' , '):
+        try:
+            parse_fields(bad)
+            assert False, f"expected ValueError for {bad!r}"
+        except ValueError:
+            pass
+
+
+def test_fields_on_endpoints():
+    """list, get, multi-get and changes honour fields; unknown fields get 400"""
+    storage = TransactionStorage()
+    client = InProcessClient(auth=('admin', 'admin123'), storage=storage)
+    token = client.get('/transactions/changes').json()['next']
+    created = client.post('/transactions', {'amount': 10, 'transaction_type': 'Transfer'}).json()
+    txn_id = created['transaction_id']
+
+    listed = client.get('/transactions?fields=amount,transaction_id').json()
+    assert all(list(txn) == ['transaction_id', 'amount'] for txn in listed)
+    assert client.get(f'/transactions/{txn_id}?fields=status').json() == {'status': 'Completed'}
+    assert client.get(f'/transactions?ids={txn_id}&fields=amount').json()['found'] == [{'amount': 10.0}]
+    found = client.post('/transactions/_mget?fields=fee', {'ids': [txn_id]}).json()['found']
+    assert found == [{'fee': 0.0}]
+    changes = client.get(f'/transactions/changes?since={token}&fields=transaction_id').json()
+    assert changes['changes'] == [{'transaction_id': txn_id}]
+
+    # Without fields, responses are unchanged
+    assert client.get(f'/transactions/{txn_id}').json() == created
+
+    deleted = client.delete(f'/transactions/{txn_id}')
+    assert deleted.text == json.dumps({'message': 'Transaction deleted successfully',
+                                       'deleted_transaction': created}, indent=2)
+
+    response = client.get('/transactions?fields=amount,password')
+    assert response.status == 400
+    assert 'password' in response.json()['error']
+    assert client.get(f'/transactions/{txn_id}?fields=nope').status == 400
+
+
+if __name__ == "__main__":
+    test_projection_matches_to_dict()
+    test_fields_on_endpoints()
+    print("\nProjection tests passed!")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test POST /transactions/query: the filter language, index-aware plans and agreement with a full scan
+"""
+
+from api.controllers.storage_controller import INDEXED_FIELDS, TransactionStorage
+from api.models import Transaction
+from api.query import QueryError, parse_filter, run_query
+from api.testing import InProcessClient
+
+NOW_MS = 1735689600000  # 2025-01-01
+
+FILTERS = [
+    {'field': 'transaction_type', 'value': 'Payment'},
+    {'field': 'transaction_type', 'op': 'in', 'value': ['Payment', 'Transfer']},
+    {'and': [{'or': [{'field': 'transaction_type', 'value': 'Payment'},
+                     {'field': 'transaction_type', 'value': 'Merchant Payment'}]},
+             {'field': 'amount', 'op': 'gt', 'value': 5000},
+             {'field': 'transaction_date', 'op': 'last_days', 'value': 120},
+             {'field': 'receiver_name', 'op': 'contains', 'value': 'SMITH'}]},
+    {'and': [{'field': 'status', 'value': 'Completed'}, {'field': 'transaction_date', 'op': 'lt', 'value': '2024-07-01'}]},
+    {'or': [{'field': 'fee', 'op': 'gte', 'value': 100}, {'not': {'field': 'receiver_name', 'op': 'ne', 'value': None}}]},
+    {'and': [{'field': 'transaction_date', 'op': 'gte', 'value': '2024-06-01'},
+             {'field': 'transaction_date', 'op': 'lte', 'value': '2024-06-30'},
+             {'not': {'field': 'transaction_type', 'value': 'Payment'}}]},
+]
+
+
+def test_results_match_full_scan():
+    """Whatever the plan, the results are those of evaluating the filter on every record, in storage order"""
+    for partitions in (1, 4):
+        storage = TransactionStorage(partitions=partitions)
+        for spec in FILTERS:
+            expected = [t for t in storage.get_all() if parse_filter(spec).matches(t, NOW_MS)]
+            result = run_query(storage, spec, 100000, INDEXED_FIELDS, now_ms=NOW_MS)
+            assert result.transactions == expected, spec
+            assert not result.has_more
+
+
+def test_planner_uses_most_selective_index():
+    """Index-answerable conjuncts drive the scan smallest first; the rest run only on survivors"""
+    storage = TransactionStorage()
+    spec = FILTERS[2]
+    plan = run_query(storage, spec, 10, INDEXED_FIELDS, now_ms=NOW_MS).plan
+    assert plan['strategy'] == 'index'
+    estimates = [scan['estimated_rows'] for scan in plan['index_scans']]
+    assert estimates == sorted(estimates) and plan['candidates'] <= estimates[0]
+    assert plan['residual'] == ['amount > 5000', 'receiver_name CONTAINS "SMITH"']
+    assert plan['candidates'] < plan['total_rows']
+
+    scan = run_query(storage, {'field': 'amount', 'op': 'gt', 'value': 1}, 5, INDEXED_FIELDS).plan
+    assert scan['strategy'] == 'full_scan' and scan['index_scans'] == [] and scan['returned'] == 5
+
+    # Writes keep the indexes current
+    client = InProcessClient(auth=('admin', 'admin123'), storage=storage)
+    created = client.post('/transactions', {'amount': 1, 'transaction_type': 'Rare Type'}).json()
+    only = {'field': 'transaction_type', 'value': 'Rare Type'}
+    assert [t.transaction_id for t in run_query(storage, only, 10, INDEXED_FIELDS).transactions] == [
+        created['transaction_id']]
+    client.put(f"/transactions/{created['transaction_id']}", {'transaction_type': 'Other'})
+    assert run_query(storage, only, 10, INDEXED_FIELDS).transactions == []
+
+
+def test_query_endpoint():
+    """Limit, fields and explain on the endpoint; invalid filters and bodies get 400"""
+    client = InProcessClient(auth=('user', 'user123'), storage=TransactionStorage())
+    response = client.post('/transactions/query', {
+        'filter': {'field': 'transaction_type', 'value': 'Payment'}, 'limit': 2,
+        'fields': ['transaction_id', 'transaction_type'], 'explain': True})
+    assert response.status == 200
+    body = response.json()
+    assert body['count'] == 2 and body['has_more'] is True
+    assert all(record == {'transaction_id': record['transaction_id'], 'transaction_type': 'Payment'}
+               for record in body['results'])
+    assert body['plan']['index_scans'][0]['index'] == 'transaction_type'
+    assert 'plan' not in client.post('/transactions/query', {'limit': 1}).json()
+
+    for bad in ({'filter': {'field': 'amount', 'op': 'between', 'value': 1}},
+                {'filter': {'and': []}},
+                {'filter': {'field': 'amount', 'op': 'contains', 'value': '1'}},
+                {'filter': {'field': 'transaction_date', 'op': 'gt', 'value': 'yesterday'}},
+                {'filter': {'field': 'transaction_type', 'op': ['eq'], 'value': 'Payment'}},
+                {'filter': {'field': 'transaction_date', 'op': 'last_days', 'value': float('inf')}},
+                {'filter': {'field': 'transaction_date', 'op': 'last_days', 'value': float('nan')}},
+                {'limit': 0}, {'fields': 'password'}, {'order': 'amount'}, [1]):
+        assert client.post('/transactions/query', bad).status == 400, bad
+    assert InProcessClient(auth=()).post('/transactions/query', {}).status == 401
+
+
+def test_unhashable_values_never_reach_the_indexes():
+    """Lists and objects in indexed fields get 400; a failed index update leaves every index as it was"""
+    storage = TransactionStorage()
+    client = InProcessClient(auth=('admin', 'admin123'), storage=storage)
+    before = len(storage.transactions)
+    for body in ({'amount': 5, 'status': ['Completed']}, {'amount': 5, 'sender_name': {'a': 1}}):
+        assert client.post('/transactions', body).status == 400, body
+    assert len(storage.transactions) == before
+
+    def plans():
+        return [client.post('/transactions/query', {'filter': {'field': field, 'value': value}, 'limit': 1,
+                                                    'explain': True}).json()['plan']
+                for field, value in (('transaction_type', 'Payment'), ('status', 'Completed'))]
+
+    expected = plans()
+    # transaction_type and status are indexed before sender_name fails
+    bad = Transaction.from_record({'transaction_id': 'bad-sender', 'amount': 100, 'transaction_type': 'Payment',
+                                   'status': 'Completed', 'sender_name': ['x']})
+    try:
+        storage.create(bad)
+        assert False, "expected TypeError"
+    except TypeError:
+        pass
+    assert 'bad-sender' not in storage.transactions
+    assert plans() == expected
+
+
+def test_parse_limits():
+    nested = {'field': 'status', 'value': 'Completed'}
+    for _ in range(20):
+        nested = {'not': nested}
+    try:
+        parse_filter(nested)
+        assert False, "expected QueryError"
+    except QueryError:
+        pass
+
+
+if __name__ == "__main__":
+    test_results_match_full_scan()
+    test_planner_uses_most_selective_index()
+    test_query_endpoint()
+    test_unhashable_values_never_reach_the_indexes()
+    test_parse_limits()
+    print("\nQuery tests passed!")
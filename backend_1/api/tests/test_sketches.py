@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test the streaming quantile and heavy-hitter sketches behind GET /analytics
+"""
+
+import random
+from api.models import Transaction
+from dsa.sketches import HeavyHitters, QuantileSketch, TransactionAnalytics
+
+
+def test_quantiles_within_relative_accuracy():
+    """Quantiles stay within the configured relative error, and removal and merge are exact"""
+    rng = random.Random(1)
+    values = [int(rng.lognormvariate(10, 1.5)) + 1 for _ in range(20000)]
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    ordered = sorted(values)
+    for q in (0.5, 0.95, 0.99):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact
+
+    # Two halves merged equal the whole; removing one half leaves the other
+    first, second = QuantileSketch(), QuantileSketch()
+    for value in values[:10000]:
+        first.add(value)
+    for value in values[10000:]:
+        second.add(value)
+    first.merge(second)
+    assert first.buckets == sketch.buckets and first.count == sketch.count
+    for value in values[10000:]:
+        first.remove(value)
+    assert first.count == 10000
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_heavy_hitters_with_removals_and_merge():
+    """Top keys by weight follow removals, and merged instances agree with one fed everything"""
+    hitters = HeavyHitters(capacity=8)
+    other = HeavyHitters(capacity=8)
+    for i in range(1000):
+        hitters.update(f"small-{i}", 10)
+    hitters.update('big', 50000)
+    other.update('bigger', 80000)
+    other.update('big', 1000)
+    hitters.merge(other)
+    assert [key for key, _ in hitters.top(2)] == ['bigger', 'big']
+    assert hitters.top(2)[1][1] >= 51000
+
+    hitters.update('bigger', -80000)
+    assert [key for key, _ in hitters.top(1)] == ['big']
+
+
+def test_transaction_analytics_tracks_updates():
+    """add/remove keep per-type quantiles and receivers in step with stored transactions"""
+    analytics = TransactionAnalytics()
+    transactions = [Transaction(transaction_type='Payment', receiver_name=f"R{i % 3}", amount=(i + 1) * 100)
+                    for i in range(300)]
+    for transaction in transactions:
+        analytics.add(transaction)
+    summary = analytics.amount_quantiles()
+    assert summary['Payment']['count'] == 300
+    assert abs(summary['Payment']['p50'] - 15000) <= 0.01 * 15000 + 100
+
+    # An update is remove + add
+    analytics.remove(transactions[0])
+    transactions[0].transaction_type = 'Transfer'
+    analytics.add(transactions[0])
+    assert analytics.amount_quantiles()['Payment']['count'] == 299
+    assert analytics.amount_quantiles()['Transfer']['count'] == 1
+    assert [name for name, _ in analytics.top_receivers(3)] == ['R2', 'R1', 'R0']
+
+
+if __name__ == "__main__":
+    test_quantiles_within_relative_accuracy()
+    test_heavy_hitters_with_removals_and_merge()
+    test_transaction_analytics_tracks_updates()
+    print("\nSketch tests passed!")
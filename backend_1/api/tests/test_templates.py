@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test the SMS template registry and targeted re-parsing of quarantined messages
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from dsa.quarantine import QuarantineStore
+from dsa.sms_parser import SMSXMLParser
+from dsa.templates import SMSTemplate, TemplateRegistry
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PAYMENT = ("TxId: 73214484437. Your payment of 1,000 RWF to Jane Smith 12845 has been completed at "
+           "2024-05-10 16:31:39. Your new balance: 1,000 RWF. Fee was 0 RWF.")
+REVERSAL = ("*143*S*Your transaction to Mediatrice UWAYISENGA (250788658286) with 3000 RWF has been reversed "
+            "at 2024-10-07 14:37:00. Your new balance is 10312 RWF. .Thank you for using MTN MobileMoney.*EN#")
+REVERSAL_SPEC = {
+    'name': 'Reversal',
+    'pattern': r'\*143\*S\*Your transaction to (?P<sender>[^(]+) \((?P<phone>[^)]+)\) with (?P<amount>[\d,]+) RWF '
+               r'has been reversed at (?P<date_time>[^.]+)\. Your new balance is (?P<balance>[\d,]+) RWF',
+    'sender_name': '{sender}',
+    'remarks': 'Reversal of transfer to {sender}'
+}
+
+
+def test_builtin_templates():
+    """The built-in templates parse the original formats into the same fields"""
+    parser = SMSXMLParser(registry=TemplateRegistry())
+    txn = parser.parse_message('1715351506754', PAYMENT, '10 May 2024 4:31:46 PM')
+    assert txn['transaction_type'] == 'Payment'
+    # Money is parsed exactly into integer minor units
+    assert txn['amount'] == 100000 and txn['fee'] == 0 and txn['balance_after'] == 100000
+    assert txn['receiver_name'] == 'Jane Smith'
+    assert txn['external_transaction_id'] == '73214484437'
+    assert parser.parse_message('1715351506754', REVERSAL, '7 Oct 2024 2:37:00 PM') is None
+
+
+def test_invalid_template_spec():
+    """Specs without an amount group or with unknown format fields are rejected"""
+    for spec in ({'name': 'No amount', 'pattern': r'reversed (\d+)'},
+                 {'name': 'Bad field', 'pattern': r'(?P<amount>\d+)', 'remarks': '{missing}'},
+                 {'name': 'Bad regex', 'pattern': r'(?P<amount>\d+'},
+                 {'pattern': r'(?P<amount>\d+)'}):
+        try:
+            SMSTemplate.from_config(spec)
+        except ValueError:
+            continue
+        raise AssertionError(f"spec was accepted: {spec}")
+
+
+def test_optional_group():
+    """A group that matched nothing formats as an empty string instead of failing the message"""
+    template = SMSTemplate.from_config({
+        'name': 'Airtime', 'pattern': r'Airtime of (?P<amount>[\d,]+) RWF(?: for (?P<receiver>\d+))?\.',
+        'receiver_name': 'Airtime {receiver}', 'remarks': 'Top-up {receiver}'})
+    registry = TemplateRegistry()
+    registry.register(template)
+    parser = SMSXMLParser(registry=registry)
+    txn = parser.parse_message('1715351506754', 'Airtime of 500 RWF.', '10 May 2024 4:31:46 PM')
+    assert txn['transaction_type'] == 'Airtime' and txn['amount'] == 50000
+    assert txn['receiver_name'] == 'Airtime ' and txn['remarks'] == 'Top-up '
+    txn = parser.parse_message('1715351506754', 'Airtime of 500 RWF for 0788.', '10 May 2024 4:31:46 PM')
+    assert txn['receiver_name'] == 'Airtime 0788'
+
+
+def test_register_reparses_only_quarantine():
+    """Registering a template releases only the quarantined messages it matches"""
+    registry = TemplateRegistry()
+    with tempfile.TemporaryDirectory() as workdir:
+        quarantine = QuarantineStore(os.path.join(workdir, 'quarantine.jsonl'))
+        parser = SMSXMLParser(registry=registry, quarantine=quarantine)
+        parser._extract_transactions_from_xml(
+            f'<sms date="1715351506754" body="{PAYMENT}" readable_date="10 May 2024 4:31:46 PM" />'
+            f'<sms date="1728304620000" body="{REVERSAL}" readable_date="7 Oct 2024 2:37:00 PM" />'
+            f'<sms date="1728304630000" body="Unrelated promo" readable_date="7 Oct 2024 2:37:10 PM" />')
+        assert len(quarantine) == 2
+
+        registry.register(SMSTemplate.from_config(REVERSAL_SPEC))
+        transactions, released = SMSXMLParser(registry=registry).reparse_quarantine(quarantine)
+        assert [txn['transaction_type'] for txn in transactions] == ['Reversal']
+        assert transactions[0]['sender_name'] == 'Mediatrice UWAYISENGA'
+        assert transactions[0]['amount'] == 300000 and transactions[0]['balance_after'] == 1031200
+
+        # The release survives a restart: only the promo is left in the file
+        reloaded = QuarantineStore(quarantine.path)
+        assert [entry['body'] for entry in reloaded.values()] == ['Unrelated promo']
+
+        try:
+            registry.register(SMSTemplate.from_config(REVERSAL_SPEC))
+        except KeyError:
+            pass
+        else:
+            raise AssertionError("duplicate template name was accepted")
+
+
+def test_cli_reparse_writes_before_release():
+    """The CLI writes re-parsed transactions to --out before releasing them; without --format it changes nothing"""
+    def run(*args):
+        return subprocess.run([sys.executable, '-m', 'dsa.sms_parser', *args], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        export = os.path.join(workdir, 'export.xml')
+        with open(export, 'w', encoding='utf-8') as f:
+            f.write(f'<smses><sms date="1728304620000" body="{REVERSAL}" readable_date="7 Oct 2024 2:37:00 PM" />'
+                    f'<sms date="1728304630000" body="Unrelated promo" readable_date="7 Oct 2024 2:37:10 PM" />'
+                    f'</smses>')
+        quarantine_path = os.path.join(workdir, 'quarantine.jsonl')
+        templates = os.path.join(workdir, 'templates.json')
+        with open(templates, 'w', encoding='utf-8') as f:
+            json.dump({'templates': [REVERSAL_SPEC]}, f)
+        run(export, '--quarantine', quarantine_path)
+        assert len(QuarantineStore(quarantine_path)) == 2
+
+        dry_run = run('--quarantine', quarantine_path, '--templates', templates, '--reparse-quarantine')
+        assert '1 matched' in dry_run.stdout
+        assert len(QuarantineStore(quarantine_path)) == 2
+
+        out = os.path.join(workdir, 'recovered.ndjson')
+        run('--quarantine', quarantine_path, '--templates', templates, '--reparse-quarantine',
+            '--format', 'ndjson', '--out', out)
+        with open(out, encoding='utf-8') as f:
+            recovered = [json.loads(line) for line in f]
+        assert [(txn['transaction_type'], txn['amount']) for txn in recovered] == [('Reversal', 3000.0)]
+        assert [entry['body'] for entry in QuarantineStore(quarantine_path).values()] == ['Unrelated promo']
+
+
+if __name__ == "__main__":
+    test_builtin_templates()
+    test_invalid_template_spec()
+    test_optional_group()
+    test_register_reparses_only_quarantine()
+    test_cli_reparse_writes_before_release()
+    print("\nTemplate tests passed!")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test hot/cold tiered storage: LRU demotion, promotion on access, age-based spill and the unchanged CRUD contract
+"""
+
+import json
+import os
+import tempfile
+
+from api.controllers.storage_controller import TransactionStorage
+from api.testing import InProcessClient
+from dsa.tiered_store import TieredStore
+
+
+def make_store(capacity, is_cold=None, clock=None):
+    extra = {'clock': clock} if clock else {}
+    return TieredStore(':memory:', encode=json.dumps, decode=json.loads, hot_capacity=capacity,
+                       is_cold=is_cold, sweep_interval=10, **extra)
+
+
+def test_lru_demotion_and_promotion():
+    """Overflow goes cold least recently used first; reads promote; order is insertion order"""
+    store = make_store(2)
+    for key in 'abcd':
+        store[key] = {'key': key}
+    assert store.tier_sizes() == {'hot': 2, 'cold': 2}
+    assert list(store) == ['a', 'b', 'c', 'd'] and len(store) == 4
+
+    assert store['a'] == {'key': 'a'}          # cold -> hot, demotes c
+    assert store['d'] == {'key': 'd'}          # hot hit
+    assert (store.hits, store.misses) == (1, 1) and store.hit_ratio() == 0.5
+    assert 'c' in store and 'z' not in store
+    assert store.tier_sizes() == {'hot': 2, 'cold': 2}
+
+    # values() and items() scan every tier without promoting anything
+    assert [value['key'] for value in store.values()] == ['a', 'b', 'c', 'd']
+    assert (store.hits, store.misses) == (1, 1)
+
+    assert store.pop('b') == {'key': 'b'} and store.pop('b', None) is None
+    del store['a']
+    assert list(store) == ['c', 'd'] and store.get('a') is None
+    try:
+        del store['a']
+        assert False, "expected KeyError"
+    except KeyError:
+        pass
+
+
+def test_age_based_spill():
+    """Aged entries are written cold, and hot entries that age are swept out on a later write"""
+    now = [0.0]
+    old = set()
+    store = make_store(10, is_cold=lambda value: value['key'] in old, clock=lambda: now[0])
+    old.add('x')
+    store['x'] = {'key': 'x'}
+    store['y'] = {'key': 'y'}
+    assert store.tier_sizes() == {'hot': 1, 'cold': 1}
+    old.add('y')
+    now[0] = 11.0
+    store['z'] = {'key': 'z'}
+    assert store.tier_sizes() == {'hot': 1, 'cold': 2}
+    assert store['x'] == {'key': 'x'} and store.tier_sizes() == {'hot': 2, 'cold': 1}
+
+
+def test_storage_contract_unchanged():
+    """get_all/get_by_id/create/update/delete behave the same with most records on disk"""
+    tiered = TransactionStorage()
+    ids = list(tiered.transactions)
+    before = {t.transaction_id: t.to_dict() for t in tiered.get_all()}
+    tiered.enable_tiering(':memory:', hot_capacity=10)
+    assert tiered.tier_sizes()['cold'] == len(ids) - 10
+    assert [t.to_dict() for t in tiered.get_all()] == list(before.values())
+
+    client = InProcessClient(auth=('admin', 'admin123'), storage=tiered)
+    cold_id = ids[0]
+    assert client.get(f'/transactions/{cold_id}').json() == before[cold_id]
+    assert client.put(f'/transactions/{cold_id}', {'status': 'Pending'}).json()['status'] == 'Pending'
+    for txn_id in ids[-20:]:
+        client.get(f'/transactions/{txn_id}')
+    # Demoted after the update, the change survives the round trip through SQLite
+    assert tiered.tier_sizes()['hot'] == 10
+    assert tiered.get_by_id(cold_id).status == 'Pending'
+
+    created = client.post('/transactions', {'amount': 7, 'transaction_type': 'Transfer'}).json()
+    assert client.post('/transactions', dict(created)).status == 409
+    assert client.delete(f'/transactions/{ids[1]}').status == 200
+    assert client.get(f'/transactions/{ids[1]}').status == 404
+    assert len(client.get('/transactions').json()) == len(ids)
+
+
+def test_update_with_one_hot_slot():
+    """With room for one record in memory, updates to cold records are written back and survive demotion"""
+    storage = TransactionStorage()
+    ids = list(storage.transactions)
+    storage.enable_tiering(':memory:', hot_capacity=1)
+    client = InProcessClient(auth=('admin', 'admin123'), storage=storage)
+    for number, txn_id in enumerate(ids[:5]):
+        response = client.put(f'/transactions/{txn_id}', {'status': f'Checked {number}', 'amount': number + 1})
+        assert response.status == 200
+        assert storage.tier_sizes() == {'hot': 1, 'cold': len(ids) - 1}
+    for number, txn_id in enumerate(ids[:5]):
+        stored = client.get(f'/transactions/{txn_id}').json()
+        assert stored['status'] == f'Checked {number}' and stored['amount'] == number + 1
+    assert list(storage.transactions) == ids
+    assert all(storage.lookup('status', f'Checked {number}') == {txn_id} for number, txn_id in enumerate(ids[:5]))
+
+
+def test_balance_queries_never_scan_the_store():
+    """Balance history is kept up to date on writes, so queries never read the cold tier back"""
+    paths = ['/balance?at=2025-01-01', '/balance/gaps', '/transactions/series?points=50&metric=amount']
+    plain = TransactionStorage(partitions=2)
+    tiered = TransactionStorage(partitions=2)
+    tiered.enable_tiering(':memory:', hot_capacity=10)
+    known = next(iter(plain.transactions))
+
+    def scan():
+        raise AssertionError("the store was scanned")
+    for partition in tiered.transactions.partitions:
+        partition.data.values = partition.data.items = scan
+
+    results = []
+    for storage in (plain, tiered):
+        client = InProcessClient(auth=('admin', 'admin123'), storage=storage)
+        bodies = [client.get(path).body for path in paths]
+        client.post('/transactions', {'transaction_id': 'late', 'amount': 7, 'balance_after': 1,
+                                      'transaction_date': '2030-01-01T00:00:00', 'transaction_type': 'Transfer'})
+        client.put(f'/transactions/{known}', {'transaction_date': '2031-01-01T00:00:00'})
+        results.append(bodies + [client.get(path).body for path in paths])
+    assert results[0] == results[1]
+    assert results[0][:3] != results[0][3:]
+
+
+def test_cold_file_in_use():
+    """A second store cannot open, and so cannot wipe, a cold file another store is using"""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'cold.sqlite3')
+        first = TieredStore(f'{path}.1', encode=json.dumps, decode=json.loads, hot_capacity=1)
+        first['a'], first['b'] = 1, 2
+        try:
+            TieredStore(f'{path}.1', encode=json.dumps, decode=json.loads)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("cold file in use was opened again")
+
+        # Partition 1's file is taken: storage stays untiered and partition 0's file is released
+        storage = TransactionStorage(partitions=2)
+        try:
+            storage.enable_tiering(path, hot_capacity=10)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("tiering was enabled on a cold file in use")
+        assert storage.tier_sizes() is None
+        TieredStore(f'{path}.0', encode=json.dumps, decode=json.loads).close()
+
+        assert first.tier_sizes() == {'hot': 1, 'cold': 1} and first['a'] == 1
+        first.close()
+
+
+if __name__ == "__main__":
+    test_lru_demotion_and_promotion()
+    test_age_based_spill()
+    test_storage_contract_unchanged()
+    test_update_with_one_hot_slot()
+    test_balance_queries_never_scan_the_store()
+    test_cold_file_in_use()
+    print("\nTiered storage tests passed!")
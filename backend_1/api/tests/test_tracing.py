@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test opt-in request tracing: Server-Timing headers, X-Request-ID echo and sampled JSON-lines traces
+"""
+
+import json
+import os
+import re
+import tempfile
+from api.controllers.storage_controller import TransactionStorage
+from api.controllers.tracing_controller import RequestTracer
+from api.testing import InProcessClient
+
+storage = TransactionStorage()
+
+
+def test_disabled_by_default():
+    """Without configure() no tracing headers are sent"""
+    client = InProcessClient(auth=('user', 'user123'), storage=storage, tracer=RequestTracer())
+    response = client.get('/transactions', headers={'X-Request-ID': 'abc'})
+    assert response.status == 200
+    assert 'Server-Timing' not in response.headers and 'X-Request-ID' not in response.headers
+
+
+def test_server_timing_and_request_id():
+    """Phases timed before the headers are reported, and the caller's request ID is echoed"""
+    tracer = RequestTracer()
+    tracer.configure(enabled=True)
+    client = InProcessClient(auth=('user', 'user123'), storage=storage, tracer=tracer)
+    known = next(iter(storage.transactions))
+
+    response = client.get(f'/transactions/{known}', headers={'X-Request-ID': 'req-42'})
+    assert response.headers['X-Request-ID'] == 'req-42'
+    timing = response.headers['Server-Timing']
+    phases = dict(re.fullmatch(r'(\w+);dur=(\d+\.\d{3})', part.strip()).groups() for part in timing.split(','))
+    assert 'storage' in phases and list(phases)[-1] == 'total'
+    assert float(phases['storage']) <= float(phases['total'])
+
+    generated = client.get('/transactions/no-such-id').headers['X-Request-ID']
+    assert re.fullmatch(r'[0-9a-f]{32}', generated)
+
+
+def test_sampled_trace_file():
+    """Sampled requests are appended to the trace file as JSON lines; sample rate 0 writes nothing"""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'traces.jsonl')
+        tracer = RequestTracer()
+        tracer.configure(enabled=True, sample_rate=1.0, trace_file=path)
+        client = InProcessClient(auth=('user', 'user123'), storage=storage, tracer=tracer)
+        client.get('/transactions?limit=5', headers={'X-Request-ID': 'first'})
+        client.get('/transactions/no-such-id', headers={'X-Request-ID': 'second'})
+        tracer.configure(enabled=True, sample_rate=0.0, trace_file=path)
+        client.get('/transactions')
+        with open(path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+
+    assert [(record['request_id'], record['status']) for record in records] == [('first', 200), ('second', 404)]
+    assert records[0]['method'] == 'GET' and records[0]['path'] == '/transactions?limit=5'
+    assert {'storage', 'write'} <= set(records[0]['phases_ns'])
+    assert records[0]['total_ns'] >= sum(records[0]['phases_ns'].values())
+
+
+if __name__ == "__main__":
+    test_disabled_by_default()
+    test_server_timing_and_request_id()
+    test_sampled_trace_file()
+    print("\nTracing tests passed!")
@@ -57,7 +57,7 @@ def test_xml_loading():
     if all_transactions:
         print("Sample transactions from storage:")
         for i, txn in enumerate(all_transactions[:3]):
-            print(f"   {i+1}. {txn.transaction_type} - {txn.amount} RWF")
+            print(f"   {i+1}. {txn.transaction_type} - {txn.to_dict()['amount']} RWF")
 
     return len(all_transactions) > 0
 
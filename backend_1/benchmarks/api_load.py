@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator and latency benchmark for the REST API
+
+Starts server.py (run_server) in a subprocess on a free local port, or targets an
+already running server with --url, and drives a weighted mix of list, get, create,
+update and delete requests with Basic auth from concurrent workers. Reports
+throughput and p50/p95/p99 latency per operation and saves JSON results that can
+be compared against a stored baseline:
+
+    python -m benchmarks.api_load --concurrency 8 --duration 15
+    python -m benchmarks.api_load --mix get=80,put=20 --compare benchmarks/results/api_load_abc1234.json
+"""
+
+import base64
+import http.client
+import json
+import math
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.common import (default_output_path, environment_info, load_results,
+                               print_comparison, save_results)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MIX = 'list=5,get=60,post=15,put=15,delete=5'
+OPERATIONS = ('list', 'get', 'post', 'put', 'delete')
+
+
+def parse_mix(text):
+    """Parse 'get=60,post=20' into (operations, weights)"""
+    operations, weights = [], []
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}', expected one of {', '.join(OPERATIONS)}")
+        operations.append(name)
+        weights.append(float(weight or 1))
+    return operations, weights
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    """Throughput and latency percentiles (milliseconds) for one list of latencies"""
+    ordered = sorted(latencies)
+    summary = {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': len(ordered) / elapsed if elapsed else None,
+        'max_ms': ordered[-1] * 1e3 if ordered else None
+    }
+    for name, fraction in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+        value = percentile(ordered, fraction)
+        summary[name] = value * 1e3 if value is not None else None
+    return summary
+
+
+def free_port():
+    """Ask the OS for an unused local port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class ManagedServer:
+    """Runs server.py in a subprocess for the duration of a benchmark"""
+
+    def __init__(self, port, extra_args=()):
+        self.port = port
+        self.extra_args = list(extra_args)
+        self.process = None
+
+    def __enter__(self):
+        command = [sys.executable, 'server.py', str(self.port), '127.0.0.1'] + self.extra_args
+        self.process = subprocess.Popen(command, cwd=PROJECT_ROOT,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.process.returncode}")
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=1)
+                connection.request('GET', '/')
+                connection.getresponse().read()
+                connection.close()
+                return self
+            except OSError:
+                time.sleep(0.1)
+        self.__exit__(None, None, None)
+        raise RuntimeError("Server did not start within 60 seconds")
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        return False
+
+
+class LoadGenerator:
+    """Drives a weighted request mix against one server from concurrent workers"""
+
+    def __init__(self, host, port, username='admin', password='admin123',
+                 mix=DEFAULT_MIX, concurrency=4, duration=10.0, max_requests=None, seed=42):
+        self.host = host
+        self.port = port
+        credentials = base64.b64encode(f"{username}:{password}".encode('utf-8')).decode('ascii')
+        self.headers = {'Authorization': f"Basic {credentials}", 'Content-Type': 'application/json'}
+        self.operations, self.weights = parse_mix(mix)
+        self.concurrency = concurrency
+        self.duration = duration
+        self.max_requests = max_requests
+        self.seed = seed
+        self.known_ids = []
+        self.created_ids = []
+        self._ids_lock = threading.Lock()
+        self._issued = 0
+        self._issued_lock = threading.Lock()
+        self.latencies = {name: [] for name in OPERATIONS}
+        self.errors = {name: 0 for name in OPERATIONS}
+
+    def _request(self, connection, method, path, body=None):
+        """Send one request and return (status, parsed JSON body or None)"""
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        connection.request(method, path, body=payload, headers=self.headers)
+        response = connection.getresponse()
+        data = response.read()
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+    def _seed_ids(self):
+        """Fetch the existing transaction IDs used by get and put"""
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        status, data = self._request(connection, 'GET', '/transactions')
+        connection.close()
+        if status != 200:
+            raise RuntimeError(f"GET /transactions returned {status}; check credentials")
+        self.known_ids = [txn['transaction_id'] for txn in data]
+
+    def _next_ticket(self):
+        """Reserve one request slot when --requests bounds the run"""
+        if self.max_requests is None:
+            return True
+        with self._issued_lock:
+            if self._issued >= self.max_requests:
+                return False
+            self._issued += 1
+            return True
+
+    def _one(self, connection, rng, operation):
+        """Run one operation; returns the operation actually performed and whether it succeeded"""
+        if operation == 'delete':
+            with self._ids_lock:
+                target = self.created_ids.pop() if self.created_ids else None
+            if target is None:
+                # Only delete records this run created, so the dataset stays stable
+                operation = 'post'
+            else:
+                status, _ = self._request(connection, 'DELETE', f'/transactions/{target}')
+                return operation, status == 200
+        if operation == 'post':
+            body = {'sender_name': 'Load Test', 'receiver_name': f'Receiver {rng.randint(1, 500)}',
+                    'amount': rng.randint(100, 100000), 'fee': 0, 'transaction_type': 'Transfer',
+                    'remarks': 'Created by benchmarks.api_load'}
+            status, data = self._request(connection, 'POST', '/transactions', body)
+            if status == 201 and data:
+                with self._ids_lock:
+                    self.created_ids.append(data['transaction_id'])
+            return operation, status == 201
+        if operation == 'list':
+            status, _ = self._request(connection, 'GET', '/transactions')
+            return operation, status == 200
+        target = rng.choice(self.known_ids) if self.known_ids else 'missing'
+        if operation == 'get':
+            status, _ = self._request(connection, 'GET', f'/transactions/{target}')
+        else:
+            status, _ = self._request(connection, 'PUT', f'/transactions/{target}',
+                                      {'status': rng.choice(('Completed', 'Pending'))})
+        return operation, status == 200
+
+    def _worker(self, index, deadline, results):
+        """Issue requests until the deadline or the request budget runs out"""
+        rng = random.Random(self.seed + index)
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        latencies = {name: [] for name in OPERATIONS}
+        errors = {name: 0 for name in OPERATIONS}
+        while time.perf_counter() < deadline and self._next_ticket():
+            operation = rng.choices(self.operations, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                operation, ok = self._one(connection, rng, operation)
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+            latencies[operation].append(time.perf_counter() - start)
+            if not ok:
+                errors[operation] += 1
+        connection.close()
+        results[index] = (latencies, errors)
+
+    def run(self):
+        """Run the load and return the summary"""
+        self._seed_ids()
+        results = [None] * self.concurrency
+        deadline = time.perf_counter() + (self.duration if self.max_requests is None else 1e9)
+        threads = [threading.Thread(target=self._worker, args=(i, deadline, results))
+                   for i in range(self.concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        for latencies, errors in results:
+            for name in OPERATIONS:
+                self.latencies[name].extend(latencies[name])
+                self.errors[name] += errors[name]
+
+        operations = {name: summarize(self.latencies[name], self.errors[name], elapsed)
+                      for name in OPERATIONS if self.latencies[name]}
+        everything = [value for name in OPERATIONS for value in self.latencies[name]]
+        return {
+            'elapsed_seconds': elapsed,
+            'overall': summarize(everything, sum(self.errors.values()), elapsed),
+            'operations': operations
+        }
+
+
+def print_summary(summary):
+    """Print the per-operation latency table"""
+    print(f"\n{'Operation':<10} {'Requests':>9} {'Errors':>7} {'RPS':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    rows = list(summary['operations'].items()) + [('overall', summary['overall'])]
+    for name, stats in rows:
+        print(f"{name:<10} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput_rps']:>9.1f} "
+              f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['max_ms']:>8.2f}")
+
+
+def compare(baseline, current):
+    """Compare throughput and tail latency with a stored baseline"""
+    rows = []
+    for name, stats in [('overall', current['summary']['overall'])] + list(current['summary']['operations'].items()):
+        old = baseline['summary']['overall'] if name == 'overall' else baseline['summary']['operations'].get(name)
+        if not old:
+            continue
+        rows.append((f"{name} rps", old['throughput_rps'], stats['throughput_rps'], True))
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            rows.append((f"{name} {key}", old[key], stats[key], False))
+    print(f"\nComparison against {baseline['environment']['commit']}:")
+    print_comparison(rows)
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='Load-test the SMS Transactions REST API')
+    arg_parser.add_argument('--url', help='Target an already running server instead of starting one')
+    arg_parser.add_argument('--server-args', default='', help='Extra arguments for server.py, e.g. "--trace"')
+    arg_parser.add_argument('--concurrency', type=int, default=4, help='Concurrent workers (default: 4)')
+    arg_parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run (default: 10)')
+    arg_parser.add_argument('--requests', type=int, help='Stop after this many requests instead of --duration')
+    arg_parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Operation weights (default: {DEFAULT_MIX})')
+    arg_parser.add_argument('--user', default='admin:admin123', help='Basic auth credentials (default: admin:admin123)')
+    arg_parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    arg_parser.add_argument('--output', help='Result file (default: benchmarks/results/api_load_<commit>.json)')
+    arg_parser.add_argument('--compare', metavar='BASELINE', help='Compare against an earlier result file')
+    args = arg_parser.parse_args()
+
+    username, _, password = args.user.partition(':')
+    settings = {'mix': args.mix, 'concurrency': args.concurrency, 'duration': args.duration,
+                'requests': args.requests, 'server_args': args.server_args}
+
+    def run(host, port):
+        generator = LoadGenerator(host, port, username, password, mix=args.mix,
+                                  concurrency=args.concurrency, duration=args.duration,
+                                  max_requests=args.requests, seed=args.seed)
+        return generator.run()
+
+    if args.url:
+        target = urlsplit(args.url)
+        summary = run(target.hostname, target.port or 80)
+    else:
+        port = free_port()
+        print(f"Starting server.py on 127.0.0.1:{port} {args.server_args}".rstrip())
+        with ManagedServer(port, shlex.split(args.server_args)):
+            summary = run('127.0.0.1', port)
+
+    print_summary(summary)
+    results = {'benchmark': 'api_load', 'environment': environment_info(),
+               'settings': settings, 'summary': summary}
+    save_results(args.output or default_output_path('api_load'), results)
+    if args.compare:
+        compare(load_results(args.compare), results)
+
+
+if __name__ == '__main__':
+    main()
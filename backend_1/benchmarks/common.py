@@ -0,0 +1,74 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def git_commit():
+    """Short hash of the checked-out commit, or 'unknown' outside a git checkout"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def environment_info():
+    """Metadata stored with every result file so runs can be compared across commits"""
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where the resource module is unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux but bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def default_output_path(name):
+    """results/<name>_<commit>.json next to this module"""
+    return os.path.join(RESULTS_DIR, f"{name}_{git_commit()}.json")
+
+
+def save_results(path, results):
+    """Write benchmark results as JSON, creating the results directory if needed"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {path}")
+
+
+def load_results(path):
+    """Read a result file written by save_results"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def print_comparison(rows):
+    """Print (label, baseline, current, higher_is_better) rows with relative change"""
+    print(f"{'Metric':<40} {'Baseline':>14} {'Current':>14} {'Change':>9}")
+    for label, baseline, current, higher_is_better in rows:
+        if not baseline or current is None:
+            change = 'n/a'
+        else:
+            delta = (current - baseline) / baseline * 100
+            better = delta >= 0 if higher_is_better else delta <= 0
+            change = f"{delta:+.1f}%{'' if better else ' !'}"
+        baseline_text = f"{baseline:,.3f}" if baseline is not None else '-'
+        current_text = f"{current:,.3f}" if current is not None else '-'
+        print(f"{label:<40} {baseline_text:>14} {current_text:>14} {change:>9}")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+TransactionEncoder vs json.dumps benchmark
+
+Builds deterministic synthetic Transaction records and encodes them as one JSON
+array both ways: json.dumps over to_dict() (what the API did before) and
+TransactionEncoder.encode_list into a reused bytearray. Checks the bytes are
+identical, then reports records per second for each indent:
+
+    python -m benchmarks.encoder_benchmark
+    python -m benchmarks.encoder_benchmark --records 100000 --compare benchmarks/results/encoder_abc1234.json
+"""
+
+import json
+import random
+import time
+
+from benchmarks.common import default_output_path, environment_info, load_results, print_comparison, save_results
+
+DEFAULT_RECORDS = 1000000
+NAMES = ('Jane Smith', 'Samuel Carter', 'Linda Green', 'Account Holder', None, 'Zoë "Zed" Müller')
+TYPES = ('Transfer', 'Payment', 'Deposit', 'Withdrawal', 'Airtime')
+
+
+def make_records(count, seed):
+    """count Transactions with varied names, money (minor units) and remarks"""
+    from api.models import Transaction
+
+    rng = random.Random(seed)
+    records = []
+    for number in range(count):
+        transaction = Transaction(
+            transaction_id=f"txn_{number:012x}",
+            sender_name=rng.choice(NAMES), receiver_name=rng.choice(NAMES),
+            amount=rng.randrange(100, 10 ** 9), fee=rng.choice((0, 0, 2000, rng.randrange(10 ** 5))),
+            balance_after=rng.choice((None, rng.randrange(10 ** 10))),
+            transaction_date=f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}T10:30:00",
+            transaction_type=rng.choice(TYPES), status=rng.choice(('Completed', 'Pending')),
+            remarks=rng.choice((None, 'Payment for services', 'Line one\nline two')))
+        transaction.created_at = transaction.updated_at = transaction.transaction_date
+        records.append(transaction)
+    return records
+
+
+def best_of(repeat, function):
+    """Fastest of `repeat` timed calls, and the last result"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def run(records, indent, repeat):
+    """Time both encoders for one indent and check they agree"""
+    from api.encoder import TransactionEncoder
+
+    encoder = TransactionEncoder(indent=indent)
+    buffer = bytearray()
+
+    def fast():
+        buffer.clear()
+        return encoder.encode_list(records, buffer)
+
+    json_seconds, expected = best_of(repeat, lambda: json.dumps([txn.to_dict() for txn in records],
+                                                                indent=indent).encode('utf-8'))
+    encoder_seconds, encoded = best_of(repeat, fast)
+    if encoded != expected:
+        raise AssertionError(f"TransactionEncoder output differs from json.dumps (indent={indent})")
+    return {
+        'indent': indent,
+        'bytes': len(expected),
+        'json_seconds': json_seconds,
+        'encoder_seconds': encoder_seconds,
+        'json_records_per_second': len(records) / json_seconds,
+        'encoder_records_per_second': len(records) / encoder_seconds,
+        'speedup': json_seconds / encoder_seconds
+    }
+
+
+def compare(baseline, current):
+    """Compare two result files indent by indent"""
+    rows = []
+    baseline_runs = {run['indent']: run for run in baseline['runs']}
+    for result in current['runs']:
+        old = baseline_runs.get(result['indent'])
+        if old is None:
+            continue
+        label = f"indent={result['indent']}"
+        rows.append((f"{label} json rec/s", old['json_records_per_second'], result['json_records_per_second'], True))
+        rows.append((f"{label} encoder rec/s", old['encoder_records_per_second'],
+                     result['encoder_records_per_second'], True))
+    print(f"\nComparison against {baseline['environment']['commit']}:")
+    print_comparison(rows)
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='Benchmark TransactionEncoder against json.dumps')
+    arg_parser.add_argument('--records', type=int, default=DEFAULT_RECORDS,
+                            help='Records per array (default: 1000000)')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='Timed runs per encoder; the best counts (default: 3)')
+    arg_parser.add_argument('--seed', type=int, default=42, help='Record generator seed (default: 42)')
+    arg_parser.add_argument('--output', help='Result file (default: benchmarks/results/encoder_<commit>.json)')
+    arg_parser.add_argument('--compare', metavar='BASELINE', help='Compare against an earlier result file')
+    args = arg_parser.parse_args()
+
+    print(f"Generating {args.records:,} records")
+    records = make_records(args.records, args.seed)
+    results = {'benchmark': 'encoder', 'environment': environment_info(),
+               'records': args.records, 'seed': args.seed, 'runs': []}
+    print(f"{'indent':<8} {'MiB':>8} {'json.dumps rec/s':>18} {'encoder rec/s':>15} {'speedup':>8}")
+    for indent in (None, 2):
+        result = run(records, indent, args.repeat)
+        results['runs'].append(result)
+        print(f"{str(indent):<8} {result['bytes'] / 2**20:>8.1f} {result['json_records_per_second']:>18,.0f} "
+              f"{result['encoder_records_per_second']:>15,.0f} {result['speedup']:>7.2f}x")
+
+    save_results(args.output or default_output_path('encoder'), results)
+    if args.compare:
+        compare(load_results(args.compare), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Handler-level microbenchmark for the REST API, without sockets
+
+Drives TransactionAPIHandler in-process through api.testing.InProcessClient, so the
+timings cover request parsing, routing, auth, storage and JSON encoding but no
+network, kernel or client overhead. Request bytes are encoded before the clock
+starts and responses are parsed after it stops. Reports per-operation latency
+percentiles and saves JSON results that can be compared across commits:
+
+    python -m benchmarks.handler_benchmark --iterations 5000
+    python -m benchmarks.handler_benchmark --compare benchmarks/results/handler_abc1234.json
+"""
+
+import time
+
+from benchmarks.api_load import summarize
+from benchmarks.common import (default_output_path, environment_info, load_results,
+                               print_comparison, save_results)
+
+OPERATIONS = ('root', 'get', 'mget', 'list', 'post', 'put', 'delete')
+# Listing every transaction is ~1000x the cost of the other operations, so it runs less often
+LIST_FRACTION = 0.02
+
+
+def run_benchmark(iterations, operations=OPERATIONS, mget_size=50):
+    """Time each operation `iterations` times and return the summary"""
+    from api.controllers.storage_controller import TransactionStorage
+    from api.testing import InProcessClient, parse_response
+
+    storage = TransactionStorage()
+    client = InProcessClient(auth=('admin', 'admin123'), storage=storage)
+    known_ids = list(storage.transactions)
+    mget_ids = ','.join(known_ids[:mget_size])
+    new_transaction = {'sender_name': 'Handler Benchmark', 'receiver_name': 'Receiver', 'amount': 1500,
+                       'fee': 0, 'transaction_type': 'Transfer', 'remarks': 'Created by benchmarks.handler_benchmark'}
+    created_ids = []
+
+    def request_for(operation, i):
+        if operation == 'root':
+            return client.encode_request('GET', '/')
+        if operation == 'get':
+            return client.encode_request('GET', f'/transactions/{known_ids[i % len(known_ids)]}')
+        if operation == 'mget':
+            return client.encode_request('GET', f'/transactions?ids={mget_ids}')
+        if operation == 'list':
+            return client.encode_request('GET', '/transactions')
+        if operation == 'post':
+            return client.encode_request('POST', '/transactions', new_transaction)
+        if operation == 'put':
+            return client.encode_request('PUT', f'/transactions/{known_ids[i % len(known_ids)]}',
+                                         {'status': 'Completed' if i % 2 else 'Pending'})
+        return client.encode_request('DELETE', f'/transactions/{created_ids.pop()}')
+
+    expected = {'post': 201}
+    summaries = {}
+    start_all = time.perf_counter()
+    for operation in operations:
+        count = max(1, int(iterations * LIST_FRACTION)) if operation == 'list' else iterations
+        if operation == 'delete':
+            count = min(count, len(created_ids))
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for i in range(count):
+            raw_request = request_for(operation, i)
+            start = time.perf_counter()
+            raw_response = client.send_raw(raw_request)
+            latencies.append(time.perf_counter() - start)
+            response = parse_response(raw_response, raw_request.split(b' ', 1)[0].decode('ascii'))
+            if response.status != expected.get(operation, 200):
+                errors += 1
+            elif operation == 'post':
+                created_ids.append(response.json()['transaction_id'])
+        summaries[operation] = summarize(latencies, errors, sum(latencies))
+        summaries[operation]['wall_seconds'] = time.perf_counter() - started
+    return {'elapsed_seconds': time.perf_counter() - start_all, 'operations': summaries}
+
+
+def print_summary(summary):
+    """Print the per-operation latency table (microseconds)"""
+    print(f"\n{'Operation':<10} {'Requests':>9} {'Errors':>7} {'ops/s':>10} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'max us':>9}")
+    for name, stats in summary['operations'].items():
+        print(f"{name:<10} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput_rps']:>10.0f} "
+              f"{stats['p50_ms'] * 1e3:>9.1f} {stats['p95_ms'] * 1e3:>9.1f} {stats['p99_ms'] * 1e3:>9.1f} "
+              f"{stats['max_ms'] * 1e3:>9.1f}")
+
+
+def compare(baseline, current):
+    """Compare per-operation throughput and latency with a stored baseline"""
+    rows = []
+    for name, stats in current['summary']['operations'].items():
+        old = baseline['summary']['operations'].get(name)
+        if not old:
+            continue
+        rows.append((f"{name} ops/s", old['throughput_rps'], stats['throughput_rps'], True))
+        for key in ('p50_ms', 'p99_ms'):
+            rows.append((f"{name} {key}", old[key], stats[key], False))
+    print(f"\nComparison against {baseline['environment']['commit']}:")
+    print_comparison(rows)
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='Benchmark TransactionAPIHandler in-process')
+    arg_parser.add_argument('--iterations', type=int, default=2000,
+                            help=f'Requests per operation (default: 2000; list runs {LIST_FRACTION:.0%} of that)')
+    arg_parser.add_argument('--operations', default=','.join(OPERATIONS),
+                            help=f'Comma-separated subset of {",".join(OPERATIONS)}')
+    arg_parser.add_argument('--mget-size', type=int, default=50, help='IDs per multi-get request (default: 50)')
+    arg_parser.add_argument('--output', help='Result file (default: benchmarks/results/handler_<commit>.json)')
+    arg_parser.add_argument('--compare', metavar='BASELINE', help='Compare against an earlier result file')
+    args = arg_parser.parse_args()
+
+    operations = [name.strip() for name in args.operations.split(',') if name.strip()]
+    unknown = [name for name in operations if name not in OPERATIONS]
+    if unknown:
+        arg_parser.error(f"Unknown operation(s) {', '.join(unknown)}, expected {', '.join(OPERATIONS)}")
+
+    summary = run_benchmark(args.iterations, operations, args.mget_size)
+    print_summary(summary)
+    results = {'benchmark': 'handler', 'environment': environment_info(),
+               'settings': {'iterations': args.iterations, 'operations': operations, 'mget_size': args.mget_size},
+               'summary': summary}
+    save_results(args.output or default_output_path('handler'), results)
+    if args.compare:
+        compare(load_results(args.compare), results)
+
+
+if __name__ == '__main__':
+    main()
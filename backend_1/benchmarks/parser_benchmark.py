@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+SMSXMLParser throughput benchmark
+
+Generates deterministic synthetic exports (dsa.sms_generator) at several sizes and
+parses each one in a fresh subprocess, so peak RSS is measured per size. Reports
+messages per second, peak RSS and time per parser stage, and saves the results as
+JSON that can be compared across commits:
+
+    python -m benchmarks.parser_benchmark --sizes 10000,1000000
+    python -m benchmarks.parser_benchmark --compare benchmarks/results/parser_abc1234.json
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import (default_output_path, environment_info, load_results,
+                               peak_rss_bytes, print_comparison, save_results)
+
+DEFAULT_SIZES = (10000, 1000000, 10000000)
+RESULT_MARKER = 'BENCHMARK_RESULT '
+
+
+def run_one(xml_file_path):
+    """Parse one export with stage profiling and return the measurements (runs in the child)"""
+    from dsa.profiler import StageProfiler
+    from dsa.sms_parser import SMSXMLParser
+
+    profiler = StageProfiler()
+    parser = SMSXMLParser(xml_file_path, profiler=profiler)
+    start = time.perf_counter()
+    transactions = parser.parse_xml_file()
+    seconds = time.perf_counter() - start
+    seen = parser.stats['seen']
+    return {
+        'file_bytes': os.path.getsize(xml_file_path),
+        'messages': seen,
+        'transactions': len(transactions),
+        'seconds': seconds,
+        'messages_per_second': seen / seconds if seconds else None,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'stages': profiler.to_dict()
+    }
+
+
+def ensure_export(workdir, size, seed, noise):
+    """Generate the export for size once and reuse it on later runs"""
+    from dsa.sms_generator import generate_export
+
+    path = os.path.join(workdir, f"sms_{size}_seed{seed}_noise{noise}.xml")
+    if not os.path.exists(path):
+        print(f"Generating {size:,} messages -> {path}")
+        start = time.perf_counter()
+        generate_export(path + '.tmp', size, seed=seed, noise_ratio=noise)
+        os.replace(path + '.tmp', path)
+        print(f"  generated in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def measure(path):
+    """Run run_one for path in a fresh interpreter and return its result"""
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.parser_benchmark', '--run-one', path],
+                            check=True, capture_output=True, text=True).stdout
+    for line in output.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    raise RuntimeError(f"No benchmark result in output for {path}")
+
+
+def print_result(size, result):
+    """Print one size's headline numbers and stage breakdown"""
+    rss = result['peak_rss_bytes']
+    rss_text = f"{rss / 2**20:,.1f} MiB" if rss else 'n/a'
+    print(f"\n{size:,} messages ({result['file_bytes'] / 2**20:,.1f} MiB): "
+          f"{result['seconds']:.2f}s, {result['messages_per_second']:,.0f} msg/s, peak RSS {rss_text}")
+    for name, stage in result['stages'].items():
+        print(f"  {name:<12} {stage['seconds']:>9.3f}s  ({stage['calls']:,} calls)")
+
+
+def compare(baseline, current):
+    """Compare two result files size by size"""
+    rows = []
+    baseline_runs = {run['size']: run for run in baseline['runs']}
+    for run in current['runs']:
+        old = baseline_runs.get(run['size'])
+        if old is None:
+            continue
+        label = f"{run['size']:,}"
+        rows.append((f"{label} msg/s", old['messages_per_second'], run['messages_per_second'], True))
+        rows.append((f"{label} peak RSS MiB",
+                     old['peak_rss_bytes'] and old['peak_rss_bytes'] / 2**20,
+                     run['peak_rss_bytes'] and run['peak_rss_bytes'] / 2**20, False))
+        for name, stage in run['stages'].items():
+            old_stage = old['stages'].get(name)
+            if old_stage:
+                rows.append((f"{label} {name} s", old_stage['seconds'], stage['seconds'], False))
+    print(f"\nComparison against {baseline['environment']['commit']}:")
+    print_comparison(rows)
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='Benchmark SMSXMLParser on synthetic exports')
+    arg_parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                            help='Comma-separated message counts (default: 10000,1000000,10000000)')
+    arg_parser.add_argument('--seed', type=int, default=42, help='Generator seed (default: 42)')
+    arg_parser.add_argument('--noise', type=float, default=0.1, help='Share of non-matching messages (default: 0.1)')
+    arg_parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'sms_benchmark'),
+                            help='Where generated exports are cached')
+    arg_parser.add_argument('--output', help='Result file (default: benchmarks/results/parser_<commit>.json)')
+    arg_parser.add_argument('--compare', metavar='BASELINE', help='Compare against an earlier result file')
+    arg_parser.add_argument('--run-one', metavar='FILE', help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.run_one:
+        print(RESULT_MARKER + json.dumps(run_one(args.run_one)))
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = {'benchmark': 'parser', 'environment': environment_info(),
+               'seed': args.seed, 'noise': args.noise, 'runs': []}
+    for size in (int(size) for size in args.sizes.split(',')):
+        result = measure(ensure_export(args.workdir, size, args.seed, args.noise))
+        result['size'] = size
+        results['runs'].append(result)
+        print_result(size, result)
+
+    save_results(args.output or default_output_path('parser'), results)
+    if args.compare:
+        compare(load_results(args.compare), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+import heapq
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import datetime
+from operator import itemgetter
+
+# Transaction types that add to the balance; every other type is treated as a debit
+CREDIT_TYPES = frozenset(('Money Received', 'Bank Deposit'))
+# Keys of a gap record that hold money (minor units)
+GAP_MONEY_FIELDS = ('previous_balance', 'amount', 'fee', 'balance_after', 'expected_balance', 'discrepancy')
+
+# Columns of the index's three sections; each section is sorted by its first two (timestamp, transaction_id)
+_DATED = ('dated_times', 'dated_ids')
+_VOLUME = ('volume_times', 'volume_ids', 'volume_amounts')
+_BALANCE = ('times', 'ids', 'balances', 'amounts', 'fees', 'dates', 'types')
+_SECTIONS = (_DATED, _VOLUME, _BALANCE)
+_TIME_COLUMNS = frozenset(('dated_times', 'volume_times', 'times'))
+_MONEY_COLUMNS = frozenset(('volume_amounts', 'balances', 'amounts', 'fees'))
+_row_key = itemgetter(0, 1)
+
+
+def timestamp_ms(value):
+    """Epoch milliseconds for an ISO transaction_date, or None if it cannot be parsed"""
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int_array(values):
+    """array('q') of values, or a list if one of them does not fit in 64 bits"""
+    values = list(values)
+    try:
+        return array('q', values)
+    except OverflowError:
+        return values
+
+
+def _column(name, values):
+    if name in _TIME_COLUMNS:
+        return array('q', values)
+    if name in _MONEY_COLUMNS:
+        return _int_array(values)
+    return list(values)
+
+
+def _section_rows(when, transaction):
+    """The transaction's row in each section, or None where it does not belong"""
+    transaction_id = transaction.transaction_id
+    return (
+        (when, transaction_id),
+        None if transaction.amount is None else (when, transaction_id, transaction.amount),
+        None if transaction.balance_after is None else (
+            when, transaction_id, transaction.balance_after, transaction.amount or 0, transaction.fee or 0,
+            transaction.transaction_date, transaction.transaction_type),
+    )
+
+
+class _TimelineIndex:
+    """Parallel arrays sorted by (timestamp, transaction_id); money in minor units
+
+    times/balances/... cover transactions with a balance_after; volume_times and
+    volume_amounts cover every dated transaction with an amount; dated_times and
+    dated_ids cover every dated transaction. Money columns fall back to lists
+    when a stored value is beyond int64, so one such record cannot break queries.
+    """
+    __slots__ = _DATED + _VOLUME + _BALANCE
+
+    def __init__(self, dated=(), volume=(), balance=()):
+        # Each argument is an iterable of that section's rows, already sorted
+        for columns, rows in zip(_SECTIONS, (dated, volume, balance)):
+            columns_values = list(zip(*rows)) or [()] * len(columns)
+            for name, values in zip(columns, columns_values):
+                setattr(self, name, _column(name, values))
+
+    @staticmethod
+    def _position(times, ids, when, transaction_id):
+        """Where (when, transaction_id) is, or belongs, in a section"""
+        start = bisect_left(times, when)
+        return bisect_left(ids, transaction_id, start, bisect_right(times, when, start))
+
+    def insert(self, when, transaction):
+        """Insert the transaction's rows at their sorted positions"""
+        for columns, row in zip(_SECTIONS, _section_rows(when, transaction)):
+            if row is None:
+                continue
+            position = self._position(getattr(self, columns[0]), getattr(self, columns[1]), when, row[1])
+            for name, value in zip(columns, row):
+                column = getattr(self, name)
+                try:
+                    column.insert(position, value)
+                except OverflowError:
+                    column = list(column)
+                    column.insert(position, value)
+                    setattr(self, name, column)
+
+    def delete(self, when, transaction):
+        """Delete the rows insert() added for the transaction"""
+        for columns, row in zip(_SECTIONS, _section_rows(when, transaction)):
+            if row is None:
+                continue
+            times, ids = getattr(self, columns[0]), getattr(self, columns[1])
+            position = self._position(times, ids, when, row[1])
+            if position < len(ids) and ids[position] == row[1] and times[position] == when:
+                for name in columns:
+                    del getattr(self, name)[position]
+
+    def rows(self, section):
+        """The rows of one section (an index into _SECTIONS), in order"""
+        return list(zip(*(getattr(self, name) for name in _SECTIONS[section])))
+
+
+class BalanceTimeline:
+    """Balance history of the stored transactions, for as-of lookups and gap detection
+
+    Transactions with a parseable transaction_date are kept in arrays sorted by
+    date, so balance_at() and series() ranges are binary searches. The owner
+    calls add() and remove() on every write, which insert or delete rows at
+    their binary-searched position: the arrays are never re-sorted and the
+    store is never scanned.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = _TimelineIndex()
+        self._generation = 0
+
+    @property
+    def generation(self):
+        """Incremented by every add() and remove()"""
+        return self._generation
+
+    def add(self, transaction):
+        """Account for a stored transaction (ignored if its date cannot be parsed)"""
+        when = timestamp_ms(transaction.transaction_date)
+        if when is None:
+            return
+        with self._lock:
+            self._index.insert(when, transaction)
+            self._generation += 1
+
+    def remove(self, transaction):
+        """Undo add() for a transaction that is being updated or deleted"""
+        when = timestamp_ms(transaction.transaction_date)
+        if when is None:
+            return
+        with self._lock:
+            self._index.delete(when, transaction)
+            self._generation += 1
+
+    def rows(self, section):
+        """Snapshot of one section's sorted rows, for a PartitionedTimeline to merge"""
+        with self._lock:
+            return self._index.rows(section)
+
+    @contextmanager
+    def _reading(self):
+        """The current index; writers are held off until the block exits, so copy what you keep"""
+        with self._lock:
+            yield self._index
+
+    def __len__(self):
+        with self._reading() as index:
+            return len(index.times)
+
+    def balance_at(self, at_ms):
+        """Balance after the last transaction at or before at_ms, or None if there is none"""
+        with self._reading() as index:
+            position = bisect_right(index.times, at_ms) - 1
+            if position < 0:
+                return None
+            return {
+                'balance': index.balances[position],
+                'transaction_id': index.ids[position],
+                'transaction_date': index.dates[position]
+            }
+
+    def series(self, metric, from_ms=None, to_ms=None):
+        """(times, values) arrays for from_ms <= date < to_ms, ascending by time
+
+        metric is 'balance' (balance_after) or 'amount' (every transaction's amount).
+        """
+        if metric not in ('balance', 'amount'):
+            raise ValueError(f"Unknown metric '{metric}'")
+        with self._reading() as index:
+            if metric == 'balance':
+                times, values = index.times, index.balances
+            else:
+                times, values = index.volume_times, index.volume_amounts
+            start = bisect_left(times, from_ms) if from_ms is not None else 0
+            stop = bisect_left(times, to_ms) if to_ms is not None else len(times)
+            return times[start:stop], values[start:stop]
+
+    @staticmethod
+    def _dated_range(index, from_ms, to_ms):
+        times = index.dated_times
+        start = bisect_left(times, from_ms) if from_ms is not None else 0
+        stop = bisect_left(times, to_ms) if to_ms is not None else len(times)
+        return start, max(start, stop)
+
+    def count_between(self, from_ms=None, to_ms=None):
+        """Number of transactions dated from_ms <= date < to_ms"""
+        with self._reading() as index:
+            start, stop = self._dated_range(index, from_ms, to_ms)
+            return stop - start
+
+    def ids_between(self, from_ms=None, to_ms=None):
+        """IDs of the transactions dated from_ms <= date < to_ms, oldest first"""
+        with self._reading() as index:
+            start, stop = self._dated_range(index, from_ms, to_ms)
+            return index.dated_ids[start:stop]
+
+    def iter_gaps(self, from_ms=None, to_ms=None):
+        """Yield points whose balance_after does not follow from the previous balance
+
+        A point is consistent when balance_after equals the previous balance plus or
+        minus the amount, less the fee. Anything else means SMS are missing between
+        the two points. Only points with from_ms <= date < to_ms are checked.
+        """
+        # Copy the range (and the point before it) so writes are not held off while the caller iterates
+        with self._reading() as index:
+            times = index.times
+            start = max(1, bisect_left(times, from_ms) if from_ms is not None else 1)
+            stop = bisect_left(times, to_ms) if to_ms is not None else len(times)
+            first = start - 1
+            balances, amounts, fees, ids, dates, types = (
+                getattr(index, name)[first:stop] for name in ('balances', 'amounts', 'fees', 'ids', 'dates', 'types'))
+        for position in range(1, stop - first):
+            previous = balances[position - 1]
+            balance = balances[position]
+            amount = amounts[position]
+            fee = fees[position]
+            if balance == previous + amount - fee or balance == previous - amount - fee:
+                continue
+            credit = types[position] in CREDIT_TYPES
+            expected = previous + amount - fee if credit else previous - amount - fee
+            yield {
+                'transaction_id': ids[position],
+                'transaction_date': dates[position],
+                'transaction_type': types[position],
+                'previous_transaction_id': ids[position - 1],
+                'previous_transaction_date': dates[position - 1],
+                'previous_balance': previous,
+                'amount': amount,
+                'fee': fee,
+                'balance_after': balance,
+                'expected_balance': expected,
+                'discrepancy': balance - expected
+            }
+
+
+class PartitionedTimeline(BalanceTimeline):
+    """One balance history over several per-partition timelines
+
+    Each write updates only its own partition's timeline. The merged index is
+    rebuilt on the next query by a k-way merge of the partitions' sorted rows,
+    so nothing is re-sorted.
+    """
+
+    def __init__(self, parts):
+        super().__init__()
+        self.parts = list(parts)
+        # (generation it was merged at, _TimelineIndex)
+        self._merged = None
+
+    @property
+    def generation(self):
+        return sum(part.generation for part in self.parts)
+
+    def add(self, transaction):
+        raise TypeError("Write to the partition's own timeline")
+
+    remove = add
+
+    def rows(self, section):
+        return self._current().rows(section)
+
+    def _current(self):
+        cached = self._merged
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+        with self._lock:
+            cached = self._merged
+            if cached is not None and cached[0] == self.generation:
+                return cached[1]
+            generation = self.generation
+            index = _TimelineIndex(*(heapq.merge(*(part.rows(section) for part in self.parts), key=_row_key)
+                                     for section in range(len(_SECTIONS))))
+            # A write during the merge leaves the index stale, so only keep it if none happened
+            if generation == self.generation:
+                self._merged = (generation, index)
+            return index
+
+    @contextmanager
+    def _reading(self):
+        # The merged index is never modified, only replaced
+        yield self._current()
@@ -0,0 +1,59 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from dsa.quarantine import QuarantineStore
+from dsa.sms_parser import SMSXMLParser
+from dsa.templates import template_registry
+
+
+def expand_sources(sources):
+    """Expand files, directories (*.xml inside) and glob patterns into a sorted, de-duplicated path list"""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(os.path.join(source, name) for name in os.listdir(source)
+                         if name.lower().endswith('.xml'))
+        elif glob.has_magic(source):
+            paths.extend(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+        else:
+            paths.append(source)
+    return sorted(set(os.path.normpath(path) for path in paths))
+
+
+def parse_file(path, template_configs=()):
+    """Parse one export; runs inside a worker process
+
+    template_configs carries runtime-registered templates, which a spawned worker
+    would not otherwise know about.
+    """
+    start = time.perf_counter()
+    template_registry.register_configs(template_configs)
+    quarantine = QuarantineStore()
+    parser = SMSXMLParser(path, quarantine=quarantine)
+    transactions = parser.parse_xml_file()
+    return {
+        'file': path,
+        'transactions': transactions,
+        'quarantined': quarantine.values(),
+        'stats': parser.stats,
+        'parse_seconds': time.perf_counter() - start
+    }
+
+
+def parse_files(paths, workers=None):
+    """Parse many exports across a process pool, yielding results in path order
+
+    workers=None uses one process per CPU; workers=1 parses in this process.
+    """
+    worker = partial(parse_file, template_configs=template_registry.custom_configs())
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) <= 1:
+        for path in paths:
+            yield worker(path)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        for result in executor.map(worker, paths):
+            yield result
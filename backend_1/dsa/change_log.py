@@ -0,0 +1,102 @@
+import threading
+import uuid
+from collections import deque
+from itertools import islice
+
+# What a change did to its transaction; only 'deleted' removes it
+CHANGE_KINDS = ('created', 'updated', 'ingested', 'deleted')
+
+
+class ResyncRequired(Exception):
+    """The token predates the oldest retained change (or another server run); a full reload is needed"""
+
+
+class ChangeLog:
+    """Bounded, ordered log of writes for delta sync and live event streams
+
+    Every write appends (sequence, transaction_id, kind) with a sequence number
+    one higher than the previous, so the entries after a token are found by
+    offset rather than by search. Only the newest `capacity` entries are kept.
+    Tokens are '<epoch>-<sequence>'; the epoch is new for each log, so tokens
+    from an earlier server run are rejected instead of silently misread.
+    Listeners are called (without arguments) after every append.
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.epoch = uuid.uuid4().hex[:8]
+        self._entries = deque(maxlen=capacity)
+        self._last = 0
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add_listener(self, callback):
+        """Call callback() after each recorded change (it must not block)"""
+        self._listeners.append(callback)
+
+    def record(self, transaction_id, kind='updated'):
+        """Append a change (one of CHANGE_KINDS); returns its sequence number"""
+        if kind not in CHANGE_KINDS:
+            raise ValueError(f"Unknown change kind '{kind}'")
+        with self._lock:
+            self._last += 1
+            sequence = self._last
+            self._entries.append((sequence, transaction_id, kind))
+        for callback in self._listeners:
+            callback()
+        return sequence
+
+    @property
+    def last_sequence(self):
+        return self._last
+
+    def token(self, sequence=None):
+        """Token for a sequence number (default: the latest change)"""
+        return f"{self.epoch}-{self._last if sequence is None else sequence}"
+
+    def parse_token(self, token):
+        """Sequence number for a token; raises ValueError if malformed, ResyncRequired if from another run"""
+        epoch, separator, sequence = token.partition('-')
+        if not separator or not sequence.isdigit():
+            raise ValueError(f"Invalid sync token '{token}'")
+        if epoch != self.epoch or int(sequence) > self._last:
+            raise ResyncRequired(f"Sync token '{token}' was not issued by this server run")
+        return int(sequence)
+
+    def _after(self, sequence):
+        """Entries with a sequence number above `sequence` (caller holds the lock)"""
+        entries = self._entries
+        first = entries[0][0] if entries else self._last + 1
+        if sequence < first - 1:
+            raise ResyncRequired(f"Changes after {sequence} are no longer retained")
+        return islice(entries, sequence - first + 1, None)
+
+    def events(self, sequence, limit=None):
+        """Up to `limit` raw (sequence, transaction_id, kind) entries after sequence, oldest first
+
+        Raises ResyncRequired if entries after sequence were already evicted.
+        """
+        with self._lock:
+            return list(islice(self._after(sequence), limit))
+
+    def since(self, sequence, limit=None):
+        """Changes after sequence: ([(transaction_id, deleted), ...], last sequence covered)
+
+        Repeated changes to one ID collapse into its latest, ordered by that latest
+        change. With limit, at most `limit` distinct IDs are returned and the last
+        sequence covered is where the next call should continue. Raises
+        ResyncRequired if entries after sequence were already evicted.
+        """
+        pending = self.events(sequence)
+        latest = {}
+        covered = sequence
+        for entry_sequence, transaction_id, kind in pending:
+            if limit is not None and transaction_id not in latest and len(latest) >= limit:
+                break
+            latest.pop(transaction_id, None)
+            latest[transaction_id] = kind == 'deleted'
+            covered = entry_sequence
+        return list(latest.items()), covered
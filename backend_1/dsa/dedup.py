@@ -0,0 +1,142 @@
+import dbm
+import hashlib
+import math
+import os
+import re
+import struct
+
+BLOOM_MAGIC = b'SMSBLOOM1'
+BLOOM_HEADER = struct.Struct('<QQQ')
+
+# The provider's own timestamp inside the body ("... at 2024-05-10 16:30:51 ...") survives re-sends
+BODY_TIME_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+
+
+def dedup_key(txn_data):
+    """Cross-export identity of a parsed transaction
+
+    Uses the provider's Financial Transaction Id when the template has one. Otherwise
+    falls back to a fingerprint of the parsed fields plus the timestamp quoted in the
+    body, so re-sent SMS that differ only in promo text or whitespace collapse together.
+    """
+    external_id = txn_data.get('external_transaction_id')
+    if external_id:
+        return f"ext:{external_id}"
+    raw_sms = txn_data.get('raw_sms') or ''
+    match = BODY_TIME_PATTERN.search(raw_sms)
+    event_time = match.group(0) if match else txn_data.get('transaction_date')
+    fingerprint = '|'.join(str(txn_data.get(field)) for field in
+                           ('transaction_type', 'amount', 'fee', 'balance_after', 'sender_name', 'receiver_name'))
+    digest = hashlib.md5(f"{fingerprint}|{event_time}".encode('utf-8')).hexdigest()[:16]
+    return f"fp:{digest}"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter with double hashing, persisted as a flat file"""
+
+    def __init__(self, capacity=1000000, error_rate=0.01, num_bits=None, num_hashes=None):
+        if num_bits is None:
+            num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        if num_hashes is None:
+            num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.count = 0
+        self.bits = bytearray((num_bits + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        """Add a key"""
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def save(self, path):
+        """Write the filter to path atomically"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(BLOOM_MAGIC)
+            f.write(BLOOM_HEADER.pack(self.num_bits, self.num_hashes, self.count))
+            f.write(self.bits)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a filter written by save()"""
+        with open(path, 'rb') as f:
+            if f.read(len(BLOOM_MAGIC)) != BLOOM_MAGIC:
+                raise ValueError(f"{path} is not a Bloom filter file")
+            num_bits, num_hashes, count = BLOOM_HEADER.unpack(f.read(BLOOM_HEADER.size))
+            bloom = cls(num_bits=num_bits, num_hashes=num_hashes)
+            bloom.bits = bytearray(f.read())
+            bloom.count = count
+        if len(bloom.bits) != (num_bits + 7) // 8:
+            raise ValueError(f"{path} is truncated")
+        return bloom
+
+
+class Deduplicator:
+    """Cross-export duplicate detection: Bloom filter in front of an exact key store
+
+    With state_dir the filter and the exact keys (a dbm file) persist across runs, so
+    overlapping exports ingested days apart are still recognised. Without it both live
+    in memory for the lifetime of the object.
+    """
+
+    def __init__(self, state_dir=None, capacity=1000000, error_rate=0.01):
+        self.state_dir = state_dir
+        self.stats = {'checked': 0, 'bloom_negative': 0, 'exact_lookups': 0, 'duplicates': 0}
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+            self._bloom_path = os.path.join(state_dir, 'dedup.bloom')
+            self.bloom = (BloomFilter.load(self._bloom_path) if os.path.exists(self._bloom_path)
+                          else BloomFilter(capacity, error_rate))
+            self.keys = dbm.open(os.path.join(state_dir, 'dedup_keys'), 'c')
+        else:
+            self._bloom_path = None
+            self.bloom = BloomFilter(capacity, error_rate)
+            self.keys = {}
+
+    def check_and_add(self, txn_data):
+        """Return the transaction_id already stored under this record's key, or record it and return None"""
+        key = dedup_key(txn_data)
+        self.stats['checked'] += 1
+        if key in self.bloom:
+            # Possible duplicate: only now pay for the exact lookup
+            self.stats['exact_lookups'] += 1
+            existing = self.keys.get(key)
+            if existing is not None:
+                self.stats['duplicates'] += 1
+                return existing.decode('utf-8') if isinstance(existing, bytes) else existing
+        else:
+            self.stats['bloom_negative'] += 1
+        self.bloom.add(key)
+        self.keys[key] = txn_data.get('transaction_id') or key
+        return None
+
+    def save(self):
+        """Persist the Bloom filter and flush the key store (no-op in memory mode)"""
+        if self._bloom_path:
+            self.bloom.save(self._bloom_path)
+            if hasattr(self.keys, 'sync'):
+                self.keys.sync()
+
+    def close(self):
+        """Save state and close the key store"""
+        self.save()
+        if self._bloom_path:
+            self.keys.close()
@@ -0,0 +1,39 @@
+def lttb(xs, ys, threshold):
+    """Largest-Triangle-Three-Buckets downsampling; returns the indices of the points to keep
+
+    xs must be ascending. The first and last points are always kept, and from each
+    of the threshold - 2 buckets in between the point forming the largest triangle
+    with the previously kept point and the next bucket's average is chosen, so
+    peaks and troughs survive. Returns every index when threshold >= len(xs).
+    """
+    n = len(xs)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1][:max(threshold, 0)]
+
+    every = (n - 2) / (threshold - 2)
+    kept = [0]
+    a = 0
+    for bucket in range(threshold - 2):
+        # Average of the next bucket (the third triangle vertex)
+        avg_start = int((bucket + 1) * every) + 1
+        avg_end = min(int((bucket + 2) * every) + 1, n)
+        count = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / count
+        avg_y = sum(ys[avg_start:avg_end]) / count
+
+        ax = xs[a]
+        ay = ys[a]
+        best_area = -1.0
+        best = range_start = int(bucket * every) + 1
+        for j in range(range_start, int((bucket + 1) * every) + 1):
+            # Twice the triangle area; the factor does not change the argmax
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
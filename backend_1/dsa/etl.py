@@ -0,0 +1,92 @@
+import csv
+import json
+import sqlite3
+from datetime import datetime
+from itertools import islice
+
+from dsa.money import money_fields_to_major
+
+# Column order for CSV and SQLite output (the fields SMSXMLParser produces)
+TRANSACTION_FIELDS = (
+    'transaction_id', 'transaction_date', 'readable_date', 'transaction_type', 'amount', 'fee',
+    'balance_after', 'sender_name', 'receiver_name', 'status', 'remarks', 'external_transaction_id', 'raw_sms'
+)
+
+# Money columns are INTEGER minor units (1/100 RWF) so SUM() stays exact
+SQLITE_SCHEMA = '''CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    transaction_date TEXT,
+    readable_date TEXT,
+    transaction_type TEXT,
+    amount INTEGER,
+    fee INTEGER,
+    balance_after INTEGER,
+    sender_name TEXT,
+    receiver_name TEXT,
+    status TEXT,
+    remarks TEXT,
+    external_transaction_id TEXT,
+    raw_sms TEXT
+)'''
+
+
+def parse_time(value):
+    """Epoch milliseconds for a CLI time argument: epoch ms digits or an ISO date/datetime (local time)"""
+    if value.isdigit():
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+    except ValueError:
+        raise ValueError(f"Invalid time '{value}': use epoch milliseconds or YYYY-MM-DD[THH:MM[:SS]]")
+
+
+def write_ndjson(transactions, out):
+    """Write one JSON object per line (money in RWF, as in the API); returns the number written"""
+    count = 0
+    for transaction in transactions:
+        out.write(json.dumps(money_fields_to_major(transaction), ensure_ascii=False))
+        out.write('\n')
+        count += 1
+    return count
+
+
+def write_csv(transactions, out):
+    """Write a header row and one row per transaction (money in RWF); returns the number written"""
+    writer = csv.DictWriter(out, TRANSACTION_FIELDS, extrasaction='ignore', lineterminator='\n')
+    writer.writeheader()
+    count = 0
+    for transaction in transactions:
+        writer.writerow(money_fields_to_major(transaction))
+        count += 1
+    return count
+
+
+def write_sqlite(transactions, path, batch_size=1000):
+    """Insert transactions (money in minor units) into the transactions table of an SQLite file
+
+    Returns the number written.
+    """
+    columns = ', '.join(TRANSACTION_FIELDS)
+    placeholders = ', '.join('?' for _ in TRANSACTION_FIELDS)
+    insert = f'INSERT OR REPLACE INTO transactions ({columns}) VALUES ({placeholders})'
+    rows = (tuple(transaction.get(field) for field in TRANSACTION_FIELDS) for transaction in transactions)
+
+    connection = sqlite3.connect(path)
+    count = 0
+    try:
+        with connection:
+            connection.execute(SQLITE_SCHEMA)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                connection.executemany(insert, batch)
+                count += len(batch)
+    finally:
+        connection.close()
+    return count
+
+
+# Formats that write to a text stream; sqlite needs a file path
+STREAM_WRITERS = {'ndjson': write_ndjson, 'csv': write_csv}
+FORMATS = ('ndjson', 'csv', 'sqlite')
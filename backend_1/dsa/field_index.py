@@ -0,0 +1,52 @@
+import threading
+
+
+class EqualityIndex:
+    """Value -> IDs of the transactions holding it, for one field, kept up to date on every write
+
+    Backs exact-match and IN lookups in POST /transactions/query. Lookups
+    return copies, so callers can intersect and union them freely.
+    """
+
+    def __init__(self, field):
+        self.field = field
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def add(self, transaction):
+        """Account for a stored transaction"""
+        value = getattr(transaction, self.field)
+        with self._lock:
+            ids = self._ids.get(value)
+            if ids is None:
+                ids = self._ids[value] = set()
+            ids.add(transaction.transaction_id)
+
+    def remove(self, transaction):
+        """Undo add() for a transaction that is being updated or deleted"""
+        value = getattr(transaction, self.field)
+        with self._lock:
+            ids = self._ids.get(value)
+            if ids is not None:
+                ids.discard(transaction.transaction_id)
+                if not ids:
+                    del self._ids[value]
+
+    def count(self, value):
+        """Number of transactions whose field equals value"""
+        try:
+            return len(self._ids.get(value, ()))
+        except TypeError:
+            return 0  # Unhashable value: nothing can match
+
+    def lookup(self, value):
+        """IDs of the transactions whose field equals value (a new set)"""
+        with self._lock:
+            try:
+                return set(self._ids.get(value, ()))
+            except TypeError:
+                return set()
+
+    def __len__(self):
+        """Number of distinct values"""
+        return len(self._ids)
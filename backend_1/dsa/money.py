@@ -0,0 +1,68 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Money is held as integer minor units (1/100 RWF) everywhere except JSON and text output
+MINOR_PER_UNIT = 100
+MONEY_FIELDS = ('amount', 'fee', 'balance_after')
+# Largest magnitude accepted, in minor units: exact as a float (for JSON) and well inside int64 (for indexes)
+MAX_MINOR = 2 ** 53
+
+
+def parse_amount(text):
+    """Minor units for an amount as written in an SMS body, e.g. "1,000" -> 100000"""
+    text = text.replace(',', '')
+    try:
+        return _checked(int(text) * MINOR_PER_UNIT, text)
+    except ValueError:
+        return to_minor(text)
+
+
+def to_minor(value):
+    """Minor units for an RWF amount given as a JSON number or numeric string
+
+    Sub-minor fractions are rounded half up. Raises ValueError for anything
+    that is not a finite number or is beyond MAX_MINOR minor units.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid amount: {value!r}")
+    if isinstance(value, int):
+        return _checked(value * MINOR_PER_UNIT, value)
+    try:
+        amount = Decimal(str(value).replace(',', ''))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    return _checked(int((amount * MINOR_PER_UNIT).to_integral_value(ROUND_HALF_UP)), value)
+
+
+def _checked(minor, value):
+    if abs(minor) > MAX_MINOR:
+        raise ValueError(f"Amount out of range: {value!r}")
+    return minor
+
+
+def to_major(minor):
+    """RWF amount (float, for JSON) for a value in minor units"""
+    if minor is None:
+        return None
+    return minor / MINOR_PER_UNIT
+
+
+def money_fields_to_minor(data):
+    """Copy of data with the money fields converted from RWF to minor units"""
+    converted = dict(data)
+    for field in MONEY_FIELDS:
+        if field in converted:
+            converted[field] = to_minor(converted[field])
+    return converted
+
+
+def money_fields_to_major(data):
+    """Copy of data with the money fields converted from minor units to RWF"""
+    converted = dict(data)
+    for field in MONEY_FIELDS:
+        if field in converted:
+            converted[field] = to_major(converted[field])
+    return converted
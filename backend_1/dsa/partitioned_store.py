@@ -0,0 +1,110 @@
+import threading
+from collections.abc import MutableMapping
+from itertools import chain, count
+from operator import itemgetter
+
+_first = itemgetter(0)
+
+
+class Partition:
+    """One hash partition: its own mapping, write lock and insertion sequence numbers"""
+
+    def __init__(self, index, data):
+        self.index = index
+        self.data = data
+        # key -> global insertion sequence, in the same order as data
+        self.sequence = {}
+        self.lock = threading.RLock()
+
+
+class PartitionedStore(MutableMapping):
+    """Dict-like store split into hash partitions by key
+
+    Writers lock only the partition that owns the key (partition_for(key).lock),
+    so writes to different partitions do not contend; single-key reads go
+    straight to one partition. Scans fan out to every partition and merge the
+    results back into global insertion order, so iteration, keys(), values()
+    and items() match a plain dict. factory(index) builds each partition's
+    mapping (a dict, or anything dict-like such as a TieredStore).
+    """
+
+    def __init__(self, partitions=8, factory=None):
+        if partitions < 1:
+            raise ValueError("partitions must be at least 1")
+        factory = factory or (lambda index: {})
+        self.partitions = [Partition(index, factory(index)) for index in range(partitions)]
+        self._sequence = count(1)
+
+    def partition_for(self, key):
+        """The partition that owns key"""
+        partitions = self.partitions
+        return partitions[hash(key) % len(partitions)]
+
+    def __len__(self):
+        return sum(len(partition.data) for partition in self.partitions)
+
+    def __contains__(self, key):
+        return key in self.partition_for(key).data
+
+    def __getitem__(self, key):
+        return self.partition_for(key).data[key]
+
+    def get(self, key, default=None):
+        return self.partition_for(key).data.get(key, default)
+
+    def __setitem__(self, key, value):
+        partition = self.partition_for(key)
+        with partition.lock:
+            if key not in partition.sequence:
+                partition.sequence[key] = next(self._sequence)
+            partition.data[key] = value
+
+    def __delitem__(self, key):
+        partition = self.partition_for(key)
+        with partition.lock:
+            del partition.data[key]
+            del partition.sequence[key]
+
+    def pop(self, key, *default):
+        partition = self.partition_for(key)
+        with partition.lock:
+            partition.sequence.pop(key, None)
+            return partition.data.pop(key, *default)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def values(self):
+        if len(self.partitions) == 1:
+            return list(self.partitions[0].data.values())
+        return [value for _, value in self._merged(lambda partition: partition.data.values())]
+
+    def items(self):
+        if len(self.partitions) == 1:
+            return list(self.partitions[0].data.items())
+        return [item for _, item in self._merged(lambda partition: partition.data.items())]
+
+    def in_order(self, keys):
+        """The stored keys among keys, in insertion order"""
+        positions = []
+        for key in keys:
+            position = self.partition_for(key).sequence.get(key)
+            if position is not None:
+                positions.append((position, key))
+        positions.sort()
+        return [key for _, key in positions]
+
+    def _merged(self, select):
+        """(sequence, element) pairs from every partition in global insertion order
+
+        Each partition is already in insertion order, so the sort only merges
+        sorted runs.
+        """
+        runs = []
+        for partition in self.partitions:
+            with partition.lock:
+                runs.append(zip(list(partition.sequence.values()), list(select(partition))))
+        return sorted(chain.from_iterable(runs), key=_first)
@@ -0,0 +1,141 @@
+import time
+import tracemalloc
+
+
+# Ingest stages in pipeline order (used to order the report)
+INGEST_STAGES = ('read_decode', 'sms_regex', 'timestamp', 'id_hash', 'body_match', 'from_record')
+
+
+class _StageTimer:
+    """Context manager that charges a block's wall time (and allocations) to a stage"""
+    __slots__ = ('stats', 'track_allocations', 'start', 'start_mem')
+
+    def __init__(self, stats, track_allocations):
+        self.stats = stats
+        self.track_allocations = track_allocations
+        self.start = 0
+        self.start_mem = 0
+
+    def __enter__(self):
+        if self.track_allocations:
+            self.start_mem = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter_ns() - self.start
+        stats = self.stats
+        stats[0] += 1
+        stats[1] += elapsed
+        if self.track_allocations:
+            stats[2] += tracemalloc.get_traced_memory()[0] - self.start_mem
+        return False
+
+
+class _NullStage:
+    """No-op stage used when profiling is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullProfiler:
+    """Profiler stand-in that records nothing"""
+    enabled = False
+
+    def stage(self, name):
+        return _NULL_STAGE
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class StageProfiler:
+    """Per-stage wall time and net allocation counters for the ingest pipeline"""
+    enabled = True
+
+    def __init__(self, track_allocations=False):
+        self.track_allocations = track_allocations
+        # stage name -> [calls, nanoseconds, net allocated bytes]
+        self.stats = {}
+
+    def stage(self, name):
+        """Time a block as the named stage (allocations need tracemalloc to be tracing)"""
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = [0, 0, 0]
+        return _StageTimer(stats, self.track_allocations and tracemalloc.is_tracing())
+
+    def to_dict(self):
+        """Stage stats keyed by stage name"""
+        return {
+            name: {'calls': calls, 'seconds': elapsed / 1e9, 'net_alloc_bytes': alloc}
+            for name, (calls, elapsed, alloc) in self._ordered()
+        }
+
+    def report(self, wall_seconds=None):
+        """Render the stage breakdown as a text table"""
+        rows = self._ordered()
+        total = wall_seconds or sum(elapsed for _, (_, elapsed, _) in rows) / 1e9
+        lines = [f"{'Stage':<12} {'Calls':>10} {'Total ms':>11} {'% wall':>7} {'Mean us':>9} {'Net alloc KiB':>14}"]
+        for name, (calls, elapsed, alloc) in rows:
+            seconds = elapsed / 1e9
+            share = 100.0 * seconds / total if total else 0.0
+            mean_us = elapsed / calls / 1e3 if calls else 0.0
+            alloc_text = f"{alloc / 1024:>14.1f}" if self.track_allocations else f"{'-':>14}"
+            lines.append(f"{name:<12} {calls:>10} {seconds * 1e3:>11.2f} {share:>6.1f}% {mean_us:>9.2f} {alloc_text}")
+        if wall_seconds:
+            lines.append(f"{'wall':<12} {'':>10} {wall_seconds * 1e3:>11.2f}")
+        return '\n'.join(lines)
+
+    def _ordered(self):
+        """Stats in pipeline order, unknown stages last"""
+        order = {name: i for i, name in enumerate(INGEST_STAGES)}
+        return sorted(self.stats.items(), key=lambda item: order.get(item[0], len(order)))
+
+
+def profile_ingest(xml_file_path, pstats_path=None, tracemalloc_top=0):
+    """Profile parsing xml_file_path into a TransactionStorage and print the report"""
+    import cProfile
+    from api.controllers.storage_controller import TransactionStorage
+
+    profiler = StageProfiler(track_allocations=tracemalloc_top > 0)
+    if tracemalloc_top:
+        tracemalloc.start()
+    cprofile = cProfile.Profile() if pstats_path else None
+
+    start = time.perf_counter()
+    if cprofile:
+        cprofile.enable()
+    storage = TransactionStorage(xml_file_path, profiler=profiler)
+    if cprofile:
+        cprofile.disable()
+    wall_seconds = time.perf_counter() - start
+
+    print(f"\nIngest profile for {xml_file_path}")
+    print(f"Transactions stored: {len(storage.transactions)}")
+    if cprofile:
+        print("(cProfile was active, so stage timings include its overhead)")
+    print(profiler.report(wall_seconds))
+
+    if cprofile:
+        cprofile.dump_stats(pstats_path)
+        print(f"\ncProfile stats written to {pstats_path} (inspect with: python -m pstats {pstats_path})")
+
+    if tracemalloc_top:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"\nTraced memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB")
+        print(f"Top {tracemalloc_top} allocation sites:")
+        for stat in snapshot.statistics('lineno')[:tracemalloc_top]:
+            print(f"  {stat}")
+
+    return profiler
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class QuarantineStore:
+    """Messages no template matched, kept with their raw body and timestamp for targeted re-parsing
+
+    With a path, entries are appended to a JSON-lines file as they arrive and the
+    file is rewritten when entries are released, so quarantine survives restarts.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry['key']] = entry
+
+    @staticmethod
+    def entry_key(body, date_ms):
+        """Identity of a quarantined message (the same SMS in two exports is kept once)"""
+        return hashlib.md5(f"{date_ms}|{body}".encode('utf-8')).hexdigest()
+
+    def add(self, body, date_ms, readable_date, reason='unmatched', source=None):
+        """Quarantine one message; returns its key"""
+        key = self.entry_key(body, date_ms)
+        with self._lock:
+            if key in self.entries:
+                return key
+            entry = {
+                'key': key,
+                'date': date_ms,
+                'readable_date': readable_date,
+                'body': body,
+                'reason': reason,
+                'source': source,
+                'quarantined_at': datetime.now().isoformat()
+            }
+            self.entries[key] = entry
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return key
+
+    def add_entries(self, entries):
+        """Merge entries produced by another store (e.g. in a worker process)"""
+        for entry in entries:
+            self.add(entry['body'], entry['date'], entry['readable_date'],
+                     reason=entry.get('reason', 'unmatched'), source=entry.get('source'))
+
+    def remove(self, keys):
+        """Release entries (after a template picked them up)"""
+        with self._lock:
+            removed = [self.entries.pop(key) for key in keys if key in self.entries]
+            if removed and self.path:
+                temp_path = self.path + '.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    for entry in self.entries.values():
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                os.replace(temp_path, self.path)
+        return removed
+
+    def values(self):
+        """Snapshot of the quarantined entries"""
+        with self._lock:
+            return list(self.entries.values())
+
+    def __len__(self):
+        return len(self.entries)
+
@@ -0,0 +1,233 @@
+import hashlib
+import math
+import threading
+from functools import lru_cache
+
+
+class QuantileSketch:
+    """Relative-error quantile sketch over positive values (DDSketch-style log buckets)
+
+    Every value lands in bucket ceil(log_gamma(value)), so any quantile is returned
+    within relative_accuracy of the true value. Bucket counts can be decremented,
+    which makes removal exact, and two sketches with the same accuracy merge by
+    adding counts. Size grows with the log of the value range, not with the number
+    of values.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def add(self, value, count=1):
+        """Add a value (values <= 0 are counted in a single zero bucket)"""
+        if value > 0:
+            key = self._key(value)
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        else:
+            self.zero_count += count
+        self.count += count
+
+    def remove(self, value):
+        """Remove one previously added value"""
+        if value > 0:
+            key = self._key(value)
+            remaining = self.buckets.get(key, 0) - 1
+            if remaining < 0:
+                return
+            if remaining:
+                self.buckets[key] = remaining
+            else:
+                del self.buckets[key]
+        elif self.zero_count:
+            self.zero_count -= 1
+        else:
+            return
+        self.count -= 1
+
+    def merge(self, other):
+        """Add another sketch's values to this one"""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        """Estimated q-quantile (0 <= q <= 1), or None if the sketch is empty"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(key-1), gamma^key] in relative terms
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+@lru_cache(maxsize=65536)
+def _count_min_positions(key, width, depth):
+    """Column per row for key: double hashing over one blake2b digest (stable across processes)"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+    return tuple((h1 + i * h2) % width for i in range(depth))
+
+
+class HeavyHitters:
+    """Top-K keys by total weight: a Count-Min sketch plus a small candidate set
+
+    Weights may be negative (removals), so the Count-Min estimate stays an upper
+    bound on each key's weight. Candidates are the keys with the largest estimates
+    seen so far, capped at `capacity`. A key whose weight only grows after it was
+    evicted re-enters on its next update. Two instances with the same dimensions
+    merge by adding their counters.
+    """
+
+    def __init__(self, capacity=64, width=2048, depth=4):
+        self.capacity = capacity
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for _ in range(depth)]
+        self.candidates = {}
+        # Lower bound on the smallest candidate estimate, so most updates skip the min() scan
+        self._floor = 0
+
+    def _positions(self, key):
+        return _count_min_positions(key, self.width, self.depth)
+
+    def estimate(self, key):
+        """Upper-bound estimate of key's total weight"""
+        return min(row[position] for row, position in zip(self.rows, self._positions(key)))
+
+    def update(self, key, weight):
+        """Add weight (negative to remove) to key"""
+        positions = self._positions(key)
+        for row, position in zip(self.rows, positions):
+            row[position] += weight
+        estimate = min(row[position] for row, position in zip(self.rows, positions))
+        self._offer(key, estimate)
+
+    def _offer(self, key, estimate):
+        candidates = self.candidates
+        if key in candidates or len(candidates) < self.capacity:
+            if estimate > 0:
+                candidates[key] = estimate
+                self._floor = min(self._floor, estimate) if len(candidates) > 1 else estimate
+            else:
+                candidates.pop(key, None)
+            return
+        if estimate <= self._floor:
+            return
+        smallest = min(candidates, key=candidates.get)
+        if estimate > candidates[smallest]:
+            del candidates[smallest]
+            candidates[key] = estimate
+        self._floor = min(candidates.values())
+
+    def merge(self, other):
+        """Add another instance's counts to this one"""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge Count-Min sketches with different dimensions")
+        for row, other_row in zip(self.rows, other.rows):
+            for i, value in enumerate(other_row):
+                row[i] += value
+        keys = set(self.candidates) | set(other.candidates)
+        self.candidates = {}
+        self._floor = 0
+        for key in sorted(keys, key=self.estimate, reverse=True):
+            self._offer(key, self.estimate(key))
+
+    def top(self, k):
+        """The k keys with the largest estimated weight, as (key, weight) pairs"""
+        return sorted(self.candidates.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class TransactionAnalytics:
+    """Amount quantiles per transaction_type and top receivers by volume, kept up to date incrementally
+
+    Query cost is bounded by the sketch sizes, not by the number of transactions.
+    Money is in minor units.
+    """
+
+    QUANTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+
+    def __init__(self, relative_accuracy=0.01, top_capacity=64):
+        self.relative_accuracy = relative_accuracy
+        self.amounts = {}
+        self.receivers = HeavyHitters(capacity=top_capacity)
+        self._lock = threading.Lock()
+
+    def add(self, transaction):
+        """Account for a stored transaction
+
+        The steps that can fail on a bad key (the dict lookup, hashing the
+        receiver) come before any update, so an exception leaves nothing half added.
+        """
+        amount = transaction.amount
+        if amount is None:
+            return
+        with self._lock:
+            sketch = self.amounts.get(transaction.transaction_type)
+            if transaction.receiver_name:
+                self.receivers.update(transaction.receiver_name, amount)
+            if sketch is None:
+                sketch = self.amounts[transaction.transaction_type] = QuantileSketch(self.relative_accuracy)
+            sketch.add(amount)
+
+    def remove(self, transaction):
+        """Undo add() for a transaction that is being updated or deleted"""
+        amount = transaction.amount
+        if amount is None:
+            return
+        with self._lock:
+            sketch = self.amounts.get(transaction.transaction_type)
+            if sketch is not None:
+                sketch.remove(amount)
+                if not sketch.count:
+                    del self.amounts[transaction.transaction_type]
+            if transaction.receiver_name:
+                self.receivers.update(transaction.receiver_name, -amount)
+
+    @classmethod
+    def merge_all(cls, parts):
+        """One TransactionAnalytics summarizing several (e.g. one per storage partition)"""
+        if len(parts) == 1:
+            return parts[0]
+        merged = cls(parts[0].relative_accuracy, parts[0].receivers.capacity)
+        for part in parts:
+            with part._lock:
+                for transaction_type, sketch in part.amounts.items():
+                    target = merged.amounts.get(transaction_type)
+                    if target is None:
+                        target = merged.amounts[transaction_type] = QuantileSketch(merged.relative_accuracy)
+                    target.merge(sketch)
+                merged.receivers.merge(part.receivers)
+        return merged
+
+    def amount_quantiles(self):
+        """{transaction_type: {'count': n, 'p50': ..., 'p95': ..., 'p99': ...}}"""
+        with self._lock:
+            summary = {}
+            for transaction_type, sketch in self.amounts.items():
+                stats = {'count': sketch.count}
+                for name, q in self.QUANTILES:
+                    stats[name] = sketch.quantile(q)
+                summary[transaction_type] = stats
+            return summary
+
+    def top_receivers(self, k=10):
+        """Up to k (receiver_name, estimated volume) pairs, largest first"""
+        with self._lock:
+            return self.receivers.top(k)
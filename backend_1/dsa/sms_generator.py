@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Deterministic generator for synthetic SMS XML exports
+
+Writes exports in the same shape as dsa/modified_sms_v2.xml with N messages
+spread across all seven templates SMSXMLParser recognizes, plus a configurable
+share of non-matching noise. The same seed always produces the same file.
+"""
+
+import random
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+TEMPLATE_WEIGHTS = (
+    ('Money Received', 12),
+    ('Payment', 35),
+    ('Bank Deposit', 8),
+    ('Transfer', 25),
+    ('Airtime Purchase', 8),
+    ('Cash Withdrawal', 5),
+    ('Merchant Payment', 7),
+)
+
+FIRST_NAMES = ('Jane', 'Samuel', 'Linda', 'Alex', 'Robert', 'Emily', 'Abebe', 'Sophia', 'Grace', 'Eric')
+LAST_NAMES = ('Smith', 'Carter', 'Green', 'Doe', 'Brown', 'Johnson', 'Chala', 'Mugisha', 'Uwase', 'Kamanzi')
+# The merchant template captures the merchant with [^on]+, so names avoid lowercase 'o' and 'n'
+MERCHANTS = ('DIRECT PAYMENT LTD', 'DATA BUNDLE MTN', 'CITY CAFE', 'SUPER MARKET LTD', 'FUEL STATION')
+AGENTS = ('Sophia', 'Eric', 'Grace', 'Patrick', 'Alice')
+NOISE_BODIES = (
+    "&lt;#&gt; Dear Customer, your MTN MoMo account verification code is {code}. Do not share it.",
+    "Yello!Umaze kugura {amount}FRW(800MB) igura {amount}Frw. Ukoresheje MoMo.",
+    "*143*R*Y'ello, the transaction with amount {amount} RWF for MTN Cash Power with token {code} was completed.",
+    "You have received {amount} RWF from {name} (*********013) on your mobile money account at {when}. "
+    "Message from sender: . Your new balance:{balance} RWF. Financial Transaction Id: {txn_id}.",
+    "Kugura ama inite cg interineti kuri MoMo, Kanda *182*2*1# .*EN#",
+)
+
+HEADER = "<?xml version='1.0' encoding='utf-8'?>\n"
+SMS_TEMPLATE = ('  <sms protocol="0" address="M-Money" date="{date}" type="1" subject="null" body="{body}" '
+                'toa="null" sc_toa="null" service_center="+250788110381" read="1" status="-1" locked="0" '
+                'date_sent="{date_sent}" sub_id="6" readable_date="{readable}" contact_name="(Unknown)" />\n')
+
+
+def _money(rng, value):
+    """Format an RWF amount, sometimes with thousands separators like the real exports"""
+    return f"{value:,}" if value >= 1000 and rng.random() < 0.5 else str(value)
+
+
+class SMSExportGenerator:
+    """Generates realistic, deterministic SMS export bodies"""
+
+    def __init__(self, seed=42, noise_ratio=0.1, start=datetime(2024, 5, 10, 16, 30, 51)):
+        self.rng = random.Random(seed)
+        self.noise_ratio = noise_ratio
+        self.now = start
+        self.balance = 50000
+        self.next_txn_id = 76662021700
+        self._types = [name for name, _ in TEMPLATE_WEIGHTS]
+        self._weights = [weight for _, weight in TEMPLATE_WEIGHTS]
+
+    def _name(self):
+        return f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+
+    def _txn_id(self):
+        self.next_txn_id += self.rng.randint(1, 5000)
+        return self.next_txn_id
+
+    def _amount(self, low, high, step=100):
+        return self.rng.randrange(low, high, step)
+
+    def _debit(self, amount, fee):
+        """Take amount and fee from the running balance, topping up first if it would go negative"""
+        if amount + fee > self.balance:
+            self.balance += amount + fee
+        self.balance -= amount + fee
+
+    def message(self):
+        """Return (epoch_ms, body, template name or None for noise) for the next message"""
+        rng = self.rng
+        self.now += timedelta(seconds=rng.randint(30, 7200))
+        when = self.now.strftime('%Y-%m-%d %H:%M:%S')
+        epoch_ms = int(self.now.timestamp() * 1000) + rng.randint(0, 999)
+
+        if rng.random() < self.noise_ratio:
+            body = rng.choice(NOISE_BODIES).format(
+                code=rng.randint(100000, 999999), amount=self._amount(100, 5000),
+                name=self._name(), when=when, balance=self.balance, txn_id=self._txn_id())
+            return epoch_ms, body, None
+
+        kind = rng.choices(self._types, self._weights)[0]
+        if kind == 'Money Received':
+            amount = self._amount(500, 100000)
+            self.balance += amount
+            body = (f"You have received {_money(rng, amount)} RWF from {self._name()} (*********{rng.randint(100, 999)}) "
+                    f"on your mobile money account at {when}. Message from sender: {rng.choice(('Thanks', 'Rent', 'Lunch'))}. "
+                    f"Your new balance:{_money(rng, self.balance)} RWF. Financial Transaction Id: {self._txn_id()}.")
+        elif kind == 'Payment':
+            amount, fee = self._amount(100, 50000), 0
+            self._debit(amount, fee)
+            body = (f"TxId: {self._txn_id()}. Your payment of {_money(rng, amount)} RWF to {self._name()} {rng.randint(10000, 99999)} "
+                    f"has been completed at {when}. Your new balance: {_money(rng, self.balance)} RWF. Fee was {fee} RWF."
+                    f"Kanda*182*16# wiyandikishe muri poromosiyo ya BivaMoMotima.")
+        elif kind == 'Bank Deposit':
+            amount = self._amount(5000, 500000, 1000)
+            self.balance += amount
+            body = (f"*113*R*A bank deposit of {_money(rng, amount)} RWF has been added to your mobile money account at {when}. "
+                    f"Your NEW BALANCE :{_money(rng, self.balance)} RWF. Cash Deposit::CASH::::0::250795963036."
+                    f"Thank you for using MTN MobileMoney.*EN#")
+        elif kind == 'Transfer':
+            amount = self._amount(1000, 100000)
+            fee = 100 if amount < 10000 else 250
+            self._debit(amount, fee)
+            body = (f"*165*S*{_money(rng, amount)} RWF transferred to {self._name()} (2507{rng.randint(10000000, 99999999)}) "
+                    f"from 36521838 at {when} . Fee was: {fee} RWF. New balance: {_money(rng, self.balance)} RWF. "
+                    f"Kugura ama inite cg interineti kuri MoMo, Kanda *182*2*1# .*EN#")
+        elif kind == 'Airtime Purchase':
+            amount, fee = self._amount(100, 5000), 0
+            self._debit(amount, fee)
+            body = (f"*162*TxId:{self._txn_id()}*S*Your payment of {_money(rng, amount)} RWF to Airtime with token  "
+                    f"has been completed at {when}. Fee was {fee} RWF. Your new balance: {_money(rng, self.balance)} RWF . "
+                    f"Message: - -. *EN#")
+        elif kind == 'Cash Withdrawal':
+            amount = self._amount(5000, 100000, 1000)
+            fee = 350 if amount < 20000 else 700
+            self._debit(amount, fee)
+            body = (f"You {self._name()} (*********036) have via agent: Agent {rng.choice(AGENTS)} (2507{rng.randint(10000000, 99999999)}), "
+                    f"withdrawn {_money(rng, amount)} RWF from your mobile money account: 36521838 at {when} and you can now "
+                    f"collect your money in cash. Your new balance: {_money(rng, self.balance)} RWF. Fee paid: {fee} RWF. "
+                    f"Message from agent: 1. Financial Transaction Id: {self._txn_id()}.")
+        else:
+            amount, fee = self._amount(500, 50000), 0
+            self._debit(amount, fee)
+            body = (f"*164*S*Y'ello,A transaction of {_money(rng, amount)} RWF by {rng.choice(MERCHANTS)} on your MOMO account "
+                    f"was successfully completed at {when}. Message from debit receiver: {rng.choice(('Ref', 'Order', 'Bill'))}. "
+                    f"Your new balance:{_money(rng, self.balance)} RWF. Fee was {fee} RWF. Financial Transaction Id: {self._txn_id()}. "
+                    f"External Transaction Id: {rng.randint(10000000, 99999999)}.*EN#")
+        return epoch_ms, body, kind
+
+    def write(self, path, count, chunk_size=10000):
+        """Write an export with count messages to path (streamed, constant memory)"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(HEADER)
+            f.write(f'<smses count="{count}" backup_set="synthetic" backup_date="{int(self.now.timestamp() * 1000)}" type="full">\n')
+            chunk = []
+            for _ in range(count):
+                epoch_ms, body, _ = self.message()
+                # Bodies in real exports escape markup, and SMSXMLParser un-escapes &lt;/&gt;
+                body = body.replace('&lt;', '<').replace('&gt;', '>')
+                sent = datetime.fromtimestamp(epoch_ms / 1000)
+                readable = f"{sent.day} {sent:%b %Y} {int(sent.strftime('%I'))}:{sent:%M:%S %p}"
+                chunk.append(SMS_TEMPLATE.format(date=epoch_ms, body=escape(body, {'"': '&quot;'}),
+                                                 date_sent=epoch_ms // 1000 * 1000, readable=readable))
+                if len(chunk) >= chunk_size:
+                    f.write(''.join(chunk))
+                    chunk = []
+            f.write(''.join(chunk))
+            f.write('</smses>\n')
+        return path
+
+
+def generate_export(path, count, seed=42, noise_ratio=0.1):
+    """Write a deterministic synthetic export with count messages to path"""
+    return SMSExportGenerator(seed=seed, noise_ratio=noise_ratio).write(path, count)
+
+
+def main():
+    """Command-line entry point: python -m dsa.sms_generator OUTPUT.xml -n COUNT"""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='Generate a synthetic SMS XML export')
+    arg_parser.add_argument('output', help='Path of the XML file to write')
+    arg_parser.add_argument('-n', '--count', type=int, default=10000, help='Number of messages (default: 10000)')
+    arg_parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    arg_parser.add_argument('--noise', type=float, default=0.1,
+                            help='Share of messages that match no template (default: 0.1)')
+    args = arg_parser.parse_args()
+
+    generate_export(args.output, args.count, seed=args.seed, noise_ratio=args.noise)
+    print(f"Wrote {args.count} messages to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,49 @@
+import os
 import re
+import sys
+import hashlib
+import mmap
 from datetime import datetime
+from dsa.profiler import NULL_PROFILER
+from dsa.templates import template_registry
+
+DEFAULT_XML_PATH = "dsa/modified_sms_v2.xml"
+
+# Regex pattern to match SMS elements, as text and as bytes for scanning memory-mapped files
+SMS_PATTERN = re.compile(r'<sms[^>]*date="(\d+)"[^>]*body="([^"]*)"[^>]*readable_date="([^"]*)"[^>]*/>')
+SMS_PATTERN_BYTES = re.compile(SMS_PATTERN.pattern.encode('ascii'))
 
 
 class SMSXMLParser:
     """Parser for extracting SMS transactions from XML file"""
 
-    def __init__(self, xml_file_path="dsa/modified_sms_v2.xml"):
+    def __init__(self, xml_file_path=DEFAULT_XML_PATH, profiler=None, registry=None, quarantine=None):
         self.xml_file_path = xml_file_path
+        self.profiler = profiler or NULL_PROFILER
+        self.registry = registry or template_registry
+        # Optional QuarantineStore that receives messages no template matches
+        self.quarantine = quarantine
         self.transactions = []
+        # Ingest counters for the last parse run (exported via /metrics); matched is per template
+        self.stats = {'seen': 0, 'matched': {}, 'dropped': 0, 'filtered': 0}
+        self._template_counts = {}
 
     def parse_xml_file(self):
-        """Parse the XML file and extract all SMS transactions"""
+        """Parse the XML file and extract all SMS transactions
+
+        The file is memory-mapped and scanned with a bytes regex, so it is never
+        decoded as a whole; only the fields of matching <sms> elements are decoded.
+        """
         try:
-            with open(self.xml_file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-            print(f"Loaded XML file ({len(content)} characters)")
-            return self._extract_transactions_from_xml(content)
+            with open(self.xml_file_path, 'rb') as file:
+                with self.profiler.stage('read_decode'):
+                    mapped = self._map_file(file)
+                try:
+                    print(f"Loaded XML file ({len(mapped)} bytes)")
+                    return self._extract_transactions_from_xml(mapped)
+                finally:
+                    if isinstance(mapped, mmap.mmap):
+                        mapped.close()
         except FileNotFoundError:
             print(f"XML file not found. Using sample data.")
             return []
@@ -23,36 +51,144 @@ class SMSXMLParser:
             print(f"Error: {e}. Using sample data.")
             return []
 
+    def iter_file(self, since=None, until=None):
+        """Stream transactions from the XML file without building a list
+
+        since/until (datetimes or epoch milliseconds) keep messages with
+        since <= date < until; the window is checked on the date attribute before
+        the body is decoded or matched. Unlike parse_xml_file, errors propagate and
+        nothing is printed, so the output can feed a pipeline.
+        """
+        with open(self.xml_file_path, 'rb') as file:
+            with self.profiler.stage('read_decode'):
+                mapped = self._map_file(file)
+            try:
+                yield from self._iter_transactions(mapped, _epoch_ms(since), _epoch_ms(until))
+            finally:
+                if isinstance(mapped, mmap.mmap):
+                    mapped.close()
+
+    @staticmethod
+    def _map_file(file):
+        """Memory-map an open binary file (empty files cannot be mapped)"""
+        try:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return b''
+
+    def _iter_sms_elements(self, xml_content, since_ms=None, until_ms=None):
+        """Yield (date_str, body, readable_date) for every <sms> element
+
+        xml_content may be a str or a bytes-like object (bytes, mmap); for bytes
+        the captured fields are yielded undecoded, so the caller decodes each
+        message on its own. Elements dated outside [since_ms, until_ms) are
+        counted in stats['filtered'] and skipped.
+        """
+        pattern = SMS_PATTERN if isinstance(xml_content, str) else SMS_PATTERN_BYTES
+        matches = pattern.finditer(xml_content)
+        match = None
+        try:
+            while True:
+                with self.profiler.stage('sms_regex'):
+                    match = next(matches, None)
+                if match is None:
+                    return
+                date_str, body, readable_date = match.groups()
+                if since_ms is not None or until_ms is not None:
+                    date_ms = int(date_str)
+                    if (since_ms is not None and date_ms < since_ms) or (until_ms is not None and date_ms >= until_ms):
+                        self.stats['filtered'] += 1
+                        continue
+                yield date_str, body, readable_date
+        finally:
+            # The scanner holds a buffer export of an mmap; drop it even if a traceback keeps
+            # this frame alive, or the caller cannot close the map
+            del matches, match
+
     def _extract_transactions_from_xml(self, xml_content):
         """Extract transactions using regex patterns"""
-        transactions = []
+        transactions = list(self._iter_transactions(xml_content))
+        print(
+            f"Parsed {len(transactions)} transactions from {self.stats['seen']} SMS messages")
+        return transactions
 
-        # Regex pattern to match SMS elements
-        sms_pattern = r'<sms[^>]*date="(\d+)"[^>]*body="([^"]*)"[^>]*readable_date="([^"]*)"[^>]*/>'
+    def _iter_transactions(self, xml_content, since_ms=None, until_ms=None):
+        """Yield parsed transactions; self.stats is complete once the generator finishes"""
+        seen = 0
+        dropped = 0
+        self._template_counts = {}
+        self.stats = {'seen': 0, 'matched': self._template_counts, 'dropped': 0, 'filtered': 0}
 
-        # Find all SMS elements
-        sms_matches = re.findall(sms_pattern, xml_content)
+        try:
+            for date_str, body, readable_date in self._iter_sms_elements(xml_content, since_ms, until_ms):
+                seen += 1
+                try:
+                    if isinstance(body, bytes):
+                        with self.profiler.stage('read_decode'):
+                            body = body.decode('utf-8')
+                            readable_date = readable_date.decode('utf-8')
+                    parsed_transaction = self.parse_message(date_str, body, readable_date)
+                except (ValueError, TypeError) as e:
+                    # UnicodeDecodeError is a ValueError: a badly encoded message is dropped on its own
+                    dropped += 1
+                    self._quarantine(date_str, _text(body), _text(readable_date), f'error: {e}')
+                    continue
 
-        for date_str, body, readable_date in sms_matches:
-            try:
-                # Convert timestamp to datetime
-                timestamp = int(date_str) / 1000  # Convert from milliseconds
-                transaction_date = datetime.fromtimestamp(
-                    timestamp).isoformat()
+                if parsed_transaction:
+                    yield parsed_transaction
+                else:
+                    dropped += 1
+                    self._quarantine(date_str, body, readable_date, 'unmatched')
+        finally:
+            self.stats['seen'] = seen
+            self.stats['dropped'] = dropped
 
-                # Parse the SMS body to extract transaction details
-                parsed_transaction = self._parse_sms_body(
-                    body, transaction_date, readable_date)
+    def parse_message(self, date_str, body, readable_date):
+        """Parse one <sms> element's fields; returns the transaction dict or None if no template matches"""
+        # Convert timestamp to datetime
+        with self.profiler.stage('timestamp'):
+            timestamp = int(date_str) / 1000  # Convert from milliseconds
+            transaction_date = datetime.fromtimestamp(
+                timestamp).isoformat()
 
-                if parsed_transaction:
-                    transactions.append(parsed_transaction)
+        # Parse the SMS body to extract transaction details
+        return self._parse_sms_body(body, transaction_date, readable_date)
 
-            except (ValueError, TypeError) as e:
+    def reparse_quarantine(self, quarantine, release=True):
+        """Run the current templates over quarantined messages only
+
+        Returns (transactions, entries) for the messages that now parse;
+        stats['matched'] counts them per template. With release, those entries
+        are removed from quarantine right away; otherwise the caller removes them
+        (quarantine.remove) once the transactions are safely stored or written.
+        """
+        self._template_counts = {}
+        transactions = []
+        released = []
+        for entry in quarantine.values():
+            if entry['date'] is None:
                 continue
+            try:
+                parsed = self.parse_message(entry['date'], entry['body'], entry['readable_date'])
+            except (ValueError, TypeError):
+                continue
+            if parsed:
+                transactions.append(parsed)
+                released.append(entry)
+        if release:
+            quarantine.remove([entry['key'] for entry in released])
+        # Re-parsed messages were already counted as seen when first ingested
+        self.stats = {'seen': 0, 'matched': self._template_counts, 'dropped': 0, 'filtered': 0}
+        return transactions, released
 
-        print(
-            f"Parsed {len(transactions)} transactions from {len(sms_matches)} SMS messages")
-        return transactions
+    def _quarantine(self, date_str, body, readable_date, reason):
+        """Keep an unparsed message so a later template can pick it up without re-reading the export"""
+        if self.quarantine is not None:
+            try:
+                date_ms = int(date_str)
+            except (ValueError, TypeError):
+                date_ms = None
+            self.quarantine.add(body, date_ms, readable_date, reason=reason, source=self.xml_file_path)
 
     def _parse_sms_body(self, body, transaction_date, readable_date):
         """Parse SMS body to extract transaction information"""
@@ -60,8 +196,8 @@ class SMSXMLParser:
         body = body.replace('&lt;', '<').replace('&gt;', '>')
 
         # Generate deterministic ID based on SMS content
-        import hashlib
-        content_hash = hashlib.md5(body.encode('utf-8')).hexdigest()[:12]
+        with self.profiler.stage('id_hash'):
+            content_hash = hashlib.md5(body.encode('utf-8')).hexdigest()[:12]
         transaction_id = f"txn_{content_hash}"
 
         # Initialize transaction data
@@ -73,122 +209,174 @@ class SMSXMLParser:
             'status': 'Completed'
         }
 
-        # Pattern 1: Money received (You have received X RWF from Y)
-        received_pattern = r'You have received ([\d,]+) RWF from ([^(]+) \(([^)]+)\) on your mobile money account at ([^.]+)\. Message from sender: ([^.]+)\. Your new balance:([\d,]+) RWF\. Financial Transaction Id: (\d+)\.'
-        match = re.search(received_pattern, body)
-        if match:
-            amount, sender, phone, date_time, message, balance, txn_id = match.groups()
-            transaction_data.update({
-                'sender_name': sender.strip(),
-                'receiver_name': 'Account Holder',
-                'amount': float(amount.replace(',', '')),
-                'fee': 0.0,
-                'balance_after': float(balance.replace(',', '')),
-                'transaction_type': 'Money Received',
-                'remarks': f"Received from {sender.strip()}",
-                'external_transaction_id': txn_id
-            })
-            return transaction_data
-
-        # Pattern 2: Payment completed (TxId: X. Your payment of Y RWF to Z)
-        payment_pattern = r'TxId: (\d+)\. Your payment of ([\d,]+) RWF to ([^(]+) \d+ has been completed at ([^.]+)\. Your new balance: ([\d,]+) RWF\. Fee was ([\d,]+) RWF\.'
-        match = re.search(payment_pattern, body)
-        if match:
-            txn_id, amount, receiver, date_time, balance, fee = match.groups()
-            transaction_data.update({
-                'sender_name': 'Account Holder',
-                'receiver_name': receiver.strip(),
-                'amount': float(amount.replace(',', '')),
-                'fee': float(fee.replace(',', '')),
-                'balance_after': float(balance.replace(',', '')),
-                'transaction_type': 'Payment',
-                'remarks': f"Payment to {receiver.strip()}",
-                'external_transaction_id': txn_id
-            })
-            return transaction_data
-
-        # Pattern 3: Bank deposit (*113*R*A bank deposit of X RWF)
-        bank_deposit_pattern = r'\*113\*R\*A bank deposit of ([\d,]+) RWF has been added to your mobile money account at ([^.]+)\. Your NEW BALANCE :([\d,]+) RWF\.'
-        match = re.search(bank_deposit_pattern, body)
-        if match:
-            amount, date_time, balance = match.groups()
-            transaction_data.update({
-                'sender_name': 'Bank',
-                'receiver_name': 'Account Holder',
-                'amount': float(amount.replace(',', '')),
-                'fee': 0.0,
-                'balance_after': float(balance.replace(',', '')),
-                'transaction_type': 'Bank Deposit',
-                'remarks': 'Bank deposit via cash'
-            })
-            return transaction_data
-
-        # Pattern 4: Transfer (*165*S*X RWF transferred to Y)
-        transfer_pattern = r'\*165\*S\*([\d,]+) RWF transferred to ([^(]+) \(([^)]+)\) from \d+ at ([^.]+) \. Fee was: ([\d,]+) RWF\. New balance: ([\d,]+) RWF\.'
-        match = re.search(transfer_pattern, body)
-        if match:
-            amount, receiver, phone, date_time, fee, balance = match.groups()
-            transaction_data.update({
-                'sender_name': 'Account Holder',
-                'receiver_name': receiver.strip(),
-                'amount': float(amount.replace(',', '')),
-                'fee': float(fee.replace(',', '')),
-                'balance_after': float(balance.replace(',', '')),
-                'transaction_type': 'Transfer',
-                'remarks': f"Transfer to {receiver.strip()}"
-            })
-            return transaction_data
-
-        # Pattern 5: Airtime purchase (*162*TxId:X*S*Your payment of Y RWF to Airtime)
-        airtime_pattern = r'\*162\*TxId:(\d+)\*S\*Your payment of ([\d,]+) RWF to Airtime with token[^.]*has been completed at ([^.]+)\. Fee was ([\d,]+) RWF\. Your new balance: ([\d,]+) RWF'
-        match = re.search(airtime_pattern, body)
-        if match:
-            txn_id, amount, date_time, fee, balance = match.groups()
-            transaction_data.update({
-                'sender_name': 'Account Holder',
-                'receiver_name': 'Airtime Service',
-                'amount': float(amount.replace(',', '')),
-                'fee': float(fee.replace(',', '')),
-                'balance_after': float(balance.replace(',', '')),
-                'transaction_type': 'Airtime Purchase',
-                'remarks': 'Airtime top-up',
-                'external_transaction_id': txn_id
-            })
-            return transaction_data
-
-        # Pattern 6: Cash withdrawal (You X have via agent: Agent Y)
-        withdrawal_pattern = r'You ([^(]+) \(([^)]+)\) have via agent: Agent ([^(]+) \(([^)]+)\), withdrawn ([\d,]+) RWF from your mobile money account: \d+ at ([^.]+) and you can now collect your money in cash\. Your new balance: ([\d,]+) RWF\. Fee paid: ([\d,]+) RWF\. Message from agent: ([^.]+)\. Financial Transaction Id: (\d+)\.'
-        match = re.search(withdrawal_pattern, body)
-        if match:
-            account_holder, account_phone, agent_name, agent_phone, amount, date_time, balance, fee, message, txn_id = match.groups()
-            transaction_data.update({
-                'sender_name': 'Account Holder',
-                'receiver_name': f'Agent {agent_name.strip()}',
-                'amount': float(amount.replace(',', '')),
-                'fee': float(fee.replace(',', '')),
-                'balance_after': float(balance.replace(',', '')),
-                'transaction_type': 'Cash Withdrawal',
-                'remarks': f"Cash withdrawal via agent {agent_name.strip()}",
-                'external_transaction_id': txn_id
-            })
-            return transaction_data
-
-        # Pattern 7: Merchant payment (*164*S*Y'ello,A transaction of X RWF by Y)
-        merchant_pattern = r'\*164\*S\*Y\'ello,A transaction of ([\d,]+) RWF by ([^on]+) on your MOMO account was successfully completed at ([^.]+)\. Message from debit receiver: ([^.]+)\. Your new balance:([\d,]+) RWF\. Fee was ([\d,]+) RWF\. Financial Transaction Id: (\d+)\. External Transaction Id: ([^.]+)\.'
-        match = re.search(merchant_pattern, body)
-        if match:
-            amount, merchant, date_time, message, balance, fee, txn_id, external_id = match.groups()
-            transaction_data.update({
-                'sender_name': 'Account Holder',
-                'receiver_name': merchant.strip(),
-                'amount': float(amount.replace(',', '')),
-                'fee': float(fee.replace(',', '')),
-                'balance_after': float(balance.replace(',', '')),
-                'transaction_type': 'Merchant Payment',
-                'remarks': f"Payment to {merchant.strip()}",
-                'external_transaction_id': txn_id
-            })
-            return transaction_data
-
-        # If no pattern matches, return None (skip this SMS)
+        with self.profiler.stage('body_match'):
+            return self._match_sms_body(body, transaction_data)
+
+    def _match_sms_body(self, body, transaction_data):
+        """Match the SMS body against the registered templates and fill in transaction_data"""
+        template, match = self.registry.match(body)
+        if template is None:
+            # If no pattern matches, return None (the caller quarantines this SMS)
+            return None
+        self._template_counts[template.name] = self._template_counts.get(template.name, 0) + 1
+        return template.apply(match, transaction_data)
+
+
+def _text(value):
+    """value as str, replacing undecodable bytes"""
+    return value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
+
+
+def _epoch_ms(value):
+    """Milliseconds since the epoch for a datetime (or pass through an int / None)"""
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    return value
+
+
+def main():
+    """Command-line entry point: python -m dsa.sms_parser [INPUT.xml] [--profile | --format FORMAT --out PATH]"""
+    import argparse
+    from dsa.etl import FORMATS
+
+    arg_parser = argparse.ArgumentParser(description='Parse an SMS XML export into transactions')
+    arg_parser.add_argument('input', nargs='?', default=DEFAULT_XML_PATH, help='SMS XML export to parse')
+    arg_parser.add_argument('--profile', action='store_true',
+                            help='Break ingest wall time and allocations down by stage')
+    arg_parser.add_argument('--pstats', metavar='FILE',
+                            help='With --profile, also write a cProfile/pstats dump to FILE')
+    arg_parser.add_argument('--tracemalloc-top', type=int, default=0, metavar='N',
+                            help='With --profile, track allocations and report the top N sites')
+    arg_parser.add_argument('--dedup-state', metavar='DIR',
+                            help='Persisted dedup state (Bloom filter + key store) shared across runs')
+    arg_parser.add_argument('--templates', metavar='FILE',
+                            help='JSON file of extra SMS templates, tried after the built-in ones')
+    arg_parser.add_argument('--quarantine', metavar='FILE',
+                            help='JSON-lines file that keeps messages no template matched')
+    arg_parser.add_argument('--reparse-quarantine', action='store_true',
+                            help='With --quarantine, re-parse only the quarantined messages instead of INPUT; '
+                                 'with --format, write the matches to --out and release them from quarantine')
+    arg_parser.add_argument('--format', choices=FORMATS,
+                            help='Stream transactions to --out as ndjson, csv or an SQLite database')
+    arg_parser.add_argument('--out', default='-', metavar='PATH',
+                            help="With --format, output file ('-' for stdout, the default; sqlite needs a file)")
+    arg_parser.add_argument('--since', metavar='TIME',
+                            help='With --format, only messages dated at or after TIME (ISO date/datetime or epoch ms)')
+    arg_parser.add_argument('--until', metavar='TIME',
+                            help='With --format, only messages dated before TIME')
+    args = arg_parser.parse_args()
+
+    # With --format, stdout may carry the data, so progress goes to stderr
+    log = sys.stderr if args.format else sys.stdout
+
+    if args.templates:
+        for template in template_registry.load_config(args.templates):
+            print(f"Registered template: {template.name}", file=log)
+
+    quarantine = None
+    if args.quarantine:
+        from dsa.quarantine import QuarantineStore
+        quarantine = QuarantineStore(args.quarantine)
+
+    if args.reparse_quarantine:
+        if quarantine is None:
+            arg_parser.error('--reparse-quarantine needs --quarantine FILE')
+        reparse_quarantine(arg_parser, args, quarantine, log)
+        return
+
+    if args.format:
+        run_etl(arg_parser, args, quarantine)
+        return
+
+    if args.profile:
+        from dsa.profiler import profile_ingest
+        profile_ingest(args.input, pstats_path=args.pstats, tracemalloc_top=args.tracemalloc_top)
+        return
+
+    parser = SMSXMLParser(args.input, quarantine=quarantine)
+    transactions = parser.parse_xml_file()
+    print(f"Seen: {parser.stats['seen']}, dropped: {parser.stats['dropped']}")
+    for txn_type, count in sorted(parser.stats['matched'].items()):
+        print(f"  {txn_type}: {count}")
+
+    if args.dedup_state:
+        from dsa.dedup import Deduplicator
+        deduplicator = Deduplicator(args.dedup_state)
+        new = sum(1 for txn_data in transactions if deduplicator.check_and_add(txn_data) is None)
+        deduplicator.close()
+        stats = deduplicator.stats
+        print(f"New: {new}, duplicates of earlier exports: {stats['duplicates']} "
+              f"(Bloom filter skipped {stats['bloom_negative']} of {stats['checked']} exact lookups)")
+
+
+def reparse_quarantine(arg_parser, args, quarantine, log):
+    """Re-parse the quarantined messages; with --format, write the matches to --out and release them
+
+    Without --format nothing is written, so the quarantine file is left as it is
+    and the run only reports what the current templates would recover.
+    """
+    if args.format == 'sqlite' and args.out == '-':
+        arg_parser.error('--format sqlite needs --out FILE')
+    before = len(quarantine)
+    parser = SMSXMLParser()
+    transactions, released = parser.reparse_quarantine(quarantine, release=False)
+    if args.format:
+        if write_transactions(args, iter(transactions)) is None:
+            return
+        quarantine.remove([entry['key'] for entry in released])
+    print(f"Re-parsed {before} quarantined messages: {len(transactions)} matched, "
+          f"{len(quarantine)} still quarantined", file=log)
+    for template_name, count in sorted(parser.stats['matched'].items()):
+        print(f"  {template_name}: {count}", file=log)
+    if transactions and not args.format:
+        print("Nothing was written or released; add --format (and --out) to write the matched "
+              "transactions and remove them from quarantine", file=log)
+
+
+def write_transactions(args, transactions):
+    """Write transactions to --out in --format; returns how many, or None if stdout closed early"""
+    from dsa.etl import STREAM_WRITERS, write_sqlite
+
+    try:
+        if args.format == 'sqlite':
+            return write_sqlite(transactions, args.out)
+        if args.out == '-':
+            written = STREAM_WRITERS[args.format](transactions, sys.stdout)
+            sys.stdout.flush()
+            return written
+        with open(args.out, 'w', encoding='utf-8', newline='') as out:
+            return STREAM_WRITERS[args.format](transactions, out)
+    except BrokenPipeError:
+        # Downstream closed early (e.g. | head): stop quietly, and point stdout at
+        # devnull so the interpreter's final flush does not raise again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
         return None
+
+
+def run_etl(arg_parser, args, quarantine=None):
+    """Stream INPUT to --out in --format without building the transaction list"""
+    from dsa.etl import parse_time
+
+    try:
+        since = parse_time(args.since) if args.since else None
+        until = parse_time(args.until) if args.until else None
+    except ValueError as e:
+        arg_parser.error(str(e))
+    if args.format == 'sqlite' and args.out == '-':
+        arg_parser.error('--format sqlite needs --out FILE')
+
+    parser = SMSXMLParser(args.input, quarantine=quarantine)
+    transactions = parser.iter_file(since=since, until=until)
+    try:
+        written = write_transactions(args, transactions)
+    finally:
+        transactions.close()
+    if written is None:
+        return
+    stats = parser.stats
+    print(f"Wrote {written} transactions ({stats['seen']} messages in range, {stats['dropped']} unmatched, "
+          f"{stats['filtered']} outside --since/--until)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
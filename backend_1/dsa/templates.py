@@ -0,0 +1,180 @@
+import json
+import re
+import threading
+
+from dsa.money import parse_amount
+
+# (named group, transaction field) pairs holding RWF amounts
+MONEY_GROUPS = (('amount', 'amount'), ('fee', 'fee'), ('balance', 'balance_after'))
+
+
+class SMSTemplate:
+    """One SMS body template: a regex with named groups plus how to map them onto a transaction
+
+    Named groups used by the mapping:
+      amount (required), fee, balance    RWF amounts such as "1,000" (stored as minor units)
+      txn_id                             Financial Transaction Id -> external_transaction_id
+      any other group                    available to the sender_name/receiver_name/remarks format strings
+    """
+
+    def __init__(self, name, pattern, transaction_type=None, sender_name='Account Holder',
+                 receiver_name='Account Holder', remarks=None, builtin=False):
+        self.name = name
+        self.pattern = pattern
+        self.regex = re.compile(pattern)
+        if 'amount' not in self.regex.groupindex:
+            raise ValueError(f"Template '{name}' pattern needs an (?P<amount>...) group")
+        self.transaction_type = transaction_type or name
+        self.sender_name = sender_name
+        self.receiver_name = receiver_name
+        self.remarks = remarks
+        self.builtin = builtin
+        # Fail at registration time, not on the first message, if a format string names a missing group
+        groups = {group: '' for group in self.regex.groupindex}
+        for text in (sender_name, receiver_name, remarks):
+            if text:
+                try:
+                    text.format(**groups)
+                except (KeyError, IndexError) as e:
+                    raise ValueError(f"Template '{name}' refers to unknown group {e}")
+
+    @classmethod
+    def from_config(cls, spec):
+        """Build a template from a config dict (as found in a templates JSON file)"""
+        if not isinstance(spec, dict) or not spec.get('name') or not spec.get('pattern'):
+            raise ValueError("Template needs a 'name' and a 'pattern'")
+        try:
+            return cls(spec['name'], spec['pattern'],
+                       transaction_type=spec.get('transaction_type'),
+                       sender_name=spec.get('sender_name', 'Account Holder'),
+                       receiver_name=spec.get('receiver_name', 'Account Holder'),
+                       remarks=spec.get('remarks'))
+        except re.error as e:
+            raise ValueError(f"Template '{spec['name']}' has an invalid pattern: {e}")
+
+    def to_config(self):
+        """Config dict that from_config turns back into this template"""
+        return {
+            'name': self.name,
+            'pattern': self.pattern,
+            'transaction_type': self.transaction_type,
+            'sender_name': self.sender_name,
+            'receiver_name': self.receiver_name,
+            'remarks': self.remarks
+        }
+
+    def apply(self, match, transaction_data):
+        """Fill transaction_data from a successful match"""
+        # Optional groups that matched nothing format as '', as they were validated at registration
+        groups = {key: (value or '').strip() for key, value in match.groupdict().items()}
+        money = {}
+        for group, field in MONEY_GROUPS:
+            value = groups.get(group)
+            money[field] = parse_amount(value) if value else (0 if field == 'fee' else None)
+        transaction_data.update({
+            'sender_name': self.sender_name.format(**groups),
+            'receiver_name': self.receiver_name.format(**groups),
+            'amount': money['amount'],
+            'fee': money['fee'],
+            'balance_after': money['balance_after'],
+            'transaction_type': self.transaction_type,
+            'remarks': self.remarks.format(**groups) if self.remarks else None
+        })
+        if groups.get('txn_id'):
+            transaction_data['external_transaction_id'] = groups['txn_id']
+        return transaction_data
+
+
+# The seven templates the parser has always recognized, tried in this order
+BUILTIN_TEMPLATES = (
+    # Money received (You have received X RWF from Y)
+    SMSTemplate('Money Received',
+                r'You have received (?P<amount>[\d,]+) RWF from (?P<sender>[^(]+) \((?P<phone>[^)]+)\) on your mobile money account at (?P<date_time>[^.]+)\. Message from sender: (?P<message>[^.]+)\. Your new balance:(?P<balance>[\d,]+) RWF\. Financial Transaction Id: (?P<txn_id>\d+)\.',
+                sender_name='{sender}', remarks='Received from {sender}', builtin=True),
+    # Payment completed (TxId: X. Your payment of Y RWF to Z)
+    SMSTemplate('Payment',
+                r'TxId: (?P<txn_id>\d+)\. Your payment of (?P<amount>[\d,]+) RWF to (?P<receiver>[^(]+) \d+ has been completed at (?P<date_time>[^.]+)\. Your new balance: (?P<balance>[\d,]+) RWF\. Fee was (?P<fee>[\d,]+) RWF\.',
+                receiver_name='{receiver}', remarks='Payment to {receiver}', builtin=True),
+    # Bank deposit (*113*R*A bank deposit of X RWF)
+    SMSTemplate('Bank Deposit',
+                r'\*113\*R\*A bank deposit of (?P<amount>[\d,]+) RWF has been added to your mobile money account at (?P<date_time>[^.]+)\. Your NEW BALANCE :(?P<balance>[\d,]+) RWF\.',
+                sender_name='Bank', remarks='Bank deposit via cash', builtin=True),
+    # Transfer (*165*S*X RWF transferred to Y)
+    SMSTemplate('Transfer',
+                r'\*165\*S\*(?P<amount>[\d,]+) RWF transferred to (?P<receiver>[^(]+) \((?P<phone>[^)]+)\) from \d+ at (?P<date_time>[^.]+) \. Fee was: (?P<fee>[\d,]+) RWF\. New balance: (?P<balance>[\d,]+) RWF\.',
+                receiver_name='{receiver}', remarks='Transfer to {receiver}', builtin=True),
+    # Airtime purchase (*162*TxId:X*S*Your payment of Y RWF to Airtime)
+    SMSTemplate('Airtime Purchase',
+                r'\*162\*TxId:(?P<txn_id>\d+)\*S\*Your payment of (?P<amount>[\d,]+) RWF to Airtime with token[^.]*has been completed at (?P<date_time>[^.]+)\. Fee was (?P<fee>[\d,]+) RWF\. Your new balance: (?P<balance>[\d,]+) RWF',
+                receiver_name='Airtime Service', remarks='Airtime top-up', builtin=True),
+    # Cash withdrawal (You X have via agent: Agent Y)
+    SMSTemplate('Cash Withdrawal',
+                r'You (?P<account_holder>[^(]+) \((?P<account_phone>[^)]+)\) have via agent: Agent (?P<agent>[^(]+) \((?P<agent_phone>[^)]+)\), withdrawn (?P<amount>[\d,]+) RWF from your mobile money account: \d+ at (?P<date_time>[^.]+) and you can now collect your money in cash\. Your new balance: (?P<balance>[\d,]+) RWF\. Fee paid: (?P<fee>[\d,]+) RWF\. Message from agent: (?P<message>[^.]+)\. Financial Transaction Id: (?P<txn_id>\d+)\.',
+                receiver_name='Agent {agent}', remarks='Cash withdrawal via agent {agent}', builtin=True),
+    # Merchant payment (*164*S*Y'ello,A transaction of X RWF by Y)
+    SMSTemplate('Merchant Payment',
+                r'\*164\*S\*Y\'ello,A transaction of (?P<amount>[\d,]+) RWF by (?P<merchant>[^on]+) on your MOMO account was successfully completed at (?P<date_time>[^.]+)\. Message from debit receiver: (?P<message>[^.]+)\. Your new balance:(?P<balance>[\d,]+) RWF\. Fee was (?P<fee>[\d,]+) RWF\. Financial Transaction Id: (?P<txn_id>\d+)\. External Transaction Id: (?P<external_id>[^.]+)\.',
+                receiver_name='{merchant}', remarks='Payment to {merchant}', builtin=True),
+)
+
+
+class TemplateRegistry:
+    """Ordered SMS templates: the built-ins first, then ones registered at runtime or from config"""
+
+    def __init__(self):
+        if getattr(self, '_initialized', False):
+            return
+        self._lock = threading.Lock()
+        # Replaced wholesale on register so readers can iterate without locking
+        self.templates = tuple(BUILTIN_TEMPLATES)
+        self.match_counts = {template.name: 0 for template in self.templates}
+        self._initialized = True
+
+    def register(self, template):
+        """Add a template after the existing ones; names must be unique"""
+        with self._lock:
+            if any(existing.name == template.name for existing in self.templates):
+                raise KeyError(f"Template '{template.name}' is already registered")
+            self.templates = self.templates + (template,)
+            self.match_counts.setdefault(template.name, 0)
+        return template
+
+    def load_config(self, path):
+        """Register every template in a JSON config file ({"templates": [...]}); returns the new templates"""
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        specs = config.get('templates', []) if isinstance(config, dict) else config
+        return self.register_configs(specs)
+
+    def register_configs(self, specs):
+        """Register templates from config dicts, skipping names that are already registered"""
+        registered = []
+        names = {template.name for template in self.templates}
+        for spec in specs:
+            template = SMSTemplate.from_config(spec)
+            if template.name not in names:
+                registered.append(self.register(template))
+                names.add(template.name)
+        return registered
+
+    def custom_configs(self):
+        """Config dicts for every non-builtin template (to rebuild the registry in worker processes)"""
+        return [template.to_config() for template in self.templates if not template.builtin]
+
+    def match(self, body):
+        """Return (template, match) for the first template matching body, or (None, None)"""
+        for template in self.templates:
+            match = template.regex.search(body)
+            if match:
+                return template, match
+        return None, None
+
+    def record_matches(self, matched):
+        """Add per-template match counts from one parse run"""
+        with self._lock:
+            for name, count in matched.items():
+                self.match_counts[name] = self.match_counts.get(name, 0) + count
+
+
+# Module-level singleton
+template_registry = TemplateRegistry()
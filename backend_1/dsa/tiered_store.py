@@ -0,0 +1,198 @@
+import heapq
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+_MISSING = object()
+
+
+class TieredStore(MutableMapping):
+    """Dict-like store with a bounded in-memory LRU hot tier in front of an SQLite cold tier
+
+    Every key lives in exactly one tier. Reads through [] or get() promote cold
+    entries to the hot tier; inserting past hot_capacity demotes the least
+    recently used hot entries. New entries for which is_cold(value) is true
+    are written straight to the cold tier, and hot entries for which it has
+    become true are demoted by demote_cold(), which writes also run at most
+    every sweep_interval seconds. Iteration, keys(), values() and
+    items() follow insertion order like a dict and do not promote, so a full
+    scan leaves the hot set alone.
+
+    Values are stored cold as encode(value) (a str) and rebuilt with decode.
+    The cold tier is a spill area, not persistence: its table is recreated on
+    open, and the file stays exclusively locked until close(), so a second
+    store (in this or another process) cannot open it and drop the table under
+    the first; it gets ValueError instead. All operations are serialized by one lock.
+    """
+
+    def __init__(self, path, encode, decode, hot_capacity=10000, is_cold=None, sweep_interval=60.0,
+                 clock=time.monotonic):
+        if hot_capacity < 1:
+            raise ValueError("hot_capacity must be at least 1")
+        self.path = path
+        self.hot_capacity = hot_capacity
+        self._encode = encode
+        self._decode = decode
+        self._is_cold = is_cold
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._last_sweep = clock()
+        # key -> (insertion sequence, value), least recently used first
+        self._hot = OrderedDict()
+        self._cold_count = 0
+        self._next_sequence = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.demotions = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=0)
+        try:
+            # Hold the write lock from the first write until close()
+            self._db.execute('PRAGMA locking_mode=EXCLUSIVE')
+            # Nothing here needs to survive a crash, so skip the journal and fsyncs
+            self._db.execute('PRAGMA journal_mode=OFF')
+            self._db.execute('PRAGMA synchronous=OFF')
+            self._db.execute('DROP TABLE IF EXISTS cold')
+            self._db.execute('CREATE TABLE cold (sequence INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, '
+                             'value TEXT NOT NULL)')
+        except sqlite3.OperationalError as e:
+            self._db.close()
+            if 'locked' not in str(e):
+                raise
+            raise ValueError(f"Cold tier file {path} is in use by another store")
+
+    def __len__(self):
+        return len(self._hot) + self._cold_count
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._hot or self._cold_row(key) is not None
+
+    def __getitem__(self, key):
+        with self._lock:
+            entry = self._hot.get(key)
+            if entry is not None:
+                self._hot.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            row = self._cold_row(key)
+            if row is None:
+                raise KeyError(key)
+            self.misses += 1
+            sequence, encoded = row
+            value = self._decode(encoded)
+            self._delete_cold(key)
+            self._hot[key] = (sequence, value)
+            self._demote_overflow()
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            entry = self._hot.get(key)
+            if entry is not None:
+                self._hot[key] = (entry[0], value)
+                self._hot.move_to_end(key)
+                return
+            row = self._cold_row(key)
+            if row is not None:
+                # An overwrite counts as an access, so the entry moves to the hot tier
+                self._delete_cold(key)
+                sequence = row[0]
+            else:
+                self._next_sequence += 1
+                sequence = self._next_sequence
+                if self._is_cold is not None and self._is_cold(value):
+                    self._insert_cold([(sequence, key, value)])
+                    return
+            self._hot[key] = (sequence, value)
+            self._demote_overflow()
+            if self._is_cold is not None and self._clock() - self._last_sweep >= self.sweep_interval:
+                self.demote_cold()
+
+    def __delitem__(self, key):
+        with self._lock:
+            if self._hot.pop(key, None) is None and not self._delete_cold(key):
+                raise KeyError(key)
+
+    def __iter__(self):
+        return iter([key for key, _ in self.items()])
+
+    def pop(self, key, default=_MISSING):
+        """Remove and return the value for key without promoting it first"""
+        with self._lock:
+            entry = self._hot.pop(key, None)
+            if entry is not None:
+                return entry[1]
+            row = self._cold_row(key)
+            if row is not None:
+                self._delete_cold(key)
+                return self._decode(row[1])
+        if default is _MISSING:
+            raise KeyError(key)
+        return default
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def items(self):
+        """Snapshot of (key, value) pairs in insertion order, read without promoting"""
+        with self._lock:
+            hot = sorted((sequence, key, value) for key, (sequence, value) in self._hot.items())
+            cold = [(sequence, key, self._decode(encoded)) for sequence, key, encoded
+                    in self._db.execute('SELECT sequence, key, value FROM cold ORDER BY sequence')]
+        return [(key, value) for _, key, value in heapq.merge(hot, cold, key=lambda row: row[0])]
+
+    def tier_sizes(self):
+        """{'hot': entries in memory, 'cold': entries on disk}"""
+        return {'hot': len(self._hot), 'cold': self._cold_count}
+
+    def hit_ratio(self):
+        """Share of successful lookups served by the hot tier, or None before the first lookup"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def demote_cold(self):
+        """Move hot entries for which is_cold(value) now holds to the cold tier; returns how many"""
+        if self._is_cold is None:
+            return 0
+        with self._lock:
+            self._last_sweep = self._clock()
+            aged = [(sequence, key, value) for key, (sequence, value) in self._hot.items() if self._is_cold(value)]
+            for _, key, _ in aged:
+                del self._hot[key]
+            self._insert_cold(aged)
+            self.demotions += len(aged)
+        return len(aged)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _cold_row(self, key):
+        return self._db.execute('SELECT sequence, value FROM cold WHERE key = ?', (key,)).fetchone()
+
+    def _delete_cold(self, key):
+        deleted = self._db.execute('DELETE FROM cold WHERE key = ?', (key,)).rowcount
+        self._cold_count -= deleted
+        return deleted
+
+    def _insert_cold(self, rows):
+        self._db.executemany('INSERT INTO cold (sequence, key, value) VALUES (?, ?, ?)',
+                             [(sequence, key, self._encode(value)) for sequence, key, value in rows])
+        self._cold_count += len(rows)
+
+    def _demote_overflow(self):
+        overflow = len(self._hot) - self.hot_capacity
+        if overflow <= 0:
+            return
+        demoted = []
+        for _ in range(overflow):
+            key, (sequence, value) = self._hot.popitem(last=False)
+            demoted.append((sequence, key, value))
+        self._insert_cold(demoted)
+        self.demotions += overflow
@@ -4,14 +4,124 @@ REST API Server for SMS Transactions
 Built with Python's http.server module
 """
 
-from http.server import HTTPServer
+import atexit
+import math
+import os
+import shutil
+import tempfile
+from http.server import HTTPServer, ThreadingHTTPServer
 from api.controllers.transactions_controller import TransactionAPIHandler
+from api.controllers.tracing_controller import tracer_instance
+from api.controllers.storage_controller import storage_instance
+from api.controllers.user_controller import user_manager_instance
+from api.controllers.admission_controller import admission_instance
 
+# In-flight request limit used with --threads when --max-in-flight is not given
+DEFAULT_MAX_IN_FLIGHT = 64
+# Storage partitions used with --threads when --partitions is not given
+DEFAULT_PARTITIONS = 8
+
+
+class ThreadedHTTPServer(ThreadingHTTPServer):
+    """One thread per connection; a deeper accept backlog so excess load reaches the 503 path
+    instead of waiting in the kernel for a SYN retry"""
+    request_queue_size = 128
+
+
+def ingest_exports(sources, workers=None):
+    """Load additional SMS exports (files, directories or globs) into storage"""
+    reports = storage_instance.ingest_files(sources, workers)
+    for report in reports:
+        print(f"Ingested {report['file']}: {report['added']} new, {report['duplicates']} duplicates, "
+              f"{report['dropped']} unmatched ({report['parse_seconds']}s)")
+    print(f"Ingested {len(reports)} export files; {len(storage_instance.transactions)} transactions in storage")
+    return reports
+
+
+def load_templates(path):
+    """Register SMS templates from a JSON config and re-parse the quarantined messages"""
+    result = storage_instance.register_templates_from_file(path)
+    print(f"Registered {len(result['templates'])} SMS templates from {path}: "
+          f"{result['added']} quarantined messages recovered, {result['still_quarantined']} still unmatched")
+    return result
+
+
+def private_cold_path():
+    """Cold-tier path in a new temporary directory of this process, removed at exit
+
+    Used with --hot-capacity when --cold-path is not given, so servers running
+    side by side never share (and recreate) each other's cold tier.
+    """
+    directory = tempfile.mkdtemp(prefix='sms_transactions_cold_')
+    atexit.register(shutil.rmtree, directory, True)
+    return os.path.join(directory, 'cold.sqlite3')
+
+
+def parse_rate_limit(text):
+    """Parse 'ROLE=RATE[/BURST]' (or 'ROLE=none') into (role, rate, burst)"""
+    role, separator, limit = text.partition('=')
+    if not separator or not role:
+        raise ValueError(f"Invalid rate limit '{text}': use ROLE=RATE[/BURST], e.g. user=20/40")
+    if limit.lower() in ('none', 'off', 'unlimited'):
+        return role, None, None
+    rate, _, burst = limit.partition('/')
+    try:
+        rate, burst = float(rate), float(burst) if burst else None
+    except ValueError:
+        raise ValueError(f"Invalid rate limit '{text}': use ROLE=RATE[/BURST], e.g. user=20/40")
+    if not math.isfinite(rate) or rate <= 0:
+        raise ValueError(f"Invalid rate limit '{text}': the rate must be a positive number of requests per second")
+    if burst is not None and (not math.isfinite(burst) or burst < 1):
+        raise ValueError(f"Invalid rate limit '{text}': the burst must be at least 1")
+    return role, rate, burst
+
+
+def run_server(host='localhost', port=8000, trace=False, trace_file=None, trace_sample=1.0,
+               ingest=None, ingest_workers=None, templates=None, threads=False,
+               max_in_flight=None, rate_limits=(), limits=None, tiers=None, partitions=None):
+    """Run the HTTP server
+
+    With threads, each connection is handled on its own thread and at most
+    max_in_flight requests run at once; the rest get an immediate 503.
+    rate_limits is a sequence of (role, requests per second, burst). limits
+    overrides the handler's timeouts and size limits, e.g. {'header_timeout': 5}.
+    partitions splits storage into that many hash partitions with their own
+    write locks (default: DEFAULT_PARTITIONS with threads, otherwise one).
+    tiers enables hot/cold storage before anything is ingested, e.g.
+    {'cold_path': 'cold.sqlite3', 'hot_capacity': 50000, 'max_age_days': 60}.
+    """
+    partitions = partitions or (DEFAULT_PARTITIONS if threads else 1)
+    if partitions != len(storage_instance.transactions.partitions):
+        storage_instance.set_partitions(partitions)
+    if tiers:
+        try:
+            storage_instance.enable_tiering(**tiers)
+        except ValueError as e:
+            raise SystemExit(f"Cannot enable tiered storage: {e}")
+
+    if templates:
+        load_templates(templates)
+
+    if ingest:
+        ingest_exports(ingest, ingest_workers)
+
+    if trace:
+        tracer_instance.configure(enabled=True, sample_rate=trace_sample, trace_file=trace_file)
+
+    for role, rate, burst in rate_limits:
+        user_manager_instance.set_rate_limit(role, rate, burst)
+
+    if threads:
+        admission_instance.configure(max_in_flight=max_in_flight or DEFAULT_MAX_IN_FLIGHT)
+    elif max_in_flight:
+        admission_instance.configure(max_in_flight=max_in_flight)
 
-def run_server(host='localhost', port=8000):
-    """Run the HTTP server"""
     server_address = (host, port)
-    httpd = HTTPServer(server_address, TransactionAPIHandler)
+    server_class = ThreadedHTTPServer if threads else HTTPServer
+    handler_class = TransactionAPIHandler
+    if limits:
+        handler_class = type(TransactionAPIHandler.__name__, (TransactionAPIHandler,), dict(limits))
+    httpd = server_class(server_address, handler_class)
 
     print(f"SMS Transactions REST API Server")
     print(f"Server running on http://{host}:{port}")
@@ -22,6 +132,30 @@ def run_server(host='localhost', port=8000):
     print(f"   POST   /transactions        - Create new transaction")
     print(f"   PUT    /transactions/{{id}}   - Update transaction")
     print(f"   DELETE /transactions/{{id}}   - Delete transaction")
+    print(f"   POST   /transactions/query  - Filter transactions (boolean filter, explain)")
+    print(f"   GET    /transactions/changes?since={{token}} - Changes since a sync token")
+    print(f"   GET    /transactions/stream - Live changes (Server-Sent Events)")
+    print(f"   GET    /metrics             - Prometheus metrics")
+    print(f"   GET    /templates           - SMS templates and match counts")
+    print(f"   POST   /templates           - Register an SMS template")
+    print(f"   GET    /quarantine          - Unmatched SMS messages")
+    if threads:
+        print(f"Threaded mode: at most {admission_instance.max_in_flight} requests in flight, the rest get 503")
+    if partitions > 1:
+        print(f"Storage split into {partitions} partitions with separate write locks")
+    role_limits = ', '.join(f"{role}={'unlimited' if limit is None else f'{limit[0]:g}/s burst {limit[1]:g}'}"
+                       for role, limit in user_manager_instance.rate_limits.items())
+    print(f"Rate limits per role: {role_limits}")
+    print(f"Timeouts: idle {handler_class.idle_timeout}s, headers {handler_class.header_timeout}s, "
+          f"body {handler_class.body_timeout}s; max body {handler_class.max_body_bytes} bytes, "
+          f"max {handler_class.max_header_count} headers / {handler_class.max_header_bytes} bytes")
+    if tiers:
+        sizes = storage_instance.tier_sizes()
+        print(f"Tiered storage: {sizes['hot']} transactions in memory (max {tiers['hot_capacity']}), "
+              f"{sizes['cold']} in {tiers['cold_path']}{'.<partition>' if partitions > 1 else ''}")
+    if trace:
+        print(f"Request tracing enabled (Server-Timing headers"
+              f"{', sampled traces to ' + trace_file if trace_file else ''})")
     print(f"\n Press Ctrl+C to stop the server")
 
     try:
@@ -32,19 +166,84 @@ def run_server(host='localhost', port=8000):
 
 
 if __name__ == '__main__':
-    import sys
+    import argparse
 
     # Parse command line arguments
-    host = 'localhost'
-    port = 8000
+    arg_parser = argparse.ArgumentParser(description='SMS Transactions REST API Server')
+    arg_parser.add_argument('port', nargs='?', default='8000', help='Port to listen on (default: 8000)')
+    arg_parser.add_argument('host', nargs='?', default='localhost', help='Host to bind (default: localhost)')
+    arg_parser.add_argument('--trace', action='store_true',
+                            help='Enable per-request phase tracing (Server-Timing and X-Request-ID headers)')
+    arg_parser.add_argument('--trace-file', help='Append sampled traces to this JSON-lines file')
+    arg_parser.add_argument('--trace-sample', type=float, default=1.0,
+                            help='Fraction of traced requests written to --trace-file (default: 1.0)')
+    arg_parser.add_argument('--ingest', action='append', metavar='PATH',
+                            help='Extra SMS export file, directory or glob to load (repeatable)')
+    arg_parser.add_argument('--ingest-workers', type=int,
+                            help='Processes used to parse --ingest files (default: one per CPU)')
+    arg_parser.add_argument('--templates', metavar='FILE',
+                            help='JSON file of extra SMS templates (see dsa/sms_templates.example.json)')
+    arg_parser.add_argument('--threads', action='store_true',
+                            help='Handle each connection on its own thread (enables the in-flight limit)')
+    arg_parser.add_argument('--max-in-flight', type=int,
+                            help=f'Requests handled at once before answering 503 (default with --threads: {DEFAULT_MAX_IN_FLIGHT})')
+    arg_parser.add_argument('--rate-limit', action='append', default=[], metavar='ROLE=RATE[/BURST]',
+                            help='Per-user request rate for a role, e.g. user=20/40 or admin=none (repeatable)')
+    arg_parser.add_argument('--idle-timeout', type=float,
+                            help=f'Seconds a connection may stay silent before its request starts '
+                                 f'(default: {TransactionAPIHandler.idle_timeout})')
+    arg_parser.add_argument('--header-timeout', type=float,
+                            help=f'Seconds to receive the request line and headers '
+                                 f'(default: {TransactionAPIHandler.header_timeout})')
+    arg_parser.add_argument('--body-timeout', type=float,
+                            help=f'Seconds to receive the request body (default: {TransactionAPIHandler.body_timeout})')
+    arg_parser.add_argument('--max-body-bytes', type=int,
+                            help=f'Largest accepted request body (default: {TransactionAPIHandler.max_body_bytes})')
+    arg_parser.add_argument('--max-headers', type=int, dest='max_header_count',
+                            help=f'Most request headers (default: {TransactionAPIHandler.max_header_count})')
+    arg_parser.add_argument('--max-header-bytes', type=int,
+                            help=f'Largest total size of the request headers '
+                                 f'(default: {TransactionAPIHandler.max_header_bytes})')
+    arg_parser.add_argument('--partitions', type=int,
+                            help=f'Hash partitions of the transaction store, each with its own write lock '
+                                 f'(default: {DEFAULT_PARTITIONS} with --threads, otherwise 1)')
+    arg_parser.add_argument('--hot-capacity', type=int,
+                            help='Keep at most this many transactions in memory and spill the rest to disk')
+    arg_parser.add_argument('--cold-path',
+                            help='SQLite file for spilled transactions, recreated on start '
+                                 '(default: a new file in a temporary directory removed on exit)')
+    arg_parser.add_argument('--hot-max-age-days', type=float,
+                            help='With --hot-capacity, also spill transactions dated more than this many days ago')
+    args = arg_parser.parse_args()
 
-    if len(sys.argv) > 1:
-        try:
-            port = int(sys.argv[1])
-        except ValueError:
-            print("Invalid port number. Using default port 8000.")
+    limits = {name: getattr(args, name) for name in ('idle_timeout', 'header_timeout', 'body_timeout',
+                                                     'max_body_bytes', 'max_header_count', 'max_header_bytes')
+              if getattr(args, name) is not None}
+
+    try:
+        rate_limits = [parse_rate_limit(text) for text in args.rate_limit]
+    except ValueError as e:
+        arg_parser.error(str(e))
+
+    if args.partitions is not None and args.partitions < 1:
+        arg_parser.error('--partitions must be at least 1')
+    tiers = None
+    if args.hot_capacity is not None:
+        if args.hot_capacity < 1:
+            arg_parser.error('--hot-capacity must be at least 1')
+        tiers = {'cold_path': args.cold_path or private_cold_path(), 'hot_capacity': args.hot_capacity,
+                 'max_age_days': args.hot_max_age_days}
+    elif args.hot_max_age_days is not None:
+        arg_parser.error('--hot-max-age-days requires --hot-capacity')
 
-    if len(sys.argv) > 2:
-        host = sys.argv[2]
+    try:
+        port = int(args.port)
+    except ValueError:
+        print("Invalid port number. Using default port 8000.")
+        port = 8000
 
-    run_server(host, port)
+    run_server(args.host, port, trace=args.trace or bool(args.trace_file),
+               trace_file=args.trace_file, trace_sample=args.trace_sample,
+               ingest=args.ingest, ingest_workers=args.ingest_workers, templates=args.templates,
+               threads=args.threads, max_in_flight=args.max_in_flight, rate_limits=rate_limits,
+               limits=limits, tiers=tiers, partitions=args.partitions)